@@ -0,0 +1,59 @@
+#!/usr/bin/python3
+"""Compares seeding objects one at a time and with `bulk_create`.
+
+One at a time, every object is created with the class and saved with a
+single save at the end; `create` in the console also saves once per
+object, which is not measured here.
+
+Usage: python3 -m benchmarks.bench_bulk [<number of objects>]
+"""
+import os
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+from models.engine.file_storage import FileStorage
+from models.place import Place
+
+
+def open_storage(directory):
+    """Returns an empty private storage saving to `directory`."""
+    storage = FileStorage()
+    storage._FileStorage__file_path = os.path.join(directory, 'objects.json')
+    storage._FileStorage__objects = dict()
+    storage.reload()
+    return storage
+
+
+def one_by_one(storage, count):
+    """Creates the objects with the class, then saves once."""
+    for i in range(count):
+        place = Place()
+        place.name = 'Seed'
+        place.number_rooms = 2
+    storage.save()
+
+
+def bulk(storage, count):
+    """Creates the objects with `bulk_create`."""
+    storage.bulk_create(Place, count, name='Seed', number_rooms=2)
+
+
+def main():
+    """Seeds a private storage both ways and prints the durations."""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print("{} places".format(count))
+    for name, seed in (('one by one', one_by_one), ('bulk_create', bulk)):
+        with tempfile.TemporaryDirectory() as tmp:
+            storage = open_storage(tmp)
+            with patch('models.base_model.storage', storage):
+                start = time.perf_counter()
+                seed(storage, count)
+                seconds = time.perf_counter() - start
+        print("{:<12} {:7.2f} s  {:9.0f} objects/s".format(
+            name, seconds, count / seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/python3
+"""Times `compute` aggregations and `where` filters over the places of a
+private storage, read from the `ColumnStore` of `Place` and from the
+objects.
+
+The places are spread over 1000 cities; the first reads of the columns
+fill them and are timed apart.
+
+Usage: python3 -m benchmarks.bench_compute [<number of objects>]
+"""
+import os
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+from models.engine import compute
+from models.engine.file_storage import FileStorage
+from models.place import Place
+
+COMPUTATIONS = ('count, avg(price_by_night), max(max_guest)',
+                'count, avg(price_by_night), percentile(price_by_night, 95) '
+                'by city_id',
+                'sum(price_by_night) where max_guest>=3')
+
+QUERIES = ('price_by_night<5',
+           'max_guest in [3, 4], price_by_night>=250')
+
+
+def timed(function, *args):
+    """Returns the result of a call and its duration in ms."""
+    start = time.perf_counter()
+    result = function(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    """Seeds a private storage and runs every computation and query."""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    print("{} places".format(count))
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = FileStorage()
+        storage._FileStorage__file_path = os.path.join(tmp, 'objects.json')
+        storage._FileStorage__objects = dict()
+        storage.reload()
+        with patch('models.base_model.storage', storage):
+            with storage.transaction():
+                for city in range(1000):
+                    storage.bulk_create(Place, count // 1000,
+                                        city_id='city-{}'.format(city),
+                                        price_by_night=city % 500,
+                                        max_guest=city % 7)
+        store = storage.columns(Place, 'price_by_night')
+        start = time.perf_counter()
+        for attr in ('price_by_night', 'max_guest'):
+            store.fill(attr)
+        print("filling 2 columns {:8.2f} ms".format(
+            (time.perf_counter() - start) * 1000))
+        for text in COMPUTATIONS:
+            aggregates, by, where = compute.parse(text)
+            args = (storage, Place, aggregates, by, where)
+            results, columns = timed(compute.compute, *args)
+            with patch.object(storage, 'columns', return_value=None):
+                results, objects = timed(compute.compute, *args)
+            print("compute {}\n  columns {:8.2f} ms, objects {:8.2f} ms, "
+                  "{} rows".format(text, columns, objects, len(results)))
+        for text in QUERIES:
+            found, columns = timed(storage.where, Place, text)
+            with patch.object(storage, 'columns', return_value=None):
+                found, objects = timed(storage.where, Place, text)
+            print("where {}\n  columns {:8.2f} ms, objects {:8.2f} ms, "
+                  "{} found".format(text, columns, objects, len(found)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/python3
+"""Compares the save latency of the durability modes.
+
+Every mode is measured on whole-file saves and on journal appends, each
+save changing one object of a small store.
+
+Usage: python3 -m benchmarks.bench_durability [<number of saves>]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from models.engine.durability import MODES
+from models.engine.file_storage import FileStorage
+from models.engine.journal import Journal
+from models.user import User
+
+
+def run(directory, mode, journal, saves):
+    """Returns the duration, in seconds, of every save of one run."""
+    file_path = os.path.join(directory, 'objects.json')
+    storage = FileStorage(durability=mode)
+    storage._FileStorage__file_path = file_path
+    storage._FileStorage__objects = dict()
+    users = [User() for i in range(100)]
+    for user in users:
+        storage.new(user)
+    storage.save()
+    if journal is True:
+        storage.journal = Journal(file_path + '.journal', storage.durability)
+    durations = []
+    for i in range(saves):
+        user = users[i % len(users)]
+        user.first_name = 'Betty {}'.format(i)
+        storage.touch(user)
+        start = time.perf_counter()
+        storage.save()
+        durations.append(time.perf_counter() - start)
+    storage.close()
+    if storage.journal is not None:
+        storage.journal.clear()
+    return durations
+
+
+def main():
+    """Runs every mode and prints the latency of a save."""
+    saves = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    print("{} saves of 100 objects".format(saves))
+    for journal in (False, True):
+        print('journal appends' if journal else 'whole-file saves')
+        for mode in MODES:
+            with tempfile.TemporaryDirectory() as tmp:
+                durations = sorted(run(tmp, mode, journal, saves))
+            mean = sum(durations) / len(durations)
+            print("  {:<6} mean {:8.3f} ms  p50 {:8.3f} ms  p99 {:8.3f} ms"
+                  .format(mode, mean * 1000,
+                          durations[len(durations) // 2] * 1000,
+                          durations[len(durations) * 99 // 100] * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/python3
+"""Compares `export` with the string list printed by `all`.
+
+Both write every place of a saved store to the null device; the peak
+memory taken on top of the store is measured with `tracemalloc`.
+
+Usage: python3 -m benchmarks.bench_export [<number of objects>]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from unittest.mock import patch
+
+from models.engine.file_storage import FileStorage
+from models.place import Place
+
+
+def print_all(storage, file):
+    """Writes the places like `all Place` does."""
+    print([obj.__str__() for obj in storage.all(Place).values()], file=file)
+
+
+def export(storage, file):
+    """Writes the places as JSON lines."""
+    storage.export(file, Place)
+
+
+def main():
+    """Writes the places both ways and prints duration and peak memory."""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print("{} places".format(count))
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = FileStorage()
+        storage._FileStorage__file_path = os.path.join(tmp, 'objects.json')
+        storage._FileStorage__objects = dict()
+        storage.reload()
+        with patch('models.base_model.storage', storage):
+            storage.bulk_create(Place, count, name='Seed', number_rooms=2)
+        for name, write in (('all', print_all), ('export', export)):
+            with open(os.devnull, 'w') as file:
+                tracemalloc.start()
+                start = time.perf_counter()
+                write(storage, file)
+                seconds = time.perf_counter() - start
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            print("{:<7} {:7.2f} s  peak {:8.1f} MB".format(
+                name, seconds, peak / 1024 / 1024))
+
+
+if __name__ == "__main__":
+    main()
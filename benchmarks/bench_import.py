@@ -0,0 +1,65 @@
+#!/usr/bin/python3
+"""Measures the throughput of `Importer` on JSONL and CSV files.
+
+Each file is imported into an empty private storage in journal mode, so
+a batch appends only its own records, with several batch sizes.
+
+Usage: python3 -m benchmarks.bench_import [<number of records>]
+"""
+import json
+import os
+import sys
+import tempfile
+
+from models.engine.file_storage import FileStorage
+from models.engine.importer import Importer
+from models.engine.journal import Journal
+
+
+def write_files(directory, count):
+    """Writes `count` places to a JSONL and a CSV file, returns both."""
+    jsonl = os.path.join(directory, 'places.jsonl')
+    with open(jsonl, 'w', encoding='utf-8') as file:
+        for i in range(count):
+            file.write(json.dumps({'__class__': 'Place',
+                                   'name': 'Place {}'.format(i),
+                                   'number_rooms': i % 5,
+                                   'latitude': 37.7, 'longitude': -122.4}))
+            file.write('\n')
+    csv = os.path.join(directory, 'places.csv')
+    with open(csv, 'w', encoding='utf-8') as file:
+        file.write('name,number_rooms,latitude,longitude\n')
+        for i in range(count):
+            file.write('Place {},{},37.7,-122.4\n'.format(i, i % 5))
+    return jsonl, csv
+
+
+def run(directory, file_path, batch_size):
+    """Imports a file into a fresh storage and returns the report."""
+    objects_path = os.path.join(directory, 'objects.json')
+    storage = FileStorage()
+    storage._FileStorage__file_path = objects_path
+    storage._FileStorage__objects = dict()
+    storage.reload()
+    storage.journal = Journal(objects_path + '.journal', storage.durability)
+    report = Importer(storage, batch_size).run(file_path, 'Place')
+    storage.close()
+    return report
+
+
+def main():
+    """Imports both files with every batch size and prints the rates."""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    print("{} records".format(count))
+    with tempfile.TemporaryDirectory() as tmp:
+        for file_path in write_files(tmp, count):
+            for batch_size in (1000, 10000, count):
+                with tempfile.TemporaryDirectory() as out:
+                    report = run(out, file_path, batch_size)
+                print("{:<6} batch {:>7}  {:7.2f} s  {:9.0f} records/s"
+                      .format(os.path.splitext(file_path)[1][1:],
+                              batch_size, report['seconds'], report['rate']))
+
+
+if __name__ == "__main__":
+    main()
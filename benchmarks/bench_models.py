@@ -0,0 +1,85 @@
+#!/usr/bin/python3
+"""Compares the memory taken by model objects in the compact layout and
+in the former one, an instance dict per object.
+
+Every declared field of every object is set, as after a reload.
+
+Usage: python3 -m benchmarks.bench_models [<number of objects>]
+"""
+import sys
+import tracemalloc
+import uuid
+from datetime import datetime
+
+from models.amenity import Amenity
+from models.base_model import BaseModel
+from models.city import City
+from models.place import Place
+from models.review import Review
+from models.state import State
+from models.user import User
+
+
+class DictAttributes(dict):
+    """Instance dict of the former layout."""
+    __slots__ = ('owner', 'changed')
+
+
+class DictModel():
+    """Object of the former layout, whose `__dict__` was a dict subclass.
+    """
+
+    def __init__(self, attrs):
+        """Stores `attrs` in an instance dict."""
+        attrs = DictAttributes(attrs)
+        attrs.owner = self
+        attrs.changed = None
+        object.__setattr__(self, '__dict__', attrs)
+
+
+def record(cls):
+    """Returns the attributes of an object of `cls` loaded from a file."""
+    attrs = {'id': str(uuid.uuid4()), 'created_at': datetime.now(),
+             'updated_at': datetime.now()}
+    attrs.update(cls.__fields__)
+    return attrs
+
+
+def measure(build, cls, count):
+    """Returns the bytes retained per object built by `build`."""
+    records = [record(cls) for i in range(count)]
+    tracemalloc.start()
+    objects = [build(cls, attrs) for attrs in records]
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return retained / count
+
+
+def compact(cls, attrs):
+    """Builds an object in the compact layout."""
+    obj = cls.__new__(cls)
+    obj.__dict__.restore(attrs, None)
+    return obj
+
+
+def former(cls, attrs):
+    """Builds an object in the former layout."""
+    return DictModel(attrs)
+
+
+def main():
+    """Measures both layouts for every model and prints the results."""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print("{} objects per model, bytes per object besides the values"
+          .format(count))
+    for cls in (BaseModel, User, State, City, Amenity, Place, Review):
+        before = measure(former, cls, count)
+        after = measure(compact, cls, count)
+        print("{:<10} {:3} attributes  dict {:6.0f}  compact {:6.0f}"
+              "  saved {:4.0%}".format(cls.__name__, len(record(cls)),
+                                       before, after, 1 - after / before))
+
+
+if __name__ == "__main__":
+    main()
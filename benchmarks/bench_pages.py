@@ -0,0 +1,57 @@
+#!/usr/bin/python3
+"""Measures `all Place` against pages of `all Place limit=<n> after=<id>`.
+
+The first page also declares the ordered index on `id`; later pages
+only pay for a binary search and their own objects.
+
+Usage: python3 -m benchmarks.bench_pages [<number of objects>]
+"""
+import io
+import os
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+from console import HBNBCommand
+from models.engine.file_storage import FileStorage
+from models.place import Place
+
+
+def run(command):
+    """Returns the output and duration of a console command."""
+    with patch('sys.stdout', new=io.StringIO()) as output:
+        start = time.perf_counter()
+        HBNBCommand().onecmd(command)
+        seconds = time.perf_counter() - start
+    return output.getvalue(), seconds
+
+
+def main():
+    """Lists the places whole and page by page and prints the durations."""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print("{} places".format(count))
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = FileStorage()
+        storage._FileStorage__file_path = os.path.join(tmp, 'objects.json')
+        storage._FileStorage__objects = dict()
+        storage.reload()
+        with patch('models.base_model.storage', storage), \
+                patch('console.storage', storage):
+            storage.bulk_create(Place, count, name='Seed')
+            output, seconds = run('all Place')
+            print("all            {:8.1f} ms  {:6.1f} MB".format(
+                seconds * 1000, len(output) / 1024 / 1024))
+            after = ''
+            for page in range(1, 6):
+                command = 'all Place limit=100'
+                if after != '':
+                    command += ' after=' + after
+                output, seconds = run(command)
+                after = eval(output)[-1].split()[1][1:-1]
+                print("page {} of 100  {:8.1f} ms".format(page,
+                                                          seconds * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/python3
+"""Compares the console parser with the regex and shlex one it replaced.
+
+Both read the same mix of commands, in the two forms, down to the
+command name and the list of arguments handed to its handler.
+
+Usage: python3 -m benchmarks.bench_parse [<number of commands>]
+"""
+import re
+import sys
+import time
+from shlex import split
+
+from console import Command, parse
+
+LINES = [
+    'create Place name="My_house" number_rooms=4 latitude=37.77',
+    'show Place 2dd6ef5c-467c-4f82-9521-a772ea7d84e9',
+    'all Place',
+    'update Place 2dd6ef5c-467c-4f82-9521-a772ea7d84e9 name "My house"',
+    "update Place 2dd6ef5c-467c-4f82-9521-a772ea7d84e9 {'max_guest': 9}",
+    'Place.all()',
+    'Place.count()',
+    'Place.show("2dd6ef5c-467c-4f82-9521-a772ea7d84e9")',
+    'Place.update("2dd6ef5c-467c-4f82-9521-a772ea7d84e9", max_guest, 9)',
+    "Place.update(2dd6ef5c-467c-4f82-9521-a772ea7d84e9, {'name': 'Loft'})",
+]
+
+CALLS = {"all", "show", "destroy", "count", "update", "near", "where"}
+
+
+def legacy_parse(arg):
+    """Splits arguments the way the console did before."""
+    curly_braces = re.search(r"\{(.*?)\}", arg)
+    brackets = re.search(r"\[(.*?)\]", arg)
+    if curly_braces is None:
+        if brackets is None:
+            return [i.strip(",") for i in split(arg)]
+        else:
+            lexer = split(arg[:brackets.span()[0]])
+            retl = [i.strip(",") for i in lexer]
+            retl.append(brackets.group())
+            return retl
+    else:
+        lexer = split(arg[:curly_braces.span()[0]])
+        retl = [i.strip(",") for i in lexer]
+        retl.append(curly_braces.group())
+        return retl
+
+
+def legacy(line):
+    """Reads a line the way `cmd` and the console did before."""
+    line = line.strip()
+    i = 0
+    while i < len(line) and (line[i].isalnum() or line[i] == '_'):
+        i += 1
+    name, arg = line[:i], line[i:].strip()
+    if name in CALLS or name == 'create':
+        return name, legacy_parse(arg)
+    match = re.search(r"\.", line)
+    if match is not None:
+        argl = [line[:match.span()[0]], line[match.span()[1]:]]
+        match = re.search(r"\((.*?)\)", argl[1])
+        if match is not None:
+            command = [argl[1][:match.span()[0]], match.group()[1:-1]]
+            if command[0] in CALLS:
+                return command[0], legacy_parse(
+                    "{} {}".format(argl[0], command[1]))
+    return None, None
+
+
+def compiled(line):
+    """Reads a line with `Command` and `parse`."""
+    command = Command.parse(line)
+    return command.name, parse(command.text)
+
+
+def main():
+    """Parses the commands both ways and prints the rates."""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    lines = (LINES * (count // len(LINES) + 1))[:count]
+    print("{} commands".format(count))
+    for name, read in (('regex+shlex', legacy), ('compiled', compiled)):
+        start = time.perf_counter()
+        for line in lines:
+            read(line)
+        seconds = time.perf_counter() - start
+        print("{:<12} {:7.2f} s  {:9.0f} commands/s".format(
+            name, seconds, count / seconds))
+
+
+if __name__ == "__main__":
+    main()
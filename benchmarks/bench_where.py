@@ -0,0 +1,59 @@
+#!/usr/bin/python3
+"""Compares `where` queries answered from indexes with full scans.
+
+The places are spread over 1000 cities; `city_id` has the hash index
+declared by `Place` and `price_by_night` gets an ordered index.
+
+Usage: python3 -m benchmarks.bench_where [<number of objects>]
+"""
+import os
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+from models.engine import query
+from models.engine.file_storage import FileStorage
+from models.place import Place
+
+QUERIES = ('city_id="city-7"',
+           'city_id="city-7", price_by_night>250',
+           'price_by_night>=100 and price_by_night<102',
+           'max_guest in [3, 4], city_id in ["city-1", "city-2"]',
+           'name="Place 5"')
+
+
+def main():
+    """Runs every query with and without its indexes."""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    print("{} places".format(count))
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = FileStorage()
+        storage._FileStorage__file_path = os.path.join(tmp, 'objects.json')
+        storage._FileStorage__objects = dict()
+        storage.reload()
+        with patch('models.base_model.storage', storage):
+            for city in range(1000):
+                storage.bulk_create(Place, count // 1000,
+                                    city_id='city-{}'.format(city),
+                                    price_by_night=city % 500,
+                                    max_guest=city % 7)
+        storage.add_index(Place, 'price_by_night', 'ordered')
+        scan = query.Plan('scan', None, count,
+                          lambda: storage.all(Place).values(), [])
+        for text in QUERIES:
+            predicates = query.parse(text)
+            chosen = query.plan(storage, Place, predicates)
+            scan.predicates = predicates
+            timings = []
+            for way in (chosen, scan):
+                start = time.perf_counter()
+                found = way.run()
+                timings.append(time.perf_counter() - start)
+            print("{}\n  {!r}: {:8.2f} ms, scan {:8.2f} ms, {} found".format(
+                text, chosen, timings[0] * 1000, timings[1] * 1000,
+                len(found)))
+
+
+if __name__ == "__main__":
+    main()
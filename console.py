@@ -1,9 +1,13 @@
 #!/usr/bin/python3
 """Defines HBnB console."""
+import ast
 import cmd
+import os
 import re
-from shlex import split
+import sys
 from models import storage
+from models.engine import compute
+from models.engine.importer import Importer
 from models.base_model import BaseModel
 from models.user import User
 from models.state import State
@@ -12,23 +16,109 @@ from models.place import Place
 from models.amenity import Amenity
 from models.review import Review
 
+# A line: '<class>.<command>(<arguments>)' or '<command> <arguments>'.
+LINE = re.compile(r"""(?:
+    (?P<cls>[^\s.(]*)\.(?P<call>\w+)\((?P<args>.*)\)
+    |(?P<name>\?|[A-Za-z0-9_]*)\s*(?P<text>.*)
+)\Z""", re.VERBOSE | re.DOTALL)
+
+# One argument: a {...} or [...] group, or a run of plain characters,
+# quoted strings and escaped characters; anything else is an error.
+TOKEN = re.compile(r"""\s*(?:
+    (?P<group>\{[^}]*\}|\[[^\]]*\])
+    |(?P<word>(?:[^\s"'\\{\[]+|"(?:[^"\\]|\\.)*"|'[^']*'|\\.
+                 |\{(?![^}]*\})|\[(?![^\]]*\]))+)
+    |(?P<error>\S)
+)""", re.VERBOSE | re.DOTALL)
+
+# The quoted and escaped parts of a word.
+PIECE = re.compile(r""""((?:[^"\\]|\\.)*)"|'([^']*)'|\\(.)""", re.DOTALL)
+# The escapes undone inside double quotes, the ones `shlex.split` undoes.
+ESCAPE = re.compile(r'\\([\\"])')
+
+
+class Command():
+    """A console line, split into its command and the text of its
+    arguments.
+
+    '<class>.<command>(<arguments>)' reads as '<command> <class>
+    <arguments>'; `HBNBCommand` only accepts it for some commands.
+
+    Attributes:
+        name (str): name of the command, '' if the line does not start
+            with one
+        text (str): arguments, as they are handed to do_<name>
+        call (bool): True for the '<class>.<command>(...)' form
+        line (str): the line without surrounding spaces
+
+    """
+    __slots__ = ('name', 'text', 'call', 'line')
+
+    def __init__(self, name, text, call, line):
+        """Constructor for the `Command` class.
+
+        Args:
+            name (str): name of the command
+            text (str): text of the arguments
+            call (bool): True for the '<class>.<command>(...)' form
+            line (str): the line without surrounding spaces
+
+        """
+        self.name = name
+        self.text = text
+        self.call = call
+        self.line = line
+
+    @classmethod
+    def parse(cls, line):
+        """Returns the `Command` of a line, '?' standing for 'help'."""
+        line = line.strip()
+        match = LINE.match(line)
+        if match.group('call') is not None:
+            return cls(match.group('call'), "{} {}".format(
+                match.group('cls'), match.group('args')), True, line)
+        name = match.group('name')
+        if name == '?':
+            name = 'help'
+        return cls(name, match.group('text'), False, line)
+
 
 def parse(arg):
-    curly_braces = re.search(r"\{(.*?)\}", arg)
-    brackets = re.search(r"\[(.*?)\]", arg)
-    if curly_braces is None:
-        if brackets is None:
-            return [i.strip(",") for i in split(arg)]
-        else:
-            lexer = split(arg[:brackets.span()[0]])
-            retl = [i.strip(",") for i in lexer]
-            retl.append(brackets.group())
-            return retl
-    else:
-        lexer = split(arg[:curly_braces.span()[0]])
-        retl = [i.strip(",") for i in lexer]
-        retl.append(curly_braces.group())
-        return retl
+    """Splits the arguments of a command in a single pass.
+
+    Arguments are separated by spaces and stripped of surrounding commas,
+    and their quoted parts are unquoted like `shlex.split` does.  A {...}
+    or [...] group is kept as it is written and ends the arguments.
+
+    Raises:
+        ValueError: if a quote is not closed or the text ends with a
+            backslash
+
+    """
+    args = []
+    for match in TOKEN.finditer(arg):
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind == 'group':
+            args.append(text)
+            break
+        if kind == 'error':
+            raise ValueError("No closing quotation" if text != "\\"
+                             else "No escaped character")
+        if '"' in text or "'" in text or "\\" in text:
+            text = PIECE.sub(_unquote, text)
+        args.append(text.strip(","))
+    return args
+
+
+def _unquote(match):
+    """Returns the text of a quoted string or escaped character."""
+    double, single, escaped = match.groups()
+    if double is not None:
+        return ESCAPE.sub(r"\1", double)
+    if single is not None:
+        return single
+    return escaped
 
 
 class HBNBCommand(cmd.Cmd):
@@ -39,50 +129,84 @@ class HBNBCommand(cmd.Cmd):
     """
 
     prompt = "(hbnb) "
-    __classes = {
-        "BaseModel",
-        "User",
-        "State",
-        "City",
-        "Place",
-        "Amenity",
-        "Review"
-    }
+    __classes = {cls.__name__: cls for cls in
+                 (BaseModel, User, State, City, Place, Amenity, Review)}
+    __calls = {"all", "show", "destroy", "count", "update", "near", "where"}
 
     def emptyline(self):
         """Do nothing when receiving an empty line."""
         pass
 
+    def parseline(self, line):
+        """Splits a line with `Command`, only reading the
+        <class>.<command>(...) form for the commands in __calls."""
+        command = Command.parse(line)
+        if command.call is True and command.name not in HBNBCommand.__calls:
+            return None, None, command.line
+        return command.name, command.text, command.line
+
     def default(self, arg):
         """Default behavior for cmd module when input an invalid"""
-        argdict = {
-            "all": self.do_all,
-            "show": self.do_show,
-            "destroy": self.do_destroy,
-            "count": self.do_count,
-            "update": self.do_update
-        }
-        match = re.search(r"\.", arg)
-        if match is not None:
-            argl = [arg[:match.span()[0]], arg[match.span()[1]:]]
-            match = re.search(r"\((.*?)\)", argl[1])
-            if match is not None:
-                command = [argl[1][:match.span()[0]], match.group()[1:-1]]
-                if command[0] in argdict.keys():
-                    call = "{} {}".format(argl[0], command[1])
-                    return argdict[command[0]](call)
         print("*** Unknown syntax: {}".format(arg))
         return False
 
     def do_quit(self, arg):
         """Quit command to exit program."""
+        storage.flush()
         return True
 
     def do_EOF(self, arg):
         """EOF signal to exit program."""
         print("")
+        storage.flush()
         return True
 
+    def do_begin(self, arg):
+        """Usage: begin
+        Start a transaction: changes are saved once, on commit."""
+        storage.begin()
+
+    def do_commit(self, arg):
+        """Usage: commit
+        Save the changes made since begin and end the transaction."""
+        try:
+            storage.commit()
+        except RuntimeError:
+            print("** no transaction in progress **")
+
+    def do_rollback(self, arg):
+        """Usage: rollback
+        Undo the changes made since begin and end the transaction."""
+        try:
+            storage.rollback()
+        except RuntimeError:
+            print("** no transaction in progress **")
+
+    def do_compute(self, arg):
+        """Usage: compute <class> <aggregate>, ... [by <attribute>]
+        [where <conditions>]
+        Compute count, sum(a), avg(a), min(a), max(a) or percentile(a, p)
+        over the instances of class, per value of the by attribute, and
+        print one line per group, e.g.
+        compute Place count, avg(price_by_night) by city_id."""
+        argl = arg.split(None, 1)
+        if len(argl) == 0:
+            print("** class name missing **")
+        elif argl[0] not in HBNBCommand.__classes:
+            print("** class doesn't exist **")
+        elif len(argl) == 1:
+            print("** aggregate missing **")
+        else:
+            try:
+                aggregates, by, where = compute.parse(argl[1])
+                results = compute.compute(storage, argl[0], aggregates, by,
+                                          where)
+            except ValueError as e:
+                print("** invalid computation: {} **".format(e))
+                return False
+            for result in results:
+                print(result)
+
     def do_create(self, arg):
         """Usage: create <class>
         Create new class instance and print its id.
@@ -93,68 +217,239 @@ class HBNBCommand(cmd.Cmd):
         elif argl[0] not in HBNBCommand.__classes:
             print("** class doesn't exist **")
         else:
-            print(eval(argl[0])().id)
+            print(HBNBCommand.__classes[argl[0]]().id)
             storage.save()
 
+    def do_create_many(self, arg):
+        """Usage: create_many <class> <count> [<attribute>=<value> ...]
+        Create count instances of class with the given attributes, save
+        them once and print how many were created.
+        """
+        argl = parse(arg)
+        if len(argl) == 0:
+            print("** class name missing **")
+        elif argl[0] not in HBNBCommand.__classes:
+            print("** class doesn't exist **")
+        elif len(argl) == 1:
+            print("** count missing **")
+        elif not argl[1].isdigit():
+            print("** invalid count **")
+        else:
+            cls = HBNBCommand.__classes[argl[0]]
+            attrs = {}
+            for pair in argl[2:]:
+                key, sep, value = pair.partition("=")
+                if (sep == "" or key == "" or
+                        key in ("id", "created_at", "updated_at")):
+                    print("** invalid attribute: {} **".format(pair))
+                    return False
+                if type(cls.__fields__.get(key)) in {str, int, float}:
+                    try:
+                        value = type(cls.__fields__[key])(value)
+                    except ValueError:
+                        print("** invalid value: {} **".format(pair))
+                        return False
+                attrs[key] = value
+            print(len(storage.bulk_create(cls, int(argl[1]), **attrs)))
+
+    def do_import(self, arg):
+        """Usage: import <file> [<class>]
+        Import the objects of a JSONL or CSV file, saved in batches, and
+        print the progress. Records without a __class__ are created as
+        class. A failed import resumes where it stopped when run again.
+        """
+        argl = parse(arg)
+        if len(argl) == 0:
+            print("** file name missing **")
+        elif len(argl) > 1 and argl[1] not in HBNBCommand.__classes:
+            print("** class doesn't exist **")
+        elif not os.path.isfile(argl[0]):
+            print("** file doesn't exist **")
+        else:
+            importer = Importer(storage, progress=self.__progress)
+            try:
+                importer.run(argl[0], argl[1] if len(argl) > 1 else None)
+            except (ValueError, RuntimeError) as e:
+                print("** {} **".format(e))
+
+    @staticmethod
+    def __progress(report):
+        """Prints the progress of an import."""
+        print("{} imported, {} skipped, {:.0f} records/s".format(
+            report["records"], report["skipped"], report["rate"]))
+
+    def do_export(self, arg):
+        """Usage: export [<class>] [attrs=<attribute>,...] [file=<path>]
+        Write the objects of class, or all objects, as JSON lines, with
+        only the given attributes if any, to the file or the output. The
+        number of objects is printed when writing to a file.
+        """
+        argl = parse(arg)
+        cls = None
+        if len(argl) > 0 and "=" not in argl[0]:
+            if argl[0] not in HBNBCommand.__classes:
+                print("** class doesn't exist **")
+                return False
+            cls = argl.pop(0)
+        options = {"attrs": None, "file": None}
+        for pair in argl:
+            key, sep, value = pair.partition("=")
+            if key not in options or value == "":
+                print("** invalid argument: {} **".format(pair))
+                return False
+            options[key] = value
+        attrs = options["attrs"]
+        if attrs is not None:
+            attrs = attrs.split(",")
+        if options["file"] is None:
+            storage.export(sys.stdout, cls, attrs)
+        else:
+            with storage.durability.replace(options["file"]) as f:
+                print(storage.export(f, cls, attrs))
+
     def do_show(self, arg):
         """Usage: show <class> <id> or <class>.show(<id>)
         Display string representation of class instance of given id.
         """
         argl = parse(arg)
-        objdict = storage.all()
         if len(argl) == 0:
             print("** class name missing **")
         elif argl[0] not in HBNBCommand.__classes:
             print("** class doesn't exist **")
         elif len(argl) == 1:
             print("** instance id missing **")
-        elif "{}.{}".format(argl[0], argl[1]) not in objdict:
-            print("** no instance found **")
         else:
-            print(objdict["{}.{}".format(argl[0], argl[1])])
+            obj = storage.get(argl[0], argl[1])
+            if obj is None:
+                print("** no instance found **")
+            else:
+                print(obj)
 
     def do_destroy(self, arg):
         """Usage: destroy <class> <id> or <class>.destroy(<id>)
         Delete a class instanc of given id."""
         argl = parse(arg)
-        objdict = storage.all()
         if len(argl) == 0:
             print("** class name missing **")
         elif argl[0] not in HBNBCommand.__classes:
             print("** class doesn't exist **")
         elif len(argl) == 1:
             print("** instance id missing **")
-        elif "{}.{}".format(argl[0], argl[1]) not in objdict.keys():
-            print("** no instance found **")
         else:
-            del objdict["{}.{}".format(argl[0], argl[1])]
-            storage.save()
+            obj = storage.get(argl[0], argl[1])
+            if obj is None:
+                print("** no instance found **")
+            else:
+                storage.delete(obj)
+                storage.save()
 
     def do_all(self, arg):
         """Usage: all or all <class> or <class>.all()
         Display string representations of instances of given class.
-        If no class specified, displays an instantiated objects."""
+        If no class specified, displays an instantiated objects.
+        Options: limit=<n> and after=<id> show one page in order of id,
+        attrs=<attribute>,... only shows the given attributes."""
         argl = parse(arg)
-        if len(argl) > 0 and argl[0] not in HBNBCommand.__classes:
+        cls = None
+        if len(argl) > 0 and "=" not in argl[0]:
+            if argl[0] not in HBNBCommand.__classes:
+                print("** class doesn't exist **")
+                return False
+            cls = argl.pop(0)
+        options = {"limit": None, "after": None, "attrs": None}
+        for pair in argl:
+            key, sep, value = pair.partition("=")
+            if key not in options or value == "":
+                print("** invalid argument: {} **".format(pair))
+                return False
+            options[key] = value
+        limit = options["limit"]
+        if limit is not None:
+            if not limit.isdigit():
+                print("** invalid limit **")
+                return False
+            limit = int(limit)
+        if limit is None and options["after"] is None:
+            objects = storage.all(cls).values()
+        else:
+            objects = storage.page(cls, options["after"], limit)
+        attrs = options["attrs"]
+        if attrs is not None:
+            attrs = attrs.split(",")
+        self.__print_objects(objects, attrs)
+
+    @staticmethod
+    def __print_objects(objects, attrs=None):
+        """Prints objects one at a time, in the format of print(list)."""
+        sep = "["
+        for obj in objects:
+            if attrs is None:
+                text = obj.__str__()
+            else:
+                values = obj.__dict__
+                text = "[{}] ({}) {}".format(
+                    type(obj).__name__, obj.id,
+                    {attr: values[attr] if attr in values
+                     else obj.__fields__[attr] for attr in attrs
+                     if attr in values or attr in obj.__fields__})
+            sys.stdout.write(sep + repr(text))
+            sep = ", "
+        sys.stdout.write("[]\n" if sep == "[" else "]\n")
+
+    def do_where(self, arg):
+        """Usage: where <class> <conditions> or <class>.where(<conditions>)
+        Display the instances of class matching every condition, e.g.
+        city_id="0001", price_by_night>100 and max_guest in [2, 4].
+        Operators: = == < <= > >= in, joined by , or and."""
+        argl = arg.split(None, 1)
+        if len(argl) == 0:
+            print("** class name missing **")
+        elif argl[0] not in HBNBCommand.__classes:
             print("** class doesn't exist **")
         else:
-            objl = []
-            for obj in storage.all().values():
-                if len(argl) > 0 and argl[0] == obj.__class__.__name__:
-                    objl.append(obj.__str__())
-                elif len(argl) == 0:
-                    objl.append(obj.__str__())
-            print(objl)
+            try:
+                objects = storage.where(argl[0], argl[1] if len(argl) > 1
+                                        else "")
+            except ValueError as e:
+                print("** invalid query: {} **".format(e))
+                return False
+            self.__print_objects(objects)
 
     def do_count(self, arg):
         """Usage: count <class> or <class>.count()
         Retrieve the number of instances of given class."""
         argl = parse(arg)
-        count = 0
-        for obj in storage.all().values():
-            if argl[0] == obj.__class__.__name__:
-                count += 1
-        print(count)
+        if len(argl) == 0:
+            print("** class name missing **")
+        else:
+            print(storage.count(argl[0]))
+
+    def do_near(self, arg):
+        """Usage: near <class> <latitude> <longitude> <radius_km> [<k>] or
+       <class>.near(<latitude>, <longitude>, <radius_km>[, <k>])
+        Display instances of given class within radius_km of a point,
+        nearest first, or only the k nearest of them."""
+        argl = parse(arg)
+        if len(argl) == 0:
+            print("** class name missing **")
+        elif argl[0] not in HBNBCommand.__classes:
+            print("** class doesn't exist **")
+        elif len(argl) < 4:
+            print("** coordinates missing **")
+        else:
+            try:
+                lat, lon, radius = (float(i) for i in argl[1:4])
+                k = int(argl[4]) if len(argl) > 4 else None
+            except ValueError:
+                print("** invalid coordinates **")
+                return False
+            if k is None:
+                found = storage.near(argl[0], lat, lon, radius)
+            else:
+                found = [(d, obj) for d, obj
+                         in storage.k_nearest(argl[0], lat, lon, k)
+                         if d <= radius]
+            print([obj.__str__() for d, obj in found])
 
     def do_update(self, arg):
         """Usage: update <class> <id> <attribute_name> <attribute_value> or
@@ -163,7 +458,6 @@ class HBNBCommand(cmd.Cmd):
         Update class instance of an given id by adding or updating
         an given attribute key/value pair or dictionary."""
         argl = parse(arg)
-        objdict = storage.all()
 
         if len(argl) == 0:
             print("** class name missing **")
@@ -174,7 +468,8 @@ class HBNBCommand(cmd.Cmd):
         if len(argl) == 1:
             print("** instance id missing **")
             return False
-        if "{}.{}".format(argl[0], argl[1]) not in objdict.keys():
+        obj = storage.get(argl[0], argl[1])
+        if obj is None:
             print("** no instance found **")
             return False
         if len(argl) == 2:
@@ -182,27 +477,24 @@ class HBNBCommand(cmd.Cmd):
             return False
         if len(argl) == 3:
             try:
-                type(eval(argl[2])) != dict
-            except NameError:
+                attrs = ast.literal_eval(argl[2])
+            except (ValueError, TypeError, SyntaxError):
+                attrs = None
+            if type(attrs) is not dict:
                 print("** value missing **")
                 return False
-
-        if len(argl) == 4:
-            obj = objdict["{}.{}".format(argl[0], argl[1])]
-            if argl[2] in obj.__class__.__dict__.keys():
-                valtype = type(obj.__class__.__dict__[argl[2]])
-                obj.__dict__[argl[2]] = valtype(argl[3])
-            else:
-                obj.__dict__[argl[2]] = argl[3]
-        elif type(eval(argl[2])) == dict:
-            obj = objdict["{}.{}".format(argl[0], argl[1])]
-            for k, v in eval(argl[2]).items():
-                if (k in obj.__class__.__dict__.keys() and
-                        type(obj.__class__.__dict__[k]) in {str, int, float}):
-                    valtype = type(obj.__class__.__dict__[k])
+            for k, v in attrs.items():
+                if (k in obj.__fields__ and
+                        type(obj.__fields__[k]) in {str, int, float}):
+                    valtype = type(obj.__fields__[k])
                     obj.__dict__[k] = valtype(v)
                 else:
                     obj.__dict__[k] = v
+        elif argl[2] in obj.__fields__:
+            valtype = type(obj.__fields__[argl[2]])
+            obj.__dict__[argl[2]] = valtype(argl[3])
+        else:
+            obj.__dict__[argl[2]] = argl[3]
         storage.save()
 
 
@@ -1,6 +1,22 @@
 #!/usr/bin/python3
 """initializes the storage mechanism"""
+from os import getenv
+
 from .engine.file_storage import FileStorage
 
-storage = FileStorage()
+if getenv('HBNB_TYPE_STORAGE') == 'db':
+    from .engine.db_storage import DBStorage
+    storage = DBStorage(lazy=getenv('HBNB_LAZY') == '1',
+                        durability=getenv('HBNB_DURABILITY', 'flush'))
+else:
+    shards = getenv('HBNB_SHARDS')
+    write_behind = getenv('HBNB_WRITE_BEHIND')
+    storage = FileStorage(journal=getenv('HBNB_JOURNAL') == '1',
+                          lazy=getenv('HBNB_LAZY') == '1',
+                          file_format=getenv('HBNB_FORMAT', 'json'),
+                          shards=int(shards) if shards else None,
+                          write_behind=(float(write_behind) if write_behind
+                                        else None),
+                          flush_after=int(getenv('HBNB_FLUSH_AFTER', 100)),
+                          durability=getenv('HBNB_DURABILITY', 'flush'))
 storage.reload()
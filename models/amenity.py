@@ -10,4 +10,6 @@ class Amenity(BaseModel):
         name (str)
     """
 
+    __slots__ = ()
+
     name = ""
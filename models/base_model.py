@@ -1,21 +1,455 @@
 #!/usr/bin/python3
 """Acts as a foundation for other classes"""
 from . import storage
-from datetime import datetime
+from . import timestamps
+from collections.abc import MutableMapping
+from copy import deepcopy
+import os
 import uuid
 
 
+# Attributes every object has, stored in the row of every class.
+COMMON = ('id', 'created_at', 'updated_at')
+
+# Attributes stored as `timestamps` ints and read as datetimes.
+STAMPS = ('created_at', 'updated_at')
+
+# Number of attribute orders kept per class; past it, new attributes go to
+# the overflow dict of their object.
+MAX_SHAPES = 256
+
+# Ids made from each read of random bytes by `new_ids`.
+ID_BATCH = 4096
+
+# Variant digit of a version 4 UUID for each random hex digit.
+VARIANT = {digit: '89ab'[int(digit, 16) & 3] for digit in '0123456789abcdef'}
+
+# Types of the values `build_many` shares between objects; any other value
+# is copied for each object.
+IMMUTABLE = (str, int, float, bool, type(None))
+
+_set = object.__setattr__
+
+
+def new_ids(count):
+    """Yields `count` random ids formatted like `str(uuid.uuid4())`.
+
+    The random bytes are read ID_BATCH ids at a time instead of once per
+    id.
+
+    Args:
+        count (int): number of ids
+
+    """
+    while count > 0:
+        batch = min(count, ID_BATCH)
+        digits = os.urandom(16 * batch).hex()
+        for i in range(0, 32 * batch, 32):
+            h = digits[i:i + 32]
+            yield '{}-{}-4{}-{}{}-{}'.format(h[:8], h[8:12], h[13:16],
+                                             VARIANT[h[16]], h[17:20],
+                                             h[20:])
+        count -= batch
+
+
+class Shape():
+    """Names of the attributes held in the row of an object, in the order
+    they were set.
+
+    Objects of a class that set the same attributes in the same order
+    share one `Shape`, so each of them only stores a list of values.
+
+    Attributes:
+        layout (Layout): layout of the class the shape belongs to
+        keys (tuple): attribute names, in insertion order
+        index (dict): {attribute name: position in `keys`}
+
+    """
+    __slots__ = ('layout', 'keys', 'index', 'added')
+
+    def __init__(self, layout, keys):
+        """Constructor for the `Shape` class.
+
+        Args:
+            layout (Layout): layout of the class
+            keys (tuple): attribute names, in insertion order
+
+        """
+        self.layout = layout
+        self.keys = keys
+        self.index = {key: i for i, key in enumerate(keys)}
+        self.added = dict()
+
+    def add(self, key):
+        """Returns the shape with `key` appended, None if `key` cannot be
+        held in the row."""
+        shape = self.added.get(key)
+        if shape is None and key in self.layout.names:
+            shape = self.layout.shape(self.keys + (key,))
+            if shape is not None:
+                self.added[key] = shape
+        return shape
+
+
+class Layout():
+    """Shapes of the objects of one model class.
+
+    Attributes:
+        names (frozenset): attributes that can be held in a row: the common
+            ones and the fields declared on the class
+        shapes (dict): {keys: Shape} of the shapes in use
+        empty (Shape): shape of an object without attributes
+
+    """
+    __slots__ = ('names', 'shapes', 'empty')
+
+    def __init__(self, names):
+        """Constructor for the `Layout` class.
+
+        Args:
+            names (iterable): attributes that can be held in a row
+
+        """
+        self.names = frozenset(names)
+        self.shapes = dict()
+        self.empty = self.shape(())
+
+    def shape(self, keys):
+        """Returns the shared shape of `keys`, None once MAX_SHAPES shapes
+        are in use."""
+        shape = self.shapes.get(keys)
+        if shape is None and len(self.shapes) < MAX_SHAPES:
+            shape = self.shapes[keys] = Shape(self, keys)
+        return shape
+
+
+class Field():
+    """Class attribute standing for a field of the objects of a model.
+
+    Reading it on an object returns the value of the object, or the
+    default value declared on the class when the object has none; reading
+    it on the class returns the default value.
+
+    Attributes:
+        name (str): name of the field
+        default: value declared on the class, `Field.MISSING` if none
+
+    """
+    __slots__ = ('name', 'default')
+    MISSING = object()
+
+    def __init__(self, name, default=MISSING):
+        """Constructor for the `Field` class.
+
+        Args:
+            name (str): name of the field
+            default: value declared on the class
+
+        """
+        self.name = name
+        self.default = default
+
+    def __get__(self, obj, cls=None):
+        """Returns the value of the field on `obj`."""
+        if obj is None:
+            if self.default is Field.MISSING:
+                return self
+            return self.default
+        i = obj._shape.index.get(self.name)
+        if i is not None:
+            return obj._values[i]
+        extra = obj._extra
+        if extra is not None and self.name in extra:
+            return extra[self.name]
+        if self.default is Field.MISSING:
+            raise AttributeError(self.name)
+        return self.default
+
+    def __set__(self, obj, value):
+        """Stores the value of the field on `obj`."""
+        Attributes(obj)[self.name] = value
+
+    def __delete__(self, obj):
+        """Removes the value of the field from `obj`."""
+        try:
+            del Attributes(obj)[self.name]
+        except KeyError:
+            raise AttributeError(self.name) from None
+
+
+class Timestamp(Field):
+    """Field holding a `timestamps` int, read as a `datetime`.
+
+    Other values, such as strings assigned by hand, are returned as they
+    are.
+
+    """
+    __slots__ = ()
+
+    def __get__(self, obj, cls=None):
+        """Returns the value of the field on `obj`, as a `datetime` if it
+        is a timestamp."""
+        value = Field.__get__(self, obj, cls)
+        if type(value) is int:
+            return timestamps.to_datetime(value)
+        return value
+
+
+class Attributes(MutableMapping):
+    """`__dict__` of `BaseModel` objects, a view of their row and overflow
+    dict that records its writes.
+
+    Assignments through the object (`obj.name = ...`) and direct writes to
+    `obj.__dict__` both land here, so `storage` learns about every change,
+    and can copy the attributes beforehand when a transaction is open.
+    Iteration, `str` and `copy` follow the order the attributes were set
+    in, like a dict, and give the timestamps as datetimes.
+
+    Attributes:
+        owner (BaseModel): object whose attributes are stored
+        changed (set): names written since the last flush, None if none
+
+    """
+    __slots__ = ('owner',)
+
+    def __init__(self, owner):
+        """Constructor for the `Attributes` class.
+
+        Args:
+            owner (BaseModel): object whose attributes are viewed
+
+        """
+        self.owner = owner
+
+    @property
+    def changed(self):
+        """Names written since the last flush, None if none."""
+        return self.owner._changed
+
+    @changed.setter
+    def changed(self, changed):
+        _set(self.owner, '_changed', changed)
+
+    def __getitem__(self, key):
+        """Returns the value of attribute `key`."""
+        owner = self.owner
+        i = owner._shape.index.get(key)
+        if i is not None:
+            value = owner._values[i]
+        elif owner._extra is None:
+            raise KeyError(key)
+        else:
+            value = owner._extra[key]
+        if type(value) is int and key in STAMPS:
+            return timestamps.to_datetime(value)
+        return value
+
+    def __setitem__(self, key, value):
+        """Stores `value` and marks `key` as changed."""
+        storage.preserve(self.owner)
+        self.store(key, value)
+        self.mark(key)
+
+    def __delitem__(self, key):
+        """Removes `key` and marks it as changed."""
+        storage.preserve(self.owner)
+        self.discard(key)
+        self.mark(key)
+
+    def __contains__(self, key):
+        """Tells whether the object has attribute `key`."""
+        owner = self.owner
+        return key in owner._shape.index or (owner._extra is not None and
+                                             key in owner._extra)
+
+    def __iter__(self):
+        """Yields the attribute names, in the order they were set."""
+        yield from self.owner._shape.keys
+        if self.owner._extra is not None:
+            yield from self.owner._extra
+
+    def __len__(self):
+        """Returns the number of attributes."""
+        extra = self.owner._extra
+        return len(self.owner._values) + (0 if extra is None else len(extra))
+
+    def __repr__(self):
+        """Returns the representation of the attributes as a dict."""
+        return repr(self.copy())
+
+    def copy(self):
+        """Returns the attributes as a new dict."""
+        attrs = self.dump()
+        for key in STAMPS:
+            if type(attrs.get(key)) is int:
+                attrs[key] = timestamps.to_datetime(attrs[key])
+        return attrs
+
+    def dump(self):
+        """Returns the attributes as a new dict, with the timestamps left
+        as ints."""
+        owner = self.owner
+        attrs = dict(zip(owner._shape.keys, owner._values))
+        if owner._extra is not None:
+            attrs.update(owner._extra)
+        return attrs
+
+    def update(self, *args, **kwargs):
+        """Stores every given pair and marks their keys as changed."""
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def store(self, key, value):
+        """Stores `value` without recording the write.
+
+        A new attribute is appended to the row when the layout of the class
+        allows it, and to the overflow dict otherwise; once the overflow
+        dict is in use, new attributes all go there to keep their order.
+
+        """
+        owner = self.owner
+        shape = owner._shape
+        i = shape.index.get(key)
+        if i is not None:
+            owner._values[i] = value
+            return
+        extra = owner._extra
+        if extra is None:
+            added = shape.add(key)
+            if added is not None:
+                owner._values.append(value)
+                _set(owner, '_shape', added)
+                return
+            extra = dict()
+            _set(owner, '_extra', extra)
+        extra[key] = value
+
+    def discard(self, key):
+        """Removes `key` without recording the write.
+
+        Raises:
+            KeyError: if the object has no attribute `key`
+
+        """
+        owner = self.owner
+        shape = owner._shape
+        i = shape.index.get(key)
+        if i is None:
+            extra = owner._extra
+            if extra is None:
+                raise KeyError(key)
+            del extra[key]
+            if len(extra) == 0 and type(owner).__dictoffset__ == 0:
+                _set(owner, '_extra', None)
+            return
+        keys = shape.keys[:i] + shape.keys[i + 1:]
+        removed = shape.layout.shape(keys)
+        del owner._values[i]
+        if removed is not None:
+            _set(owner, '_shape', removed)
+            return
+        attrs = dict(zip(keys, owner._values))
+        if owner._extra is not None:
+            attrs.update(owner._extra)
+        self.restore(attrs, owner._changed)
+
+    def restore(self, attrs, changed):
+        """Replaces every attribute and the recorded writes, without
+        recording the change.
+
+        The objects of a class without `__slots__` have an instance dict,
+        which is used as their overflow dict and holds every attribute.
+
+        Args:
+            attrs (dict): attributes, in order
+            changed (set): names written since the last flush, or None
+
+        """
+        owner = self.owner
+        shape = type(owner).__layout__.empty
+        if type(owner).__dictoffset__ != 0:
+            extra = owner.__dict__
+            extra.clear()
+            extra.update(attrs)
+            _set(owner, '_shape', shape)
+            _set(owner, '_values', [])
+            _set(owner, '_extra', extra)
+            _set(owner, '_changed', changed)
+            return
+        values = []
+        extra = None
+        for key, value in attrs.items():
+            if extra is None:
+                added = shape.add(key)
+                if added is not None:
+                    shape = added
+                    values.append(value)
+                    continue
+                extra = dict()
+            extra[key] = value
+        _set(owner, '_shape', shape)
+        _set(owner, '_values', values.copy())
+        _set(owner, '_extra', extra)
+        _set(owner, '_changed', changed)
+
+    def mark(self, key):
+        """Records a write to `key` and lets `storage` know about it."""
+        owner = self.owner
+        if owner._changed is None:
+            _set(owner, '_changed', {key})
+        else:
+            owner._changed.add(key)
+        storage.touch(owner, key)
+
+
 class BaseModel():
     """Methods for `BaseModel` and its subclasses.
 
+    Objects have no instance dict.  Their attributes are stored in a list
+    of values described by a `Shape` shared with the other objects of the
+    class that set the same attributes in the same order, plus an overflow
+    dict for the attributes not declared on the class.  `__dict__` is an
+    `Attributes` view of both.  The attributes declared on a subclass are
+    turned into `Field` descriptors, their values becoming the defaults.
+    A subclass that does not declare `__slots__ = ()` gets an instance
+    dict, which then holds every attribute of its objects: `__dict__` is
+    that plain dict, and writes made straight to it are not tracked.
+    `created_at` and `updated_at` are kept as `timestamps` ints and only
+    turned into datetimes when they are read.  Copies and pickles are
+    rebuilt from the attributes, without registering in `storage`.
+
     Attributes:
         id (str): UUID assigned when an instance is created
         created_at (datetime.datetime): instance is created, the current date and time
             is created
         updated_at (datetime.datetime): instance is created the current datetime
             is created updated whenever an object is altered
+        __fields__ (dict): {name: default value} of the declared fields
+        __layout__ (Layout): shapes of the objects of the class
 
     """
+    __slots__ = ('_shape', '_values', '_extra', '_changed')
+    __fields__ = dict()
+
+    id = Field('id')
+    created_at = Timestamp('created_at')
+    updated_at = Timestamp('updated_at')
+
+    def __init_subclass__(cls, **kwargs):
+        """Turns the attributes declared on a model class into fields."""
+        super().__init_subclass__(**kwargs)
+        fields = dict(cls.__fields__)
+        for name, value in list(cls.__dict__.items()):
+            if name.startswith('_') or hasattr(value, '__get__'):
+                continue
+            fields[name] = value
+            setattr(cls, name, Field(name, value))
+        cls.__fields__ = fields
+        if cls.__dictoffset__ != 0:
+            cls.__layout__ = Layout(())
+        else:
+            cls.__layout__ = Layout(COMMON + tuple(fields))
+
     def __init__(self, *args, **kwargs):
         """Constructor for the `BaseModel` class.
 
@@ -25,17 +459,103 @@ class BaseModel():
 
         """
         if kwargs is None or len(kwargs) == 0:
-            self.id = str(uuid.uuid4())
-            self.created_at = datetime.now()
-            self.updated_at = datetime.now()
-            storage.new(self)
+            now = timestamps.now()
+            attrs = {'id': str(uuid.uuid4()),
+                     'created_at': now,
+                     'updated_at': now}
         else:
-            ISO_fmt = '%Y-%m-%dT%H:%M:%S.%f'
-            self.created_at = datetime.strptime(kwargs['created_at'], ISO_fmt)
-            self.updated_at = datetime.strptime(kwargs['updated_at'], ISO_fmt)
+            attrs = {
+                'created_at': timestamps.parse(kwargs['created_at']),
+                'updated_at': timestamps.parse(kwargs['updated_at'])
+            }
             for key, value in kwargs.items():
                 if key not in ('created_at', 'updated_at', '__class__'):
-                    self.__dict__[key] = value
+                    attrs[key] = value
+        Attributes(self).restore(attrs, None)
+        if kwargs is None or len(kwargs) == 0:
+            storage.new(self)
+
+    @property
+    def __dict__(self):
+        """`Attributes` view of the attributes of the object."""
+        return Attributes(self)
+
+    def __getattr__(self, name):
+        """Returns the attributes not declared on the class."""
+        if name in BaseModel.__slots__:
+            raise AttributeError(name)
+        try:
+            return Attributes(self)[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __reduce__(self):
+        """Returns how `copy` and `pickle` rebuild the object."""
+        return (_rebuild, (type(self), Attributes(self).dump()))
+
+    @classmethod
+    def build_many(cls, ids, **attrs):
+        """Yields new objects of the class, without registering them in
+        `storage`.
+
+        The objects are created now, share the shape of the first one and
+        the values of `attrs`, which makes this much faster than calling
+        the class once per object.  Mutable values, such as lists, are
+        copied for each object.
+
+        Args:
+            ids (iterable): id of every object
+            **attrs: attributes set on every object
+
+        Raises:
+            TypeError: if `attrs` holds `id`, `created_at` or `updated_at`
+
+        """
+        now = timestamps.now()
+        mutable = [name for name, value in attrs.items()
+                   if type(value) not in IMMUTABLE]
+        if cls.__dictoffset__ != 0:
+            for obj_id in ids:
+                obj = cls.__new__(cls)
+                values = dict(id=obj_id, created_at=now, updated_at=now,
+                              **attrs)
+                for name in mutable:
+                    values[name] = deepcopy(values[name])
+                Attributes(obj).restore(values, None)
+                yield obj
+            return
+        template = cls.__new__(cls)
+        Attributes(template).restore(
+            dict(id=None, created_at=now, updated_at=now, **attrs), None)
+        shape = template._shape
+        values = template._values[1:]
+        extra = template._extra
+        slots = [(shape.index.get(name), name) for name in mutable]
+        for obj_id in ids:
+            obj = cls.__new__(cls)
+            obj_values = [obj_id] + values
+            obj_extra = None if extra is None else extra.copy()
+            for slot, name in slots:
+                if slot is None:
+                    obj_extra[name] = deepcopy(extra[name])
+                else:
+                    obj_values[slot] = deepcopy(obj_values[slot])
+            _set(obj, '_shape', shape)
+            _set(obj, '_values', obj_values)
+            _set(obj, '_extra', obj_extra)
+            _set(obj, '_changed', None)
+            yield obj
+
+    def __setattr__(self, name, value):
+        """Stores the attribute through `Attributes` to track the write."""
+        Attributes(self)[name] = value
+
+    def __delattr__(self, name):
+        """Removes the attribute through `Attributes` to track the write."""
+        try:
+            del Attributes(self)[name]
+        except KeyError:
+            raise AttributeError(name) from None
 
     def __str__(self):
         """The string representation of BaseModel is returned.
@@ -48,7 +568,7 @@ class BaseModel():
 
         """
         return "[{}] ({}) {}".format(
-                self.__class__.__name__, self.id, str(self.__dict__))
+                self.__class__.__name__, self.id, str(Attributes(self)))
 
     def save(self):
         """Updates updated_at with current datetime and saves changes to JSON
@@ -59,7 +579,7 @@ class BaseModel():
             Five. Stores first object
 
         """
-        self.updated_at = datetime.now()
+        self.updated_at = timestamps.now()
         storage.save()
 
     def to_dict(self):
@@ -70,8 +590,30 @@ class BaseModel():
             Three. Is for BaseModel
 
         """
-        my_dict = self.__dict__.copy()
+        my_dict = Attributes(self).dump()
         my_dict["__class__"] = self.__class__.__name__
-        my_dict["created_at"] = self.created_at.isoformat()
-        my_dict["updated_at"] = self.updated_at.isoformat()
+        created_at = my_dict["created_at"]
+        updated_at = my_dict["updated_at"]
+        my_dict["created_at"] = isoformat(created_at)
+        if updated_at is created_at:
+            my_dict["updated_at"] = my_dict["created_at"]
+        else:
+            my_dict["updated_at"] = isoformat(updated_at)
         return my_dict
+
+
+def _rebuild(cls, attrs):
+    """Returns an object of `cls` holding `attrs`, for `__reduce__`."""
+    obj = cls.__new__(cls)
+    Attributes(obj).restore(attrs, None)
+    return obj
+
+
+def isoformat(value):
+    """Returns a timestamp or a datetime as an ISO 8601 string."""
+    if type(value) is int:
+        return timestamps.isoformat(value)
+    return value.isoformat()
+
+
+BaseModel.__layout__ = Layout(COMMON)
@@ -9,7 +9,12 @@ class City(BaseModel):
     Attributes:
         state_id (str)
         name (str)
+        __indexes__ (dict): index kind of attributes indexed by `storage`
     """
 
+    __slots__ = ()
+
+    __indexes__ = {"state_id": "hash"}
+
     state_id = ""
     name = ""
@@ -0,0 +1,296 @@
+#!/usr/bin/python3
+"""Numeric attribute columns kept by `FileStorage` as struct-of-arrays"""
+import operator
+from array import array
+from itertools import compress, repeat
+
+COMPARISONS = {'=': operator.eq, '<': operator.lt, '<=': operator.le,
+               '>': operator.gt, '>=': operator.ge}
+
+
+def is_number(value):
+    """Returns True if `value` is an int or a float, bools excluded."""
+    return type(value) is int or type(value) is float
+
+
+def both(mask, other):
+    """Returns the rows set in two masks of the same length."""
+    return (int.from_bytes(mask, 'little') &
+            int.from_bytes(other, 'little')).to_bytes(len(mask), 'little')
+
+
+def either(mask, other):
+    """Returns the rows set in one of two masks of the same length."""
+    return (int.from_bytes(mask, 'little') |
+            int.from_bytes(other, 'little')).to_bytes(len(mask), 'little')
+
+
+class ColumnStore():
+    """Keeps numeric attributes of the objects of a class in arrays.
+
+    Every object has a row, the same in every column, so the values of
+    several attributes line up without a lookup per object.  A column is
+    an `array` of 64-bit ints, turned into doubles the first time a float
+    or a larger int is stored in it.  Values that are not numbers (text,
+    None, bools) are kept aside in `others` and their row is left unset
+    in `valid`, so they never take part in an aggregate.
+
+    Rows are filtered with masks, bytes holding 1 for each selected row,
+    built by comparing a whole column at once and combined as integers.
+    The rows of deleted objects are left as holes, and the arrays are
+    compacted once the holes outnumber the objects.
+
+    A column is only filled from the objects the first time it is read;
+    from then on every write to the attribute updates it in place.
+
+    Attributes:
+        attrs (tuple): names of the attributes kept in columns
+        keys (list): key of the object of every row, None for a hole
+        objects (list): object of every row, None for a hole
+        rows (dict): {key: row} of every object
+        live (bytearray): 1 for the rows of stored objects
+        columns (dict): {attr: array of the value of every row} of the
+            columns filled so far
+        valid (dict): {attr: bytearray, 1 for the rows holding a number}
+        others (dict): {attr: {key: value}} of the values not in `columns`
+
+    """
+
+    def __init__(self, attrs):
+        """Constructor for the `ColumnStore` class.
+
+        Args:
+            attrs (str or tuple): names of the attributes to keep
+
+        """
+        self.attrs = (attrs,) if type(attrs) is str else tuple(attrs)
+        self.clear()
+
+    def clear(self):
+        """Removes every object from the columns."""
+        self.keys = []
+        self.objects = []
+        self.rows = dict()
+        self.live = bytearray()
+        self.columns = dict()
+        self.valid = dict()
+        self.others = dict()
+        self.__holes = 0
+
+    def rebuild(self, items):
+        """Gives a row to each (key, object) pair of `items`, from
+        scratch."""
+        self.clear()
+        for key, obj in items:
+            self.keys.append(key)
+            self.objects.append(obj)
+        self.rows = dict(zip(self.keys, range(len(self.keys))))
+        self.live = bytearray(b'\x01' * len(self.keys))
+
+    def add(self, key, obj):
+        """Stores `obj` in a new row, or in its row if it has one."""
+        if key in self.rows:
+            self.update(key, obj)
+            return
+        row = len(self.keys)
+        self.rows[key] = row
+        self.keys.append(key)
+        self.objects.append(obj)
+        self.live.append(1)
+        for attr, column in self.columns.items():
+            column.append(0)
+            self.valid[attr].append(0)
+            self.__set(attr, key, row, getattr(obj, attr, None))
+
+    def add_many(self, items, template):
+        """Stores objects that all hold the values of `template`.
+
+        Args:
+            items (dict): {key: object} of the objects to store
+            template (BaseModel or child): object holding their values
+
+        """
+        if any(key in self.rows for key in items):
+            for key, obj in items.items():
+                self.add(key, obj)
+            return
+        count = len(items)
+        start = len(self.keys)
+        self.rows.update(zip(items, range(start, start + count)))
+        self.keys.extend(items)
+        self.objects.extend(items.values())
+        self.live.extend(b'\x01' * count)
+        for attr in self.columns:
+            value = getattr(template, attr, None)
+            values = None
+            if is_number(value):
+                self.__widen(attr, value)
+                try:
+                    values = array(self.columns[attr].typecode, [value])
+                except OverflowError:
+                    pass
+            column = self.columns[attr]
+            if values is not None:
+                column.extend(values * count)
+                self.valid[attr].extend(b'\x01' * count)
+            else:
+                column.extend(array(column.typecode, [0]) * count)
+                self.valid[attr].extend(bytes(count))
+                self.others[attr].update(dict.fromkeys(items, value))
+
+    def update(self, key, obj):
+        """Stores the current values of `obj` in its row."""
+        row = self.rows.get(key)
+        if row is None:
+            self.add(key, obj)
+            return
+        self.objects[row] = obj
+        for attr in self.columns:
+            self.__set(attr, key, row, getattr(obj, attr, None))
+
+    def discard(self, key):
+        """Turns the row of the object stored under `key` into a hole."""
+        row = self.rows.pop(key, None)
+        if row is None:
+            return
+        self.keys[row] = None
+        self.objects[row] = None
+        self.live[row] = 0
+        for attr, column in self.columns.items():
+            column[row] = 0
+            self.valid[attr][row] = 0
+            self.others[attr].pop(key, None)
+        self.__holes += 1
+        if self.__holes > len(self.rows):
+            self.__compact()
+
+    def __set(self, attr, key, row, value):
+        """Stores the value of `attr` of the object in `row`."""
+        others = self.others[attr]
+        if others:
+            others.pop(key, None)
+        if is_number(value):
+            self.__widen(attr, value)
+            try:
+                self.columns[attr][row] = value
+                self.valid[attr][row] = 1
+                return
+            except OverflowError:
+                pass
+        self.columns[attr][row] = 0
+        self.valid[attr][row] = 0
+        others[key] = value
+
+    def __widen(self, attr, value):
+        """Turns the column of `attr` into doubles if it holds ints and
+        `value` is a float or an int too large for them."""
+        column = self.columns[attr]
+        if column.typecode == 'q' and (type(value) is float or
+                                       not -2 ** 63 <= value < 2 ** 63):
+            self.columns[attr] = array('d', column)
+
+    def __compact(self):
+        """Drops the holes, moving the rows after them up."""
+        live = self.live
+        self.keys = list(compress(self.keys, live))
+        self.objects = list(compress(self.objects, live))
+        self.rows = {key: row for row, key in enumerate(self.keys)}
+        for attr, column in self.columns.items():
+            self.columns[attr] = array(column.typecode,
+                                       compress(column, live))
+            self.valid[attr] = bytearray(compress(self.valid[attr], live))
+        self.live = bytearray(b'\x01' * len(self.keys))
+        self.__holes = 0
+
+    def fill(self, attr):
+        """Fills the column of `attr` from the objects if it has not been
+        read yet.
+
+        Raises:
+            KeyError: if `attr` is not kept in columns
+
+        """
+        if attr in self.columns:
+            return
+        if attr not in self.attrs:
+            raise KeyError(attr)
+        values = [getattr(obj, attr, None) for obj in self.objects]
+        types = set(map(type, values))
+        numbers = types - {type(None)}
+        column = None
+        if numbers <= {int, float}:
+            valid = bytearray(b'\x01' * len(values))
+            if len(numbers) < len(types):
+                # Holes and None values: the other rows are numbers.
+                valid = bytearray(map(operator.is_not, values, repeat(None)))
+                values = [0 if value is None else value for value in values]
+            for typecode in ('q', 'd'):
+                if typecode == 'q' and float in types:
+                    continue
+                try:
+                    column = array(typecode, values)
+                    break
+                except OverflowError:
+                    pass
+        if column is not None:
+            self.columns[attr] = column
+            self.valid[attr] = valid
+            self.others[attr] = dict.fromkeys(compress(
+                self.keys, map(operator.gt, self.live, valid)))
+            return
+        self.columns[attr] = array('q', bytes(8 * len(values)))
+        self.valid[attr] = bytearray(len(values))
+        self.others[attr] = dict()
+        for row, (key, value) in enumerate(zip(self.keys, values)):
+            if key is not None:
+                self.__set(attr, key, row, value)
+
+    def mask(self, attr, op, value):
+        """Returns the rows whose value of `attr` satisfies a condition.
+
+        The column is compared at once; the values kept in `others` are
+        compared one by one and never match when they do not compare.
+
+        Args:
+            attr (str): name of the attribute
+            op (str): '=', '<', '<=', '>', '>=' or 'in'
+            value (int or float): value compared with, a list for 'in'
+
+        Returns:
+            bytes: 1 for each matching row
+
+        """
+        self.fill(attr)
+        if op == 'in':
+            mask = bytes(len(self.keys))
+            for item in value:
+                mask = either(mask, self.mask(attr, '=', item))
+            return mask
+        compare = COMPARISONS[op]
+        mask = both(bytes(map(compare, self.columns[attr], repeat(value))),
+                    self.valid[attr])
+        others = self.others[attr]
+        if others:
+            mask = bytearray(mask)
+            rows = self.rows
+            for key, actual in others.items():
+                try:
+                    if compare(actual, value):
+                        mask[rows[key]] = 1
+                except TypeError:
+                    pass
+        return bytes(mask)
+
+    def select(self, mask):
+        """Returns the objects of the rows set in `mask`."""
+        return list(compress(self.objects, mask))
+
+    def numbers(self, attr, mask=None):
+        """Returns the numbers of `attr` in the rows set in `mask`, or in
+        every row, as an array."""
+        self.fill(attr)
+        column = self.columns[attr]
+        valid = self.valid[attr]
+        if mask is not None:
+            valid = both(valid, mask)
+        return array(column.typecode, compress(column, valid))
@@ -0,0 +1,175 @@
+#!/usr/bin/python3
+"""Folds the `FileStorage` journal into a fresh snapshot"""
+import json
+import threading
+import time
+from os import path, remove
+
+from .durability import Durability
+from .journal import read_segment
+from .snapshot import Snapshot, encode, write_snapshot
+
+
+class Compactor():
+    """Background compaction of a `Journal` into the snapshot it extends.
+
+    The journal is sealed in the calling thread, which only renames a file;
+    a worker thread then reads the old snapshot and the sealed segment from
+    disk, writes the merged snapshot to a temporary file and renames it over
+    the old one.  New records keep going to a fresh journal in the meantime,
+    so console writes never wait for a compaction.
+
+    Attributes:
+        snapshot_path (str): filename of the JSON snapshot
+        journal (Journal): journal folded into the snapshot
+        max_bytes (int): journal size that triggers a compaction
+        max_records (int): journal record count that triggers a compaction
+        max_dead_ratio (float): share of dead journal records that triggers
+            a compaction once the journal holds `min_records`
+        min_records (int): journal record count under which the dead ratio
+            is not considered
+        background (bool): run compactions in a worker thread
+        binary (bool): the snapshot is a binary `Snapshot` file, not JSON
+        durability (Durability): how far the new snapshot is pushed to disk
+        last (dict): report of the last compaction, None before the first one
+
+    """
+
+    def __init__(self, snapshot_path, journal, max_bytes=4 * 1024 * 1024,
+                 max_records=10000, max_dead_ratio=0.5, min_records=1000,
+                 background=True, binary=False, durability=None):
+        """Constructor for the `Compactor` class.
+
+        Args:
+            snapshot_path (str): filename of the JSON snapshot
+            journal (Journal): journal folded into the snapshot
+            max_bytes (int): journal size that triggers a compaction
+            max_records (int): journal record count that triggers a
+                compaction
+            max_dead_ratio (float): share of dead records that triggers a
+                compaction
+            min_records (int): journal record count under which the dead
+                ratio is not considered
+            background (bool): run compactions in a worker thread
+            binary (bool): the snapshot is a binary `Snapshot` file
+            durability (Durability): how far the new snapshot is pushed to
+                disk
+
+        """
+        self.snapshot_path = snapshot_path
+        self.journal = journal
+        self.max_bytes = max_bytes
+        self.max_records = max_records
+        self.max_dead_ratio = max_dead_ratio
+        self.min_records = min_records
+        self.background = background
+        self.binary = binary
+        self.durability = durability
+        if durability is None:
+            self.durability = Durability()
+        self.last = None
+        self.__thread = None
+        self.__lock = threading.Lock()
+
+    def due(self):
+        """Returns True when the journal crossed one of the thresholds."""
+        journal = self.journal
+        if journal.size >= self.max_bytes:
+            return True
+        if journal.records >= self.max_records:
+            return True
+        return (journal.records >= self.min_records and
+                journal.dead_ratio() >= self.max_dead_ratio)
+
+    def maybe_compact(self):
+        """Starts a compaction if the journal crossed one of the thresholds.
+
+        Returns:
+            True if a compaction was started
+
+        """
+        if self.running() is False and self.due() is True:
+            return self.compact()
+        return False
+
+    def running(self):
+        """Returns True while a background compaction is in progress."""
+        return self.__thread is not None and self.__thread.is_alive()
+
+    def compact(self):
+        """Seals the journal and folds it into the snapshot.
+
+        Returns:
+            True if a compaction was started
+
+        """
+        with self.__lock:
+            if self.running() is True:
+                return False
+            if self.journal.seal() is False:
+                return False
+            if self.background is False:
+                self._fold()
+                return True
+            self.__thread = threading.Thread(target=self._fold,
+                                             name='hbnb-compaction',
+                                             daemon=True)
+            self.__thread.start()
+            return True
+
+    def wait(self):
+        """Blocks until the running compaction, if any, is finished."""
+        thread = self.__thread
+        if thread is not None:
+            thread.join()
+
+    def _fold(self):
+        """Writes snapshot + sealed segment to a new snapshot atomically."""
+        start = time.perf_counter()
+        json_dict = dict()
+        if path.exists(self.snapshot_path) and self.binary is True:
+            json_dict = dict(Snapshot(self.snapshot_path).items())
+        elif path.exists(self.snapshot_path):
+            with open(self.snapshot_path, 'r', encoding='utf-8') as file:
+                content = file.read()
+                if content != '':
+                    json_dict = json.loads(content)
+
+        replay_start = time.perf_counter()
+        records = 0
+        last_ops = dict()
+        for op, key, value in read_segment(self.journal.sealed_path):
+            records += 1
+            last_ops[key] = op
+            if op == 'del':
+                json_dict.pop(key, None)
+            elif op == 'patch':
+                if key in json_dict:
+                    json_dict[key].update(value)
+            else:
+                json_dict[key] = value
+        replay_seconds = time.perf_counter() - replay_start
+        live = 0
+        for op in last_ops.values():
+            if op != 'del':
+                live += 1
+        sealed_bytes = path.getsize(self.journal.sealed_path)
+
+        if self.binary is True:
+            write_snapshot(self.snapshot_path,
+                           ((key, encode(value))
+                            for key, value in json_dict.items()),
+                           self.durability)
+        else:
+            with self.durability.replace(self.snapshot_path) as file:
+                file.write(json.dumps(json_dict))
+        remove(self.journal.sealed_path)
+
+        self.last = {
+            'records_folded': records,
+            'dead_records': records - live,
+            'bytes_folded': sealed_bytes,
+            'live_objects': len(json_dict),
+            'replay_seconds_saved': replay_seconds,
+            'duration': time.perf_counter() - start,
+        }
@@ -0,0 +1,364 @@
+#!/usr/bin/python3
+"""Aggregations over the attributes of the objects of a storage"""
+import re
+from array import array
+from bisect import bisect_right
+from collections import Counter
+from itertools import compress, repeat
+from operator import is_
+
+from .query import columns as columns_query, parse as parse_query
+
+FUNCTIONS = ('count', 'sum', 'avg', 'min', 'max', 'percentile')
+
+# '<function>(<attribute>[, <number>])', or a bare 'count'.
+AGGREGATE = re.compile(r'\s*(?:(\w+)\s*\(\s*(\w*)\s*(?:,\s*([0-9.]+)\s*)?\)'
+                       r'|(count))\s*(?:,|$)')
+CLAUSES = re.compile(r'(?P<aggregates>.*?)(?:\s+by\s+(?P<by>\w+))?'
+                     r'(?:\s+where\s+(?P<where>.*))?\s*$', re.DOTALL)
+
+# Marks the rows whose group value is not in a hash index.
+_MISSING = object()
+
+
+class Aggregate():
+    """One aggregate function applied to one attribute.
+
+    Attributes:
+        function (str): one of FUNCTIONS
+        attr (str): name of the attribute, None for a count of objects
+        arg (float): rank of a percentile, between 0 and 100
+
+    """
+
+    def __init__(self, function, attr=None, arg=None):
+        """Constructor for the `Aggregate` class.
+
+        Args:
+            function (str): one of FUNCTIONS
+            attr (str): name of the attribute, None for a count of objects
+            arg (float): rank of a percentile
+
+        Raises:
+            ValueError: if the function is unknown, lacks its attribute or
+                its rank
+
+        """
+        if function not in FUNCTIONS:
+            raise ValueError("unknown function: {}".format(function))
+        if attr is None and function != 'count':
+            raise ValueError("{} needs an attribute".format(function))
+        if (function == 'percentile') != (arg is not None):
+            raise ValueError("only percentile takes a rank")
+        if arg is not None and not 0 <= arg <= 100:
+            raise ValueError("percentile rank must lie in [0, 100]")
+        self.function = function
+        self.attr = attr
+        self.arg = arg
+
+    @property
+    def name(self):
+        """Returns the aggregate as it is written, e.g. 'avg(max_guest)'."""
+        if self.attr is None:
+            return self.function
+        if self.arg is None:
+            return "{}({})".format(self.function, self.attr)
+        return "{}({}, {:g})".format(self.function, self.attr, self.arg)
+
+    def apply(self, column, rows):
+        """Returns the aggregate of a column, None if it has no numbers.
+
+        Args:
+            column (array): numbers of the attribute in a group
+            rows (int): number of objects in the group
+
+        """
+        function = self.function
+        if function == 'count':
+            return rows if self.attr is None else len(column)
+        if len(column) == 0:
+            return None
+        if function == 'sum':
+            return sum(column)
+        if function == 'avg':
+            return sum(column) / len(column)
+        if function == 'min':
+            return min(column)
+        if function == 'max':
+            return max(column)
+        return percentile(sorted(column), self.arg)
+
+
+def percentile(ordered, rank):
+    """Returns the percentile of sorted numbers, interpolating linearly
+    between the two closest ranks."""
+    position = (len(ordered) - 1) * rank / 100
+    low = int(position)
+    if low + 1 >= len(ordered):
+        return ordered[-1]
+    return ordered[low] + (ordered[low + 1] - ordered[low]) * (position - low)
+
+
+def numbers(values):
+    """Returns the numbers of a list of values as an array.
+
+    The array holds 64-bit ints when every value is an int, doubles
+    otherwise; values that are not numbers, bools included, are left out.
+
+    """
+    if bool in set(map(type, values)):
+        # The arrays would take bools as 1 and 0.
+        values = [value for value in values
+                  if type(value) in (int, float)]
+    try:
+        return array('q', values)
+    except (TypeError, OverflowError):
+        pass
+    try:
+        return array('d', values)
+    except TypeError:
+        pass
+    values = [value for value in values
+              if type(value) in (int, float)]
+    try:
+        return array('q', values)
+    except (TypeError, OverflowError):
+        return array('d', values)
+
+
+def parse(text):
+    """Returns the aggregates, group-by attribute and filter of a
+    computation written '<aggregate>, ... [by <attribute>] [where
+    <conditions>]', e.g. 'count, avg(price_by_night) by city_id'.
+
+    Returns:
+        (list of `Aggregate`, str or None, str or None)
+
+    Raises:
+        ValueError: if the text is malformed
+
+    """
+    clauses = CLAUSES.match(text)
+    aggregates = []
+    pos = 0
+    body = clauses.group('aggregates')
+    while pos < len(body):
+        match = AGGREGATE.match(body, pos)
+        if match is None or match.end() == pos:
+            raise ValueError("aggregate expected: {}".format(
+                body[pos:].strip()))
+        function, attr, arg, count = match.groups()
+        if count is not None:
+            aggregates.append(Aggregate('count'))
+        else:
+            aggregates.append(Aggregate(function, attr or None,
+                                        None if arg is None else float(arg)))
+        pos = match.end()
+    if len(aggregates) == 0:
+        raise ValueError("aggregate expected")
+    return aggregates, clauses.group('by'), clauses.group('where')
+
+
+def compute(storage, cls, aggregates, by=None, where=None):
+    """Computes aggregates over the objects of a class.
+
+    When every aggregated attribute is kept in the columns of a
+    `ColumnStore`, the arrays of numbers are taken from the columns: rows
+    are selected with a mask and, for groups, gathered from the buckets of
+    the hash index of `by` or sorted by group value.  Otherwise every
+    attribute is read once, as a column holding its value for every
+    object, and the columns are split by group and turned into arrays of
+    numbers.  The aggregates then run over the arrays with the built-in
+    `sum`, `min`, `max` and `sorted`.
+
+    Args:
+        storage (FileStorage): storage holding the objects
+        cls (type or str): class of the objects
+        aggregates (list): `Aggregate` functions to compute
+        by (str): attribute whose values form the groups, no groups if None
+        where (str or list): only aggregate the objects matching this
+            query, see `FileStorage.where`
+
+    Returns:
+        list of dicts, one per group in order of the group value, mapping
+        `by` to the group value and each aggregate name to its result
+
+    Raises:
+        ValueError: if `where` is malformed
+
+    """
+    attrs = list(dict.fromkeys(aggregate.attr for aggregate in aggregates
+                               if aggregate.attr is not None))
+    store = None
+    if len(attrs) > 0:
+        store = storage.columns(cls, attrs[0])
+    if store is not None and all(attr in store.attrs for attr in attrs):
+        results = _columnar(storage, cls, store, aggregates, attrs, by,
+                            where)
+        if results is not None:
+            return results
+
+    if where is None:
+        def column(attr):
+            return storage.column(cls, attr)
+    else:
+        objects = storage.where(cls, where)
+
+        def column(attr):
+            return [getattr(obj, attr, None) for obj in objects]
+
+    columns = [column(attr) for attr in attrs]
+    if by is None:
+        rows = len(column('id')) if len(columns) == 0 else len(columns[0])
+        groups = {None: (rows, columns)}
+    else:
+        keys = column(by)
+        try:
+            counts = Counter(keys)
+        except TypeError:
+            keys = [key if _hashable(key) else repr(key) for key in keys]
+            counts = Counter(keys)
+        groups = {key: (rows, [[] for attr in attrs])
+                  for key, rows in counts.items()}
+        for i, values in enumerate(columns):
+            appends = {key: parts[i].append
+                       for key, (rows, parts) in groups.items()}
+            for key, value in zip(keys, values):
+                appends[key](value)
+
+    results = []
+    for key in _ordered(groups):
+        rows, parts = groups[key]
+        arrays = dict(zip(attrs, (numbers(values) for values in parts)))
+        results.append(_result(aggregates, arrays, rows, by, key))
+    return results
+
+
+def _columnar(storage, cls, store, aggregates, attrs, by, where):
+    """Computes aggregates from the arrays of a `ColumnStore`, None if the
+    group values do not sort or are not hashable."""
+    for attr in attrs:
+        store.fill(attr)
+    mask = bytes(store.live)
+    if where is not None:
+        predicates = parse_query(where) if type(where) is str else where
+        found, matches, done = columns_query(storage, cls, predicates)
+        if found is store and len(done) == len(predicates):
+            mask = matches
+        else:
+            objects = storage.where(cls, predicates)
+            rows = store.rows
+            prefix = (cls if type(cls) is str else cls.__name__) + '.'
+            selected = bytearray(len(mask))
+            for obj in objects:
+                selected[rows[prefix + obj.id]] = 1
+            mask = bytes(selected)
+    if by is None:
+        arrays = {attr: store.numbers(attr, mask) for attr in attrs}
+        return [_result(aggregates, arrays, mask.count(1), None, None)]
+
+    groups = _groups(storage, cls, store, by, mask)
+    if groups is None:
+        return None
+    results = []
+    for key, rows in groups:
+        arrays = dict()
+        for attr in attrs:
+            column = store.columns[attr]
+            values = map(column.__getitem__, rows)
+            if store.others[attr]:
+                values = compress(values, map(store.valid[attr].__getitem__,
+                                              rows))
+            arrays[attr] = array(column.typecode, values)
+        results.append(_result(aggregates, arrays, len(rows), by, key))
+    return results
+
+
+def _groups(storage, cls, store, by, mask):
+    """Returns the (value, rows) pairs of the groups of the rows of a
+    `ColumnStore` set in `mask`, in order of value, None if the values do
+    not sort or are not hashable.
+
+    The buckets of the hash index of `by` are the groups when it holds
+    every object; otherwise the rows are sorted by their value of `by`.
+    """
+    index = storage.index(cls, by)
+    if index is not None and len(index.values) == len(store.rows):
+        try:
+            keys = sorted(index.buckets)
+        except TypeError:
+            return None
+        row = store.rows.__getitem__
+        selected = mask.count(1) < len(store.rows)
+        groups = []
+        for key in keys:
+            rows = list(map(row, index.buckets[key]))
+            if selected:
+                rows = list(compress(rows, map(mask.__getitem__, rows)))
+            if len(rows) > 0:
+                groups.append((key, rows))
+        return groups
+
+    values = _values(storage, cls, store, by)
+    try:
+        rows = sorted(compress(range(len(values)), mask),
+                      key=values.__getitem__)
+    except TypeError:
+        return None
+    keys = list(map(values.__getitem__, rows))
+    groups = []
+    start = 0
+    for key in dict.fromkeys(keys):
+        if not _hashable(key):
+            return None
+        end = bisect_right(keys, key, start)
+        groups.append((key, rows[start:end]))
+        start = end
+    return groups
+
+
+def _values(storage, cls, store, attr):
+    """Returns the value of `attr` in every row of a `ColumnStore`, read
+    from the store or the hash index of `attr` when there is one."""
+    if attr in store.attrs:
+        store.fill(attr)
+        values = list(store.columns[attr])
+        rows = store.rows
+        for key, value in store.others[attr].items():
+            values[rows[key]] = value
+        return values
+    index = storage.index(cls, attr)
+    known = dict() if index is None else index.values
+    values = list(map(known.get, store.keys, repeat(_MISSING)))
+    for row in compress(range(len(values)),
+                        map(is_, values, repeat(_MISSING))):
+        values[row] = getattr(store.objects[row], attr, None)
+    return values
+
+
+def _result(aggregates, arrays, rows, by, key):
+    """Returns the result of a group: its `by` value, if grouped, and the
+    result of each aggregate."""
+    result = {} if by is None else {by: key}
+    for aggregate in aggregates:
+        result[aggregate.name] = aggregate.apply(arrays.get(aggregate.attr),
+                                                 rows)
+    return result
+
+
+def _hashable(value):
+    """Returns True if `value` can be a group key."""
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
+
+
+def _ordered(groups):
+    """Returns the group keys sorted, by their text if they do not
+    compare."""
+    try:
+        return sorted(groups)
+    except TypeError:
+        return sorted(groups, key=repr)
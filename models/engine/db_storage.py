@@ -0,0 +1,193 @@
+#!/usr/bin/python3
+"""SQLite storage engine with the interface of `FileStorage`"""
+import json
+import sqlite3
+
+from .file_storage import FileStorage
+
+# Attributes stored in columns of their own in every table.
+COMMON = ('id', 'created_at', 'updated_at')
+
+# Key of `extra` listing the other attributes in their original order, when
+# reading the columns then `extra` would not give it back.
+ORDER = '__order__'
+
+# PRAGMA synchronous setting of every durability mode.  In WAL mode NORMAL
+# only syncs at checkpoints, which is SQLite's own group commit.
+SYNCHRONOUS = dict(none='OFF', flush='NORMAL', fsync='FULL', group='NORMAL')
+
+
+class DBStorage(FileStorage):
+    """Stores the objects in a SQLite database instead of a JSON file.
+
+    Every model class has a table named after it, with an `id` primary
+    key, the `created_at` and `updated_at` timestamps, one column per
+    attribute declared on the class, and an `extra` column holding the
+    other attributes as a JSON object.  Declared columns hold str, int and
+    float values as they are (they have no type affinity, so '5' stays a
+    string); any other value is kept in `extra`, along with the order of
+    the attributes when it differs from the order of the columns.  Columns
+    whose name ends with '_id' are indexed.
+
+    The database runs in WAL mode, with the `synchronous` setting matching
+    the durability mode, and `save` upserts the rows of the objects changed
+    since the previous save, and of the objects holding a list, dict or set
+    (which can change in place unnoticed), and deletes the rows of the
+    deleted ones in a single transaction.  The in-memory side (partitions,
+    indexes, lazy mode, queries) is the one of `FileStorage`.
+
+    Attributes:
+        db_path (str): filename of the database
+        connection (sqlite3.Connection): connection to the database, None
+            until it is first used
+
+    """
+
+    def __init__(self, db_path='HBnB_objects.db', lazy=False,
+                 durability='flush'):
+        """Constructor for the `DBStorage` class.
+
+        Args:
+            db_path (str): filename of the database
+            lazy (bool): when True, `reload` defers building the objects
+                until they are first accessed
+            durability (str): 'none', 'flush', 'fsync' or 'group'
+
+        """
+        super().__init__(lazy=lazy, durability=durability)
+        self.db_path = db_path
+        self.connection = None
+        self.__columns = dict()
+
+    def __connect(self):
+        """Returns the connection to the database, opening it if needed."""
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.db_path)
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous={}'.format(
+                SYNCHRONOUS[self.durability.mode]))
+        return self.connection
+
+    def close(self):
+        """Closes the connection to the database."""
+        super().close()
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def __table(self, cls):
+        """Creates or extends the table of class `cls`.
+
+        Returns:
+            list of the declared attributes stored in columns
+
+        """
+        name = cls.__name__
+        if name in self.__columns:
+            return self.__columns[name]
+        declared = [attr for attr in cls.__fields__
+                    if attr not in COMMON and attr != 'extra']
+        connection = self.__connect()
+        with connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS "{}" (id TEXT PRIMARY KEY, '
+                'created_at TEXT, updated_at TEXT, extra TEXT)'.format(name))
+            existing = set(row[1] for row in connection.execute(
+                'PRAGMA table_info("{}")'.format(name)))
+            for attr in declared:
+                if attr not in existing:
+                    connection.execute('ALTER TABLE "{}" ADD COLUMN "{}"'
+                                       .format(name, attr))
+                if attr.endswith('_id'):
+                    connection.execute(
+                        'CREATE INDEX IF NOT EXISTS "{0}_{1}" '
+                        'ON "{0}" ("{1}")'.format(name, attr))
+        self.__columns[name] = declared
+        return declared
+
+    def _read(self, classes):
+        """Yields the rows of the table of every class in `classes`.
+
+        Args:
+            classes (list): model classes whose objects are stored
+
+        Yields:
+            (key, record) pairs to load
+
+        """
+        connection = self.__connect()
+        for cls in classes:
+            name = cls.__name__
+            declared = self.__table(cls)
+            columns = ', '.join(list(COMMON) +
+                                ['"{}"'.format(attr) for attr in declared] +
+                                ['extra'])
+            cursor = connection.execute('SELECT {} FROM "{}"'
+                                        .format(columns, name))
+            for row in cursor:
+                record = dict(zip(COMMON, row))
+                for attr, value in zip(declared, row[len(COMMON):-1]):
+                    if value is not None:
+                        record[attr] = value
+                if row[-1] is not None:
+                    record.update(json.loads(row[-1]))
+                    for attr in record.pop(ORDER, ()):
+                        record[attr] = record.pop(attr)
+                record['__class__'] = name
+                yield name + '.' + record['id'], record
+
+    def _write(self, dirty, created):
+        """Upserts the rows of the dirty objects and deletes the rows of
+        the deleted ones, in one transaction.
+
+        Args:
+            dirty (dict): {key: object, None if deleted} changed since the
+                previous save
+            created (set): keys of the objects created since then
+
+        """
+        upserts = dict()
+        deletes = dict()
+        for key, obj in dirty.items():
+            name, _, obj_id = key.partition('.')
+            if obj is None:
+                deletes.setdefault(name, []).append((obj_id,))
+                continue
+            declared = self.__table(obj.__class__)
+            record = obj.to_dict()
+            del record['__class__']
+            row = [obj_id, record.pop('created_at'), record.pop('updated_at')]
+            record.pop('id', None)
+            order = list(record)
+            stored = []
+            for attr in declared:
+                value = record.get(attr)
+                if type(value) in (str, int, float):
+                    row.append(record.pop(attr))
+                    stored.append(attr)
+                else:
+                    row.append(None)
+            if order != stored + list(record):
+                record[ORDER] = order
+            row.append(json.dumps(record) if len(record) > 0 else None)
+            upserts.setdefault(name, []).append(row)
+        if len(upserts) == 0 and len(deletes) == 0:
+            return
+        connection = self.__connect()
+        with connection:
+            for name, rows in deletes.items():
+                if name in self.__columns:
+                    connection.executemany(
+                        'DELETE FROM "{}" WHERE id = ?'.format(name), rows)
+            for name, rows in upserts.items():
+                columns = (list(COMMON) +
+                           ['"{}"'.format(attr)
+                            for attr in self.__columns[name]] + ['extra'])
+                connection.executemany(
+                    'INSERT INTO "{}" ({}) VALUES ({}) '
+                    'ON CONFLICT(id) DO UPDATE SET {}'.format(
+                        name, ', '.join(columns),
+                        ', '.join('?' * len(columns)),
+                        ', '.join('{0} = excluded.{0}'.format(column)
+                                  for column in columns[1:])),
+                    rows)
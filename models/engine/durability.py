@@ -0,0 +1,153 @@
+#!/usr/bin/python3
+"""Durability levels of the files written by `FileStorage`"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+MODES = ('none', 'flush', 'fsync', 'group')
+
+
+class Durability():
+    """Decides how far each write is pushed towards the disk.
+
+    Whole files are always written to '<path>.tmp' and renamed over
+    `path`, so a crash leaves either the old or the new file, never a
+    truncated one.  Appends go to files kept open by their writer.  The
+    mode then sets what each write waits for:
+
+        none   nothing: appends stay in the process buffers until they
+               fill up or the file is closed
+        flush  the data is handed to the operating system, which survives
+               a crash of the process but not of the machine
+        fsync  the data, and the directory entry of a renamed file, are on
+               disk before the write returns
+        group  like flush, plus one fsync of everything written since the
+               previous one, at most every `group_interval` seconds, run by
+               the next write or by a timer thread once the interval is
+               over; a power loss loses at most that window
+
+    Attributes:
+        mode (str): one of MODES
+        group_interval (float): seconds between two fsyncs in group mode
+        fsyncs (int): number of fsync calls made so far
+
+    """
+
+    def __init__(self, mode='flush', group_interval=0.05):
+        """Constructor for the `Durability` class.
+
+        Args:
+            mode (str): one of MODES
+            group_interval (float): seconds between two fsyncs in group
+                mode
+
+        Raises:
+            ValueError: if `mode` is unknown
+
+        """
+        if mode not in MODES:
+            raise ValueError("unknown durability mode: {}".format(mode))
+        self.mode = mode
+        self.group_interval = group_interval
+        self.fsyncs = 0
+        self.__unsynced = set()
+        self.__synced_at = time.monotonic()
+        self.__lock = threading.Lock()
+        self.__timer = None
+
+    @contextmanager
+    def replace(self, file_path, binary=False):
+        """Opens a temporary file that atomically replaces `file_path` when
+        the `with` block ends without an error.
+
+        Args:
+            file_path (str): filename to replace
+            binary (bool): open the file in binary mode
+
+        Yields:
+            the temporary file, open for writing
+
+        """
+        tmp_path = file_path + '.tmp'
+        if binary is True:
+            file = open(tmp_path, 'wb')
+        else:
+            file = open(tmp_path, 'w', encoding='utf-8')
+        try:
+            with file:
+                yield file
+                if self.mode == 'fsync':
+                    file.flush()
+                    self.__fsync(file.fileno())
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        os.replace(tmp_path, file_path)
+        directory = os.path.dirname(os.path.abspath(file_path))
+        if self.mode == 'fsync':
+            self.__fsync_path(directory)
+        elif self.mode == 'group':
+            self.__group((file_path, directory))
+
+    def commit(self, file):
+        """Applies the mode to data just appended to `file`.
+
+        Args:
+            file (file object): file kept open by its writer
+
+        """
+        if self.mode == 'none':
+            return
+        file.flush()
+        if self.mode == 'fsync':
+            self.__fsync(file.fileno())
+        elif self.mode == 'group':
+            self.__group((file.name,))
+
+    def sync(self):
+        """Forces to disk what group mode has not synced yet."""
+        with self.__lock:
+            unsynced = self.__unsynced
+            self.__unsynced = set()
+            self.__synced_at = time.monotonic()
+            if self.__timer is not None:
+                self.__timer.cancel()
+                self.__timer = None
+        for file_path in sorted(unsynced):
+            if os.path.exists(file_path):
+                self.__fsync_path(file_path)
+
+    def __group(self, file_paths):
+        """Adds files to the group fsync, run now if `group_interval` has
+        passed and by a timer thread otherwise."""
+        with self.__lock:
+            self.__unsynced.update(file_paths)
+            wait = self.group_interval - (time.monotonic() -
+                                          self.__synced_at)
+            if wait > 0:
+                if self.__timer is None:
+                    self.__timer = threading.Timer(wait, self.__expire)
+                    self.__timer.daemon = True
+                    self.__timer.start()
+                return
+        self.sync()
+
+    def __expire(self):
+        """Runs the group fsync put off by `__group`."""
+        with self.__lock:
+            self.__timer = None
+        self.sync()
+
+    def __fsync(self, fd):
+        """Flushes the file descriptor `fd` to disk."""
+        os.fsync(fd)
+        self.fsyncs += 1
+
+    def __fsync_path(self, file_path):
+        """Flushes a file or directory to disk."""
+        fd = os.open(file_path, os.O_RDONLY)
+        try:
+            self.__fsync(fd)
+        finally:
+            os.close(fd)
@@ -1,7 +1,27 @@
 #!/usr/bin/python3
 """used to load these objects from the JSON file back into memory"""
+import atexit
+import heapq
 import json
-from os import path
+import threading
+from contextlib import contextmanager
+from itertools import islice
+from os import makedirs, path, remove
+
+from .compaction import Compactor
+from .durability import Durability
+from .flusher import Flusher
+from .columns import ColumnStore
+from .indexes import HashIndex, OrderedIndex
+from .spatial import GridIndex
+from .shards import list_shards, read_shards, shard_name, shard_of
+from .snapshot import Snapshot, encode, write_snapshot
+from .stream import iter_json_object
+from .journal import Journal
+from .query import parse as parse_query, plan as plan_query
+
+# Types of the values that can change in place, without `touch` being told.
+MUTABLE = (list, dict, set)
 
 
 class FileStorage():
@@ -11,6 +31,70 @@ class FileStorage():
         __file_path (str): default for saving JSON serializations file
         __objects (dict): dict of `BaseModel` objects and child classes
             as values, and '<object class name>.<object.id>' as keys
+        journal (Journal): append-only log of mutations when the storage
+            runs in journal mode, None otherwise
+        compactor (Compactor): folds `journal` into the JSON file in the
+            background once it grows past its thresholds
+        file_format (str): 'json' or 'binary', format of the file at
+            __file_path
+        shards (int): number of shard files per class, None when all the
+            objects are in the single file at __file_path
+        flusher (Flusher): writes the saves from a background thread in
+            write-behind mode, None otherwise
+        durability (Durability): how far writes are pushed to disk
+
+    Objects created, changed or deleted since the last `save` are kept in a
+    dirty set, filled by `new`, `delete` and `touch` (which `BaseModel`
+    calls on every attribute write), so a save only serializes those.  The
+    JSON text of the other objects is reused from the previous save.
+    Objects holding a list, dict or set are saved again on every save, as
+    changing such a value in place does not go through `touch`.
+
+    Next to __objects, the objects are partitioned by class name into
+    dicts keyed by id, so per-class listing, lookup and counting never scan
+    the other classes.  The partitions are rebuilt if __objects is replaced
+    or resized behind the storage's back.
+
+    Secondary indexes can be declared on any attribute, either with
+    `add_index` or in the `__indexes__` class attribute of a model, which
+    maps attribute names to index kinds.  `lookup` uses hash indexes to find
+    objects by value, `range` uses ordered indexes to find objects by
+    interval, and `near`, `within` and `k_nearest` use spatial indexes on
+    (latitude, longitude) pairs.  A 'columns' index keeps numeric
+    attributes in arrays, one row per object (see `ColumnStore`), so
+    `where` and `compute` filter and aggregate them a column at a time.
+
+    In lazy mode, `reload` keeps the decoded records of the JSON file and
+    only builds the model instance of a record the first time it is asked
+    for through `all`, `get` or any query on its class; `count` answers
+    from the records without building anything.
+
+    In binary format the objects are saved to a `Snapshot` file instead of
+    JSON.  `reload` only reads its sorted key table and keeps each record
+    as a (snapshot, position) reference, always lazily, so `get` decodes
+    the one record it returns straight from the memory-mapped file.
+
+    In sharded mode each class is saved to its own files in the directory
+    named after __file_path without its extension, 'HBnB_objects/'.
+    Objects are spread over `shards` files per class by a hash of their
+    id, '<class name>.json' or '<class name>.<shard>.json', and a save
+    only rewrites the shards holding dirty objects.  `reload` decodes the
+    shards in worker processes when they are large.
+
+    Between `begin` and `commit`, or inside `with storage.transaction():`,
+    `save` only notes that a save was asked for and `commit` performs a
+    single one.  The attributes of every object are copied before its
+    first change in the transaction, so `rollback` can put them back.
+
+    In write-behind mode `save` returns at once and a `Flusher` thread
+    writes the pending changes, coalescing the saves of each interval into
+    one write; `flush` writes them right away, and runs at exit.  A lock
+    keeps the thread from writing while __objects is being changed, and
+    the thread leaves a transaction in progress to be written on commit.
+
+    Files are written to a temporary file renamed into place, and the
+    `durability` mode decides whether saves wait for the data to reach
+    the disk (see `Durability`); `close` syncs what group mode put off.
 
     Project tasks:
         5. Store first object
@@ -19,12 +103,88 @@ class FileStorage():
     __file_path = 'HBnB_objects.json'
     __objects = dict()
 
-    def __init__(self):
-        pass
+    def __init__(self, journal=False, lazy=False, file_format='json',
+                 shards=None, write_behind=None, flush_after=100,
+                 durability='flush'):
+        """Constructor for the `FileStorage` class.
+
+        Args:
+            journal (bool): when True, `save` appends a put/delete record
+                per changed object to '<__file_path>.journal' instead of
+                rewriting the whole JSON file
+            lazy (bool): when True, `reload` defers building the objects
+                until they are first accessed
+            file_format (str): 'json', or 'binary' to store the objects in
+                a memory-mapped snapshot, 'HBnB_objects.bin'; the binary
+                format implies `lazy`
+            shards (int): when set, save each class to `shards` files of
+                its own instead of the single file
+            write_behind (float): when set, `save` only marks the changes
+                as pending and a background thread writes them at most
+                `write_behind` seconds later
+            flush_after (int): in write-behind mode, number of pending
+                saves that triggers a write without waiting
+            durability (str): 'none', 'flush', 'fsync' or 'group', see
+                `Durability`
+
+        Raises:
+            ValueError: if `file_format` or `durability` is unknown, or
+                `shards` is not a positive number or is combined with
+                `journal`
+
+        """
+        if file_format not in ('json', 'binary'):
+            raise ValueError("unknown file format: {}".format(file_format))
+        if shards is not None and (shards < 1 or journal is True):
+            raise ValueError("shards must be a positive number of files "
+                             "and cannot be combined with the journal")
+        self.shards = shards
+        self.file_format = file_format
+        if file_format == 'binary':
+            self.__file_path = path.splitext(self.__file_path)[0] + '.bin'
+            lazy = True
+        self.lazy = lazy
+        self.durability = Durability(durability)
+        self.journal = None
+        self.compactor = None
+        if journal is True:
+            self.journal = Journal(self.__file_path + '.journal',
+                                   self.durability)
+            self.compactor = Compactor(self.__file_path, self.journal,
+                                       binary=file_format == 'binary',
+                                       durability=self.durability)
+        self.__dirty = dict()
+        self.__created = set()
+        self.__mutable = set()
+        self.__encoded = dict()
+        self.__prepared = set()
+        self.__classes = dict()
+        self.__synced = None
+        self.__size = 0
+        self.__indexes = dict()
+        self.__records = dict()
+        self.__models = dict()
+        self.__written = None
+        self.__stale = set()
+        self.__undo = None
+        self.__before = None
+        self.__depth = 0
+        self.__pending = False
+        self.__lock = threading.RLock()
+        self.flusher = None
+        if write_behind is not None:
+            self.flusher = Flusher(self.__save_behind, write_behind,
+                                   flush_after)
+        if (self.flusher is not None or self.journal is not None or
+                self.durability.mode == 'group'):
+            atexit.register(self.close)
 
-    def all(self):
+    def all(self, cls=None):
         """The dictionary items are returned__objects.
 
+        Args:
+            cls (type or str): only return the objects of this class
+
         Returns:
             __objects (dict): dict items with `BaseModel` and child
                 classes as values, and '<object class name>.<object.id>' as
@@ -34,7 +194,511 @@ class FileStorage():
             5. Store first object
 
         """
-        return self.__objects
+        if cls is None:
+            for name in list(self.__records):
+                self.__hydrate(name)
+            return self.__objects
+        name = cls if type(cls) is str else cls.__name__
+        partition = self.__partition(name)
+        prefix = name + '.'
+        return {prefix + obj_id: obj for obj_id, obj in partition.items()}
+
+    def get(self, cls, id):
+        """Returns the object of class `cls` with the given id.
+
+        Args:
+            cls (type or str): class of the object
+            id (str): id of the object
+
+        Returns:
+            the object, or None if there is none
+
+        """
+        name = cls if type(cls) is str else cls.__name__
+        records = self.__records.get(name)
+        if records is not None and id in records:
+            self.__hydrate(name, id)
+        self.__sync()
+        return self.__classes.get(name, {}).get(id)
+
+    def model(self, name):
+        """Returns the model class called `name`, None if there is none."""
+        return self.__models.get(name)
+
+    def count(self, cls=None):
+        """Returns the number of objects of class `cls`.
+
+        Args:
+            cls (type or str): class to count, every object if None
+
+        """
+        if cls is None:
+            total = len(self.__objects)
+            for records in self.__records.values():
+                total += len(records)
+            return total
+        name = cls if type(cls) is str else cls.__name__
+        self.__sync()
+        return (len(self.__classes.get(name, {})) +
+                len(self.__records.get(name, {})))
+
+    def add_index(self, cls, attr, kind='hash'):
+        """Declares an index on attribute `attr` of class `cls`.
+
+        Args:
+            cls (type or str): class of the indexed objects
+            attr (str or tuple): name of the indexed attribute, or
+                (latitude, longitude) attribute names for a spatial index
+            kind (str): 'hash' for equality lookups, 'ordered' for range
+                queries, min/max and ordered iteration, 'spatial' for
+                radius, bounding box and nearest neighbour queries,
+                'columns' for numeric attributes filtered and aggregated
+                as arrays, `attr` then being a tuple of attribute names
+
+        Returns:
+            the `HashIndex`, `OrderedIndex`, `GridIndex` or `ColumnStore`,
+            filled with the objects already stored
+
+        """
+        name = cls if type(cls) is str else cls.__name__
+        indexes = self.__indexes.setdefault(name, dict())
+        if (attr, kind) not in indexes:
+            if kind == 'hash':
+                index = HashIndex(attr)
+            elif kind == 'ordered':
+                index = OrderedIndex(attr)
+            elif kind == 'spatial':
+                index = GridIndex(attr)
+            elif kind == 'columns':
+                index = ColumnStore(attr)
+            else:
+                raise ValueError("unknown index kind: {}".format(kind))
+            prefix = name + '.'
+            self.__sync()
+            index.rebuild((prefix + obj_id, obj) for obj_id, obj
+                          in self.__classes.get(name, {}).items())
+            indexes[(attr, kind)] = index
+        return indexes[(attr, kind)]
+
+    def index(self, cls, attr, kind='hash'):
+        """Returns the index of `kind` on `attr` of class `cls`, or None.
+        """
+        name = cls if type(cls) is str else cls.__name__
+        self.__partition(name)
+        return self.__indexes.get(name, {}).get((attr, kind))
+
+    def columns(self, cls, attr):
+        """Returns the `ColumnStore` of class `cls` holding `attr`, or None.
+
+        None is also returned while the class has records kept in lazy
+        mode, which the columns do not cover, so asking never builds them.
+        """
+        name = cls if type(cls) is str else cls.__name__
+        if name in self.__records:
+            return None
+        self.__sync()
+        for (attrs, kind), index in self.__indexes.get(name, {}).items():
+            if kind == 'columns' and attr in index.attrs:
+                return index
+        return None
+
+    def lookup(self, cls, attr, value):
+        """Returns the objects of class `cls` whose `attr` equals `value`.
+
+        The hash index on `attr` is used when there is one, so the cost is
+        proportional to the number of matches; otherwise the class
+        partition is scanned.
+
+        Args:
+            cls (type or str): class of the objects
+            attr (str): name of the attribute
+            value: value to look for
+
+        Returns:
+            list of matching objects
+
+        """
+        partition = self.__partition(cls if type(cls) is str
+                                     else cls.__name__)
+        index = self.index(cls, attr)
+        if index is not None:
+            try:
+                return index.lookup(value)
+            except TypeError:
+                pass
+        return [obj for obj in partition.values()
+                if getattr(obj, attr, None) == value]
+
+    def range(self, cls, attr, lo=None, hi=None, lo_inclusive=True,
+              hi_inclusive=True, limit=None):
+        """Returns the objects of class `cls` whose `attr` lies between
+        `lo` and `hi`, in ascending order of `attr`.
+
+        The ordered index on `attr` is used when there is one, so the cost
+        is proportional to the number of matches; otherwise the class
+        partition is scanned and sorted.
+
+        Args:
+            cls (type or str): class of the objects
+            attr (str): name of the attribute
+            lo: lower bound, None for no bound
+            hi: upper bound, None for no bound
+            lo_inclusive (bool): include objects equal to `lo`
+            hi_inclusive (bool): include objects equal to `hi`
+            limit (int): only return the first `limit` matches
+
+        Returns:
+            list of matching objects
+
+        """
+        index = self.index(cls, attr, 'ordered')
+        if index is None:
+            index = OrderedIndex(attr)
+            name = cls if type(cls) is str else cls.__name__
+            prefix = name + '.'
+            index.rebuild((prefix + obj_id, obj) for obj_id, obj
+                          in self.__partition(name).items())
+        return index.range(lo, hi, lo_inclusive, hi_inclusive, limit)
+
+    def column(self, cls, attr):
+        """Returns the value of `attr` for every object of class `cls`.
+
+        The values come in the order of `all`, followed by the records
+        kept in lazy mode, which are read without building their objects.
+        Objects without the attribute give the class default of a declared
+        field, None otherwise.
+
+        Args:
+            cls (type or str): class of the objects
+            attr (str): name of the attribute
+
+        Returns:
+            list of values
+
+        """
+        name = cls if type(cls) is str else cls.__name__
+        with self.__lock:
+            self.__sync()
+            default = getattr(self.__models.get(name), '__fields__',
+                              {}).get(attr)
+            values = [getattr(obj, attr, default)
+                      for obj in self.__classes.get(name, {}).values()]
+            for record in self.__records.get(name, {}).values():
+                values.append(self.__fetch(record).get(attr, default))
+        return values
+
+    def where(self, cls, query):
+        """Returns the objects of class `cls` matching every condition of
+        `query`.
+
+        The planner of `models.engine.query` reads the candidates from the
+        most selective index on a queried attribute, and only scans the
+        class when none applies.
+
+        Args:
+            cls (type or str): class of the objects
+            query (str or list): query text such as
+                'city_id="0001", price_by_night>100', or `Predicate` list
+
+        Returns:
+            list of matching objects
+
+        Raises:
+            ValueError: if the query text is malformed
+
+        """
+        if type(query) is str:
+            query = parse_query(query)
+        return plan_query(self, cls, query).run()
+
+    def page(self, cls=None, after=None, limit=None):
+        """Returns objects in ascending order of id, for keyset paging.
+
+        The next page starts after the id of the last object of this one.
+        A page picks the `limit` smallest ids after `after` from the class
+        partition, which costs a pass over the class.  When an ordered
+        index on `id` is declared with `add_index`, a page costs a binary
+        search plus its own objects instead, but every new object then
+        pays for its insertion in the sorted ids.  Without a class, the
+        pages of every class are merged by id.
+
+        Args:
+            cls (type or str): class of the objects, every class if None
+            after (str): only return objects whose id sorts after it
+            limit (int): maximum number of objects, no maximum if None
+
+        Returns:
+            list of objects
+
+        """
+        if cls is None:
+            self.__sync()
+            names = sorted(set(self.__classes) | set(self.__records))
+            pages = [self.page(name, after, limit) for name in names]
+            return list(islice(heapq.merge(*pages, key=_id), limit))
+        name = cls if type(cls) is str else cls.__name__
+        partition = self.__partition(name)
+        if self.__indexes.get(name, {}).get(('id', 'ordered')) is not None:
+            return self.range(name, 'id', after, None, after is None, True,
+                              limit)
+        ids = (obj_id for obj_id in partition
+               if after is None or obj_id > after)
+        if limit is None:
+            ids = sorted(ids)
+        else:
+            ids = heapq.nsmallest(limit, ids)
+        return [partition[obj_id] for obj_id in ids]
+
+    def __spatial(self, cls):
+        """Returns the spatial index of class `cls`, or a temporary one
+        built from its partition if it has none."""
+        index = self.index(cls, ('latitude', 'longitude'), 'spatial')
+        if index is None:
+            index = GridIndex()
+            name = cls if type(cls) is str else cls.__name__
+            prefix = name + '.'
+            index.rebuild((prefix + obj_id, obj) for obj_id, obj
+                          in self.__partition(name).items())
+        return index
+
+    def near(self, cls, lat, lon, radius_km):
+        """Returns the objects of class `cls` within `radius_km` of a point.
+
+        Args:
+            cls (type or str): class of the objects
+            lat (float): latitude of the point
+            lon (float): longitude of the point
+            radius_km (float): search radius in km
+
+        Returns:
+            list of (distance in km, object) pairs, nearest first
+
+        """
+        return self.__spatial(cls).near(lat, lon, radius_km)
+
+    def within(self, cls, min_lat, min_lon, max_lat, max_lon):
+        """Returns the objects of class `cls` inside a bounding box.
+
+        Args:
+            cls (type or str): class of the objects
+            min_lat (float): southern edge
+            min_lon (float): western edge
+            max_lat (float): northern edge
+            max_lon (float): eastern edge
+
+        Returns:
+            list of objects
+
+        """
+        return self.__spatial(cls).within(min_lat, min_lon, max_lat, max_lon)
+
+    def k_nearest(self, cls, lat, lon, k):
+        """Returns the `k` objects of class `cls` nearest to a point.
+
+        Args:
+            cls (type or str): class of the objects
+            lat (float): latitude of the point
+            lon (float): longitude of the point
+            k (int): number of objects to return
+
+        Returns:
+            list of (distance in km, object) pairs, nearest first
+
+        """
+        return self.__spatial(cls).k_nearest(lat, lon, k)
+
+    def export(self, file, cls=None, attrs=None):
+        """Writes the stored objects to `file` as JSON lines, one record
+        per line, in the `to_dict` format.
+
+        Records are written as they are produced, so memory does not grow
+        with the number of objects.  Records kept in lazy mode are written
+        without building their objects, and the JSON text cached by the
+        previous save is reused for objects that have not changed since.
+
+        Args:
+            file (file object): text file open for writing
+            cls (type or str): only export the objects of this class
+            attrs (list): names of the only attributes to write, in order;
+                declared fields an object does not hold are written with
+                their class default, other missing attributes are left out
+
+        Returns:
+            int: number of records written
+
+        """
+        count = 0
+        with self.__lock:
+            self.__sync()
+            if cls is None:
+                names = list(self.__classes)
+                names += [name for name in self.__records
+                          if name not in self.__classes]
+            else:
+                names = [cls if type(cls) is str else cls.__name__]
+            for name in names:
+                fields = getattr(self.__models.get(name), '__fields__', {})
+                for source, text in self.__export_items(name):
+                    if attrs is not None or text is None:
+                        if type(source) in (dict, tuple):
+                            record = self.__fetch(source)
+                        else:
+                            record = source.to_dict()
+                        if attrs is not None:
+                            record = {attr: record[attr] if attr in record
+                                      else fields[attr] for attr in attrs
+                                      if attr in record or attr in fields}
+                        text = json.dumps(record)
+                    file.write(text + '\n')
+                    count += 1
+        return count
+
+    def __export_items(self, name):
+        """Yields (object or lazy record, JSON text or None) for class
+        `name`, the text being the one cached by the previous save when it
+        still matches."""
+        prefix = name + '.'
+        # Journal saves do not refresh the cache.
+        encoded = self.__encoded if self.journal is None else {}
+        for obj_id, obj in self.__classes.get(name, {}).items():
+            key = prefix + obj_id
+            cached = encoded.get(key)
+            if (cached is not None and cached[0] is obj and
+                    type(cached[1]) is str and key not in self.__mutable and
+                    (key not in self.__dirty or key in self.__prepared)):
+                yield obj, cached[1][len(json.dumps(key)) + 2:]
+            else:
+                yield obj, None
+        for obj_id, record in self.__records.get(name, {}).items():
+            key = prefix + obj_id
+            cached = encoded.get(key)
+            if (cached is not None and cached[0] is record and
+                    type(cached[1]) is str):
+                yield record, cached[1][len(json.dumps(key)) + 2:]
+            else:
+                yield record, None
+
+    def __partition(self, name):
+        """Returns the {id: object} partition of class `name`."""
+        if name in self.__records:
+            self.__hydrate(name)
+        self.__sync()
+        return self.__classes.get(name, {})
+
+    def __hydrate(self, name, obj_id=None):
+        """Builds the objects of the records kept in lazy mode.
+
+        Args:
+            name (str): class name of the records
+            obj_id (str): id of the only record to build, all the records
+                of the class if None
+
+        """
+        with self.__lock:
+            records = self.__records.get(name)
+            if records is None:
+                return
+            obj_class = self.__models[name]
+            prefix = name + '.'
+            if obj_id is not None:
+                record = self.__fetch(records.pop(obj_id))
+                self.__insert(prefix + obj_id, obj_class(**record))
+            else:
+                indexes = self.__indexes.pop(name, None)
+                for obj_id, record in records.items():
+                    self.__insert(prefix + obj_id,
+                                  obj_class(**self.__fetch(record)))
+                records.clear()
+                if indexes is not None:
+                    self.__indexes[name] = indexes
+                    for index in indexes.values():
+                        index.rebuild((prefix + obj_id, obj) for obj_id, obj
+                                      in self.__classes[name].items())
+            if len(records) == 0:
+                del self.__records[name]
+
+    @staticmethod
+    def __fetch(record):
+        """Returns the attributes of a lazy record, decoding it first if it
+        is a (snapshot, position) reference."""
+        if type(record) is tuple:
+            snapshot, position = record
+            return snapshot.value(position)
+        return record
+
+    def __load(self, key, value):
+        """Stores a record read from disk, as an object unless lazy."""
+        with self.__lock:
+            if self.lazy is True:
+                name, _, obj_id = key.partition('.')
+                self.__remove(key)
+                self.__records.setdefault(name, dict())[obj_id] = value
+            else:
+                obj_class = self.__models[value['__class__']]
+                self.__insert(key, obj_class(**value))
+
+    def __unload(self, key):
+        """Forgets the object or record stored under `key`."""
+        with self.__lock:
+            name, _, obj_id = key.partition('.')
+            records = self.__records.get(name)
+            if records is not None and records.pop(obj_id, None) is not None:
+                if len(records) == 0:
+                    del self.__records[name]
+            self.__remove(key)
+
+    def __sync(self):
+        """Rebuilds the class partitions if __objects changed under them."""
+        with self.__lock:
+            if (self.__synced is not self.__objects or
+                    self.__size != len(self.__objects)):
+                self.__classes = dict()
+                self.__mutable = set()
+                for key, obj in self.__objects.items():
+                    name_, _, obj_id = key.partition('.')
+                    self.__classes.setdefault(name_, dict())[obj_id] = obj
+                    if _mutable(obj):
+                        self.__mutable.add(key)
+                self.__synced = self.__objects
+                self.__size = len(self.__objects)
+                self.__reindex()
+
+    def __reindex(self):
+        """Rebuilds every index from the class partitions."""
+        for name, indexes in self.__indexes.items():
+            prefix = name + '.'
+            for index in indexes.values():
+                index.rebuild((prefix + obj_id, obj) for obj_id, obj
+                              in self.__classes.get(name, {}).items())
+
+    def __insert(self, key, obj):
+        """Stores `obj` under `key` in __objects and its class partition."""
+        with self.__lock:
+            self.__sync()
+            if key not in self.__objects:
+                self.__size += 1
+            self.__objects[key] = obj
+            if _mutable(obj):
+                self.__mutable.add(key)
+            else:
+                self.__mutable.discard(key)
+            name, _, obj_id = key.partition('.')
+            self.__classes.setdefault(name, dict())[obj_id] = obj
+            for index in self.__indexes.get(name, {}).values():
+                index.update(key, obj)
+
+    def __remove(self, key):
+        """Removes `key` from __objects and its class partition."""
+        with self.__lock:
+            self.__sync()
+            if key in self.__objects:
+                del self.__objects[key]
+                self.__size -= 1
+                self.__mutable.discard(key)
+                name, _, obj_id = key.partition('.')
+                del self.__classes[name][obj_id]
+                for index in self.__indexes.get(name, {}).values():
+                    index.discard(key)
 
     def new(self, obj):
         """Sets new object in __objects with key value.
@@ -48,25 +712,644 @@ class FileStorage():
             5. Store first object
 
         """
-        self.__objects[obj.__class__.__name__ + '.' + obj.id] = obj
+        with self.__lock:
+            key = obj.__class__.__name__ + '.' + obj.id
+            if self.__undo is not None:
+                self.__keep(key)
+            self.__unload(key)
+            self.__insert(key, obj)
+            self.__dirty[key] = obj
+            self.__created.add(key)
+
+    def bulk_create(self, cls, count, **attrs):
+        """Creates `count` objects of `cls` and saves them once.
+
+        The ids are generated in batches, the objects are built from a
+        shared template and serialized from it, and they are added to
+        __objects, their class partition and each index of the class in
+        one pass.
+
+        Args:
+            cls (type or str): model class of the objects
+            count (int): number of objects to create
+            **attrs: attributes set on every object
+
+        Returns:
+            list of the new objects
+
+        Raises:
+            ValueError: if `count` is negative
+            TypeError: if `attrs` holds `id`, `created_at` or `updated_at`
+
+        """
+        from ..base_model import new_ids
+
+        if count < 0:
+            raise ValueError("count must not be negative")
+        if type(cls) is str:
+            cls = self.__models[cls]
+        name = cls.__name__
+        prefix = name + '.'
+        ids = list(new_ids(count))
+        objects = list(cls.build_many(ids, **attrs))
+        with self.__lock:
+            self.__sync()
+            partition = self.__classes.setdefault(name, dict())
+            items = dict()
+            for obj_id, obj in zip(ids, objects):
+                key = prefix + obj_id
+                self.__objects[key] = obj
+                partition[obj_id] = obj
+                items[key] = obj
+            self.__size = len(self.__objects)
+            self.__dirty.update(items)
+            self.__created.update(items)
+            if self.__undo is not None:
+                self.__undo.update(dict.fromkeys(items, (None, None, None)))
+            if len(objects) > 0:
+                for index in self.__indexes.get(name, {}).values():
+                    index.add_many(items, objects[0])
+                if _mutable(objects[0]):
+                    self.__mutable.update(items)
+                else:
+                    self.__prepare(items)
+        self.save()
+        return objects
+
+    def __prepare(self, items):
+        """Serializes objects built from one template in advance.
+
+        The first object is serialized and the others get a copy of it with
+        their own id, which the next save uses instead of calling `to_dict`
+        on each of them unless they are touched in between.
+
+        Args:
+            items (dict): {key: object} of the objects
+
+        """
+        if (self.journal is not None or
+                type(self)._write is not FileStorage._write):
+            # Journal records and other engines do not use these forms.
+            return
+        key, obj = next(iter(items.items()))
+        first = self.__encode(key, obj.to_dict())
+        obj_id = key.partition('.')[2]
+        if self.file_format == 'binary':
+            pieces = first[1].split(obj_id.encode('utf-8'))
+            if len(pieces) != 2:
+                return
+            for key, obj in items.items():
+                obj_id = key.partition('.')[2].encode('utf-8')
+                self.__encoded[key] = (obj, (key, obj_id.join(pieces)))
+        else:
+            pieces = first.split(obj_id)
+            if len(pieces) != 3:
+                return
+            for key, obj in items.items():
+                self.__encoded[key] = (obj,
+                                       key.partition('.')[2].join(pieces))
+        self.__prepared.update(items)
+
+    def touch(self, obj, attr=None):
+        """Marks `obj` as modified so the next `save` persists it, and
+        brings the indexes of its class up to date.
+
+        Objects that are not in __objects, such as copies built from a
+        dictionary, are ignored.
+
+        Args:
+            obj (BaseModel or child): object whose attributes changed
+            attr (str): name of the changed attribute, None if unknown
+
+        """
+        with self.__lock:
+            obj_id = obj.__dict__.get('id')
+            if obj_id is None:
+                return
+            name = obj.__class__.__name__
+            key = name + '.' + obj_id
+            if self.__objects.get(key) is not obj:
+                return
+            self.__dirty[key] = obj
+            if self.__prepared:
+                self.__prepared.discard(key)
+            if key not in self.__mutable and _mutable(obj, attr):
+                self.__mutable.add(key)
+            indexes = self.__indexes.get(name)
+            if indexes:
+                for index in indexes.values():
+                    if attr is None or attr in index.attrs:
+                        index.update(key, obj)
+
+    def delete(self, obj=None):
+        """Removes `obj` from __objects if it is there.
+
+        Args:
+            obj (BaseModel or child): object to remove, nothing happens when
+                it is None
+
+        """
+        with self.__lock:
+            if obj is None:
+                return
+            key = obj.__class__.__name__ + '.' + obj.id
+            if key in self.__objects:
+                if self.__undo is not None:
+                    self.__keep(key)
+                self.__remove(key)
+                self.__dirty[key] = None
+                self.__created.discard(key)
+
+    def preserve(self, obj):
+        """Copies the attributes of `obj` before it is first changed in the
+        current transaction, so that `rollback` can restore them.
+
+        `BaseModel` calls it before every attribute write.  Nothing happens
+        outside a transaction or for objects not in __objects.
+
+        Args:
+            obj (BaseModel or child): object about to be changed
+
+        """
+        if self.__undo is None:
+            return
+        obj_id = obj.__dict__.get('id')
+        if obj_id is None:
+            return
+        key = obj.__class__.__name__ + '.' + obj_id
+        if key not in self.__undo and self.__objects.get(key) is obj:
+            self.__keep(key)
+
+    def __keep(self, key):
+        """Records the state of `key` at the start of the transaction."""
+        if key in self.__undo:
+            return
+        name, _, obj_id = key.partition('.')
+        obj = self.get(name, obj_id)
+        if obj is None:
+            self.__undo[key] = (None, None, None)
+            return
+        attrs = obj.__dict__
+        changed = getattr(attrs, 'changed', None)
+        self.__undo[key] = (obj, dict(attrs),
+                            None if changed is None else set(changed))
+
+    def begin(self):
+        """Starts a transaction.
+
+        A `begin` inside a transaction nests in it: only the outermost
+        `commit` saves, and `rollback` undoes the whole transaction.
+
+        """
+        with self.__lock:
+            if self.__undo is None:
+                self.__undo = dict()
+                self.__before = (dict(self.__dirty), set(self.__created))
+                self.__pending = False
+            self.__depth += 1
+
+    def commit(self):
+        """Ends the current transaction, saving once if a save was asked
+        for during it.
+
+        If that save fails, the transaction is rolled back before the
+        error is raised, so memory never keeps changes the file does not
+        have.  In write-behind mode the save is left to the flusher.
+
+        Raises:
+            RuntimeError: if no transaction is in progress
+
+        """
+        with self.__lock:
+            if self.__undo is None:
+                raise RuntimeError("no transaction in progress")
+            self.__depth -= 1
+            if self.__depth > 0:
+                return
+            pending = self.__pending
+            if pending is True and self.flusher is None:
+                try:
+                    self.__save()
+                except BaseException:
+                    self.rollback()
+                    raise
+            self.__end()
+        if pending is True and self.flusher is not None:
+            self.save()
+
+    def rollback(self):
+        """Ends the current transaction, putting back in memory every
+        object created, changed or deleted since it began.  They are all
+        marked dirty, so the next save writes them back whatever a failed
+        commit may have written.
+
+        Raises:
+            RuntimeError: if no transaction is in progress
+
+        """
+        from ..base_model import Attributes
+
+        with self.__lock:
+            if self.__undo is None:
+                raise RuntimeError("no transaction in progress")
+            undo = self.__undo
+            dirty, created = self.__before
+            self.__end()
+            for key, (obj, attrs, changed) in undo.items():
+                self.__prepared.discard(key)
+                if obj is None:
+                    self.__unload(key)
+                    dirty[key] = None
+                    continue
+                Attributes(obj).restore(attrs, changed)
+                self.__insert(key, obj)
+                dirty[key] = obj
+            self.__dirty = dirty
+            self.__created = created
+
+    def __end(self):
+        """Forgets the state of the current transaction."""
+        self.__undo = None
+        self.__before = None
+        self.__depth = 0
+        self.__pending = False
+
+    def in_transaction(self):
+        """Returns True between `begin` and the `commit` or `rollback`
+        ending the transaction."""
+        return self.__undo is not None
+
+    @contextmanager
+    def transaction(self):
+        """Runs the body of a `with` statement in a transaction, committed
+        at the end of the block or rolled back if it raises.
+
+        Yields:
+            the storage
+
+        """
+        self.begin()
+        try:
+            yield self
+        except BaseException:
+            self.rollback()
+            raise
+        self.commit()
 
     def save(self):
         """__objects are serialized to the JSON file path: __file_path
 
+        In journal mode only the objects created, changed or deleted since
+        the previous save are appended to the journal, as a put record for
+        new objects and objects holding a list, dict or set, and a patch
+        record holding the changed attributes for the others.  Inside a
+        transaction, the save is put off until `commit`; in write-behind
+        mode, until the flusher runs.
+
         Project tasks:
            5. Store first object
 
         """
-        json_dict = dict()
-        for key, value in self.__objects.items():
-            json_dict[key] = value.to_dict()
-        with open(self.__file_path, 'w', encoding='utf-8') as file:
-            file.write(json.dumps(json_dict))
+        if self.__undo is not None:
+            self.__pending = True
+        elif self.flusher is not None:
+            self.flusher.request()
+        else:
+            self.__save()
+
+    def flush(self):
+        """Writes the saves put off by write-behind mode now."""
+        if self.flusher is not None:
+            self.flusher.drain()
+
+    def close(self):
+        """Writes what is pending and forces it to disk; runs at exit
+        when write-behind, the journal or group durability is used."""
+        atexit.unregister(self.close)
+        self.flush()
+        if self.journal is not None:
+            self.journal.close()
+        self.durability.sync()
+
+    def __save(self):
+        """Persists the changes made since the previous save; if the write
+        fails, they are kept for the next one."""
+        with self.__lock:
+            self.__sync()
+            dirty = self.__dirty
+            for key in self.__mutable:
+                if key not in dirty and key in self.__objects:
+                    dirty[key] = self.__objects[key]
+            created = self.__created
+            self.__dirty = dict()
+            self.__created = set()
+            try:
+                self._write(dirty, created)
+            except BaseException:
+                dirty.update(self.__dirty)
+                self.__dirty = dirty
+                self.__created = created | self.__created
+                raise
+            self.__prepared = set()
+            for obj in dirty.values():
+                if obj is not None:
+                    self.__clean(obj)
+
+    def __save_behind(self):
+        """Saves from the flusher thread, unless a transaction is in
+        progress: its changes are only written once it is committed, when
+        `commit` asks the flusher again."""
+        with self.__lock:
+            if self.__undo is not None:
+                self.__pending = True
+                return
+            self.__save()
+
+    def _write(self, dirty, created):
+        """Persists the objects changed since the previous save.
+
+        Args:
+            dirty (dict): {key: object, None if deleted} changed since the
+                previous save
+            created (set): keys of the objects created since then
+
+        """
+        if self.journal is not None:
+            records = []
+            for key, obj in dirty.items():
+                if obj is None:
+                    records.append(('del', key, None))
+                else:
+                    records.append(self.__record(key, obj, key in created))
+            self.journal.append(records)
+            if self.compactor is not None:
+                self.compactor.maybe_compact()
+            return
+
+        if self.shards is not None:
+            self.__save_shards(dirty)
+            return
+
+        parts = []
+        for key, obj in self.__objects.items():
+            parts.append(self.__part(key, obj, dirty))
+        for name, records in self.__records.items():
+            prefix = name + '.'
+            for obj_id, record in records.items():
+                parts.append(self.__record_part(prefix + obj_id, record))
+        self.__prune()
+        self.__write(self.__file_path, parts)
+        Journal(self.__file_path + '.journal').clear()
+
+    def __save_shards(self, dirty):
+        """Rewrites the shard files holding the objects of `dirty`.
+
+        Every shard of a class is rewritten when __objects was replaced
+        since the last save, or when the files of the class were written
+        with another number of shards.
+
+        Args:
+            dirty (dict): {key: object, None if deleted} to persist
+
+        """
+        directory = self.__shard_dir()
+        extension = self.__extension()
+        shards = self.shards
+        self.__sync()
+        written = list_shards(directory, extension)
+        # {class name: numbers of the shards to rewrite, None for all}
+        todo = dict()
+        if self.__written is not self.__objects:
+            for name in (set(self.__classes) | set(self.__records) |
+                         set(name for name, filename in written)):
+                todo[name] = None
+        for name in self.__stale:
+            todo[name] = None
+        for key in dirty:
+            name, _, obj_id = key.partition('.')
+            if name not in todo:
+                todo[name] = set()
+            if todo[name] is not None:
+                todo[name].add(shard_of(obj_id, shards))
+
+        makedirs(directory, exist_ok=True)
+        for name, numbers in todo.items():
+            prefix = name + '.'
+            parts = dict()
+            for obj_id, obj in self.__classes.get(name, {}).items():
+                shard = shard_of(obj_id, shards)
+                if numbers is None or shard in numbers:
+                    parts.setdefault(shard, []).append(
+                        self.__part(prefix + obj_id, obj, dirty))
+            for obj_id, record in self.__records.get(name, {}).items():
+                shard = shard_of(obj_id, shards)
+                if numbers is None or shard in numbers:
+                    parts.setdefault(shard, []).append(
+                        self.__record_part(prefix + obj_id, record))
+            # Shards left without objects are removed, and so are all the
+            # files of a class that is rewritten as a whole.
+            kept = set(shard_name(name, shard, shards, extension)
+                       for shard in parts)
+            emptied = set(shard_name(name, shard, shards, extension)
+                          for shard in numbers or ())
+            for name_, filename in written:
+                if (name_ == name and filename not in kept and
+                        (numbers is None or filename in emptied)):
+                    remove(path.join(directory, filename))
+            for shard, shard_parts in parts.items():
+                self.__write(path.join(directory, shard_name(
+                    name, shard, shards, extension)), shard_parts)
+        self.__prune()
+        self.__stale = set()
+        self.__written = self.__objects
+
+    def __shard_dir(self):
+        """Returns the directory of the shard files."""
+        return path.splitext(self.__file_path)[0]
+
+    def __extension(self):
+        """Returns the extension of the shard files."""
+        return '.bin' if self.file_format == 'binary' else '.json'
+
+    def _read(self, classes):
+        """Yields the records of the file, then replays the journal.
+
+        Each record is loaded by `reload` before the next one is read, so
+        journal records apply on top of the records yielded before them.
+
+        Args:
+            classes (list): model classes whose objects are stored
+
+        Yields:
+            (key, record) pairs to load
+
+        """
+        shards = []
+        if self.shards is not None:
+            shards = list_shards(self.__shard_dir(), self.__extension())
+        if len(shards) > 0:
+            yield from self.__read_shards(shards)
+            self.__written = self.__objects
+        elif path.exists(self.__file_path) is False:
+            pass
+        elif self.file_format == 'binary':
+            snapshot = Snapshot(self.__file_path)
+            for position, key in snapshot.keys():
+                yield key, (snapshot, position)
+        else:
+            with open(self.__file_path, 'r', encoding='utf-8') as file:
+                yield from iter_json_object(file)
+
+        journal = self.journal
+        if journal is None:
+            journal = Journal(self.__file_path + '.journal')
+        for op, key, value in journal.replay():
+            if op == 'del':
+                self.__unload(key)
+            elif op == 'patch':
+                name, _, obj_id = key.partition('.')
+                record = self.__records.get(name, {}).get(obj_id)
+                if record is not None:
+                    record = self.__fetch(record)
+                    record.update(value)
+                    self.__records[name][obj_id] = record
+                elif key in self.__objects:
+                    record = self.__objects[key].to_dict()
+                    record.update(value)
+                    yield key, record
+            else:
+                yield key, value
+
+    def __read_shards(self, shards):
+        """Yields the records of the shard files.
+
+        A class whose records are not all in the shard their id hashes to
+        was saved with another number of shards, and is marked to be
+        rewritten as a whole on the next save.
+
+        Args:
+            shards (list): (class name, filename) pairs from `list_shards`
+
+        """
+        directory = self.__shard_dir()
+        extension = self.__extension()
+        if self.file_format == 'binary':
+            loaded = []
+            for name, filename in shards:
+                snapshot = Snapshot(path.join(directory, filename))
+                loaded.append((filename, [(key, (snapshot, position))
+                                          for position, key
+                                          in snapshot.keys()]))
+        else:
+            loaded = read_shards([path.join(directory, filename)
+                                  for name, filename in shards])
+        for file_path, pairs in loaded:
+            filename = path.basename(file_path)
+            for key, value in pairs:
+                name, _, obj_id = key.partition('.')
+                if shard_name(name, shard_of(obj_id, self.shards),
+                              self.shards, extension) != filename:
+                    self.__stale.add(name)
+                yield key, value
+
+    def __part(self, key, obj, dirty):
+        """Returns the serialized form of an object, reusing the one of
+        the previous save unless the object is dirty."""
+        cached = self.__encoded.get(key)
+        if (cached is None or cached[0] is not obj or
+                key in dirty and key not in self.__prepared):
+            cached = (obj, self.__encode(key, obj.to_dict()))
+            self.__encoded[key] = cached
+            self.__clean(obj)
+        return cached[1]
+
+    def __record_part(self, key, record):
+        """Returns the serialized form of a record that was never built."""
+        if self.file_format == 'binary' and type(record) is tuple:
+            # Copied as is from the snapshot it was read from.
+            return (key, record[0].raw(record[1]))
+        cached = self.__encoded.get(key)
+        if cached is None or cached[0] is not record:
+            cached = (record, self.__encode(key, record))
+            self.__encoded[key] = cached
+        return cached[1]
+
+    def __prune(self):
+        """Drops the serialized forms of objects no longer stored."""
+        encoded = self.__encoded
+        if len(encoded) > self.count():
+            for key in list(encoded):
+                name, _, obj_id = key.partition('.')
+                if (key not in self.__objects and
+                        obj_id not in self.__records.get(name, {})):
+                    del encoded[key]
+
+    def __write(self, file_path, parts):
+        """Writes serialized records to `file_path` in the file format of
+        the storage."""
+        if self.file_format == 'binary':
+            write_snapshot(file_path, parts, self.durability)
+        else:
+            with self.durability.replace(file_path) as file:
+                file.write('{' + ', '.join(parts) + '}')
+
+    def __encode(self, key, record):
+        """Serializes one record for the file format of the storage.
+
+        Returns:
+            the '"<key>": <record>' JSON fragment, or the (key, bytes) pair
+            of a binary snapshot
+
+        """
+        if self.file_format == 'binary':
+            return (key, encode(record))
+        return json.dumps(key) + ': ' + json.dumps(self.__fetch(record))
+
+    def __record(self, key, obj, created):
+        """Builds the journal record of a dirty object.
+
+        Args:
+            key (str): '<object class name>.<object.id>'
+            obj (BaseModel or child): object to persist
+            created (bool): True if `obj` is new since the last save
+
+        Returns:
+            ('put', key, <to_dict()>) or ('patch', key, <changed attributes>),
+            always a put for an object holding values that can change in
+            place
+
+        """
+        value = obj.to_dict()
+        changed = getattr(obj.__dict__, 'changed', None)
+        if (created is True or changed is None or 'id' in changed or
+                key in self.__mutable):
+            return ('put', key, value)
+        for name in changed:
+            if name not in value:
+                return ('put', key, value)
+        return ('patch', key, {name: value[name] for name in changed})
+
+    @staticmethod
+    def __clean(obj):
+        """Forgets the attribute writes recorded on `obj`."""
+        attrs = obj.__dict__
+        if getattr(attrs, 'changed', None) is not None:
+            attrs.changed = None
 
     def reload(self):
         """deserializes the JSON file at __file_path into __objects.
         exists; otherwise, there are no exceptions.
 
+        Records left in '<__file_path>.journal' are replayed on top of the
+        JSON file afterwards; a compaction in progress is waited for first.
+        The file is decoded one record at a time and each record is turned
+        into an object as soon as it is read, so the whole text and the
+        whole decoded dict are never held at once.  In lazy mode the
+        records are kept as they are decoded and the objects are built on
+        first access.  A binary snapshot is opened with `mmap` and only its
+        key table is read.  In sharded mode the shard files are read
+        instead, or the single file if there are no shards yet.
+
         Project tasks:
             5. Store first object
 
@@ -83,14 +1366,38 @@ class FileStorage():
         class_dict = dict()
         for c in classes:
             class_dict[c.__name__] = c
+        self.__models = class_dict
 
-        if path.exists(self.__file_path) is True:
-            with open(self.__file_path, 'r', encoding='utf-8') as file:
-                content = file.read()
-                if content is not None and content != '':
-                    json_dict = json.loads(content)
-                    for key, value in json_dict.items():
-                        obj_class = class_dict[value['__class__']]
-                        self.__objects[key] = obj_class(**value)
-        else:
-            pass
+        # Indexes are detached while loading and rebuilt in one pass after.
+        indexes = self.__indexes
+        self.__indexes = dict()
+
+        if self.compactor is not None:
+            self.compactor.wait()
+        for key, value in self._read(classes):
+            self.__load(key, value)
+        self.__indexes = indexes
+        self.__sync()
+        self.__reindex()
+        for c in classes:
+            for attr, kind in getattr(c, '__indexes__', {}).items():
+                self.add_index(c, attr, kind)
+        if self.compactor is not None:
+            self.compactor.maybe_compact()
+
+
+def _mutable(obj, attr=None):
+    """Tells whether `obj` holds a value of a `MUTABLE` type, in `attr` or
+    in any attribute if `attr` is None."""
+    attrs = obj.__dict__
+    if attr is not None:
+        return isinstance(attrs.get(attr), MUTABLE)
+    for value in attrs.values():
+        if isinstance(value, MUTABLE):
+            return True
+    return False
+
+
+def _id(obj):
+    """Sort key of the objects merged by `FileStorage.page`."""
+    return obj.id
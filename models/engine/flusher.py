@@ -0,0 +1,121 @@
+#!/usr/bin/python3
+"""Write-behind flushing of `FileStorage` saves"""
+import threading
+import time
+
+
+class Flusher():
+    """Coalesces bursts of saves into one flush from a background thread.
+
+    `request` only counts a save and wakes the worker thread, which waits
+    until `interval` seconds have passed since the first waiting save, or
+    until `max_pending` saves are waiting, then calls `flush` once for all
+    of them.  Changes are therefore on disk at most `interval` seconds
+    after they were saved.  Only one flush runs at a time, and `drain`
+    waits for the one in progress.  The saves of a flush that fails are
+    counted as waiting again, so the next flush retries them.
+
+    Attributes:
+        flush (callable): writes the storage to disk
+        interval (float): longest time, in seconds, a save waits
+        max_pending (int): number of waiting saves that triggers a flush
+            without waiting for `interval`
+        pending (int): number of saves waiting for a flush
+        flushing (bool): True while a flush is in progress
+        flushes (int): number of flushes done so far
+        error (Exception): last error raised by `flush` in the worker
+            thread, None if there was none
+
+    """
+
+    def __init__(self, flush, interval=1.0, max_pending=100):
+        """Constructor for the `Flusher` class.
+
+        Args:
+            flush (callable): writes the storage to disk
+            interval (float): longest time, in seconds, a save waits
+            max_pending (int): number of waiting saves that triggers a
+                flush
+
+        """
+        self.flush = flush
+        self.interval = interval
+        self.max_pending = max_pending
+        self.pending = 0
+        self.flushing = False
+        self.flushes = 0
+        self.error = None
+        self.__condition = threading.Condition()
+        self.__thread = None
+
+    def request(self):
+        """Counts a save, to be flushed by the worker thread."""
+        with self.__condition:
+            self.pending += 1
+            if self.__thread is None or self.__thread.is_alive() is False:
+                self.__thread = threading.Thread(target=self.__run,
+                                                 name='hbnb-flusher',
+                                                 daemon=True)
+                self.__thread.start()
+            if self.pending == 1 or self.pending >= self.max_pending:
+                self.__condition.notify()
+
+    def __run(self):
+        """Flushes the waiting saves, once per interval at most."""
+        while True:
+            with self.__condition:
+                while self.pending == 0:
+                    self.__condition.wait()
+                deadline = time.monotonic() + self.interval
+                while self.pending < self.max_pending:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.__condition.wait(remaining)
+                while self.flushing is True:
+                    self.__condition.wait()
+                if self.pending == 0:
+                    continue
+                pending = self.__start()
+            try:
+                self.__flush(pending)
+            except Exception as error:
+                self.error = error
+
+    def drain(self):
+        """Flushes the waiting saves now, in the calling thread, after the
+        flush in progress, if any.
+
+        Raises:
+            Exception: whatever `flush` raises; the saves stay waiting
+
+        """
+        with self.__condition:
+            while self.flushing is True:
+                self.__condition.wait()
+            if self.pending == 0:
+                return
+            pending = self.__start()
+        self.__flush(pending)
+
+    def __start(self):
+        """Takes the waiting saves for a flush; the condition is held."""
+        pending = self.pending
+        self.pending = 0
+        self.flushing = True
+        return pending
+
+    def __flush(self, pending):
+        """Calls `flush` for `pending` saves, counting them as waiting
+        again if it raises."""
+        try:
+            self.flush()
+            self.flushes += 1
+        except Exception:
+            with self.__condition:
+                self.pending += pending
+            raise
+        finally:
+            with self.__condition:
+                self.flushing = False
+                self.__condition.notify_all()
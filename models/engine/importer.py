@@ -0,0 +1,322 @@
+#!/usr/bin/python3
+"""Streams JSONL and CSV files of records into a storage"""
+import csv
+import json
+import time
+from os import path, remove
+
+from .. import timestamps
+from ..base_model import new_ids
+from .durability import Durability
+
+FORMATS = {'.jsonl': 'jsonl', '.ndjson': 'jsonl', '.csv': 'csv'}
+
+# Returned by `coerce` for a value that leaves the declared default.
+SKIP = object()
+
+
+def coerce(name, default, value):
+    """Returns `value` converted to the type of a declared field.
+
+    Text is converted, as every CSV value is text: numbers are parsed and
+    lists are read as JSON.  An empty text or a null leaves the default.
+
+    Args:
+        name (str): name of the field
+        default: value declared on the class
+        value: value read from the file
+
+    Returns:
+        the converted value, or SKIP to keep the default
+
+    Raises:
+        ValueError: if `value` cannot be converted
+
+    """
+    kind = type(default)
+    if type(value) is kind:
+        return value
+    if value is None or (value == '' and kind is not str):
+        return SKIP
+    try:
+        if kind is list and type(value) is str:
+            value = json.loads(value)
+            if type(value) is list:
+                return value
+        elif kind is int and type(value) is str:
+            return int(value)
+        elif kind is float and type(value) in (str, int):
+            return float(value)
+    except ValueError:
+        pass
+    raise ValueError("invalid value for {}: {!r}".format(name, value))
+
+
+class Importer():
+    """Imports the records of a JSONL or CSV file into a storage.
+
+    The file is read one record at a time and every record is checked
+    against its model class: the class must exist, attribute names must
+    be identifiers and declared fields are converted to their declared
+    type.  Records without an id get a new one and records without
+    timestamps are created now.  A record whose id is already stored
+    replaces the stored object.
+
+    The objects are added `batch_size` at a time in a transaction, so each
+    batch is saved once and a batch that fails to save leaves nothing
+    behind.  Once a batch is flushed to the file, the position reached in
+    the file is written to a checkpoint file, which a later `run` on the
+    same file resumes from; it is removed once the whole file is
+    imported.  Only one batch is held at a time, so memory does not grow
+    with the file.
+
+    Attributes:
+        storage (FileStorage): storage the objects are added to
+        batch_size (int): number of records saved at once
+        skip_invalid (bool): count and skip invalid records instead of
+            stopping at the first one
+        progress (callable): called with `report` after a batch, at most
+            once every `interval` seconds, and at the end
+        interval (float): seconds between two `progress` calls
+        report (dict): records imported and skipped, batches, line and
+            byte offset reached, seconds and records per second of the
+            current or last `run`
+
+    """
+
+    def __init__(self, storage, batch_size=1000, skip_invalid=False,
+                 progress=None, interval=1.0):
+        """Constructor for the `Importer` class.
+
+        Args:
+            storage (FileStorage): storage the objects are added to
+            batch_size (int): number of records saved at once
+            skip_invalid (bool): skip invalid records instead of stopping
+            progress (callable): called with `report` as the import runs
+            interval (float): seconds between two `progress` calls
+
+        Raises:
+            ValueError: if `batch_size` is not a positive number
+
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be a positive number")
+        self.storage = storage
+        self.batch_size = batch_size
+        self.skip_invalid = skip_invalid
+        self.progress = progress
+        self.interval = interval
+        self.report = None
+        self.__first = 0
+        self.__durability = Durability()
+
+    def run(self, file_path, cls=None, file_format=None, checkpoint=None):
+        """Imports a file, resuming from its checkpoint if there is one.
+
+        Args:
+            file_path (str): JSONL or CSV file to import
+            cls (type or str): class of the records without a '__class__'
+            file_format (str): 'jsonl' or 'csv', guessed from the file
+                extension if None
+            checkpoint (str): checkpoint filename, '<file_path>.checkpoint'
+                if None
+
+        Returns:
+            dict: the final `report`
+
+        Raises:
+            ValueError: if the format is unknown, the checkpoint does not
+                fit the file, or a record is invalid and `skip_invalid` is
+                False; the records before it are imported and checkpointed
+            OSError: if the file cannot be read or a batch cannot be saved
+            RuntimeError: if a transaction of the storage is in progress,
+                as its batches would only be saved with it
+
+        """
+        if self.storage.in_transaction():
+            raise RuntimeError("cannot import inside a transaction")
+        if file_format is None:
+            file_format = FORMATS.get(path.splitext(file_path)[1].lower())
+        if file_format not in ('jsonl', 'csv'):
+            raise ValueError("unknown file format: {}".format(file_path))
+        if checkpoint is None:
+            checkpoint = file_path + '.checkpoint'
+        if cls is not None and type(cls) is not str:
+            cls = cls.__name__
+        state = {'offset': 0, 'line': 0, 'records': 0, 'skipped': 0}
+        if path.isfile(checkpoint):
+            with open(checkpoint, encoding='utf-8') as file:
+                state.update(json.load(file))
+        if state['offset'] > path.getsize(file_path):
+            raise ValueError("checkpoint does not fit {}".format(file_path))
+
+        start = time.perf_counter()
+        self.report = dict(state, batches=0, seconds=0.0, rate=0.0,
+                           resumed=state['line'])
+        self.__first = state['records']
+        reported = start
+        batch = []
+        with open(file_path, 'rb') as file:
+            if file_format == 'jsonl':
+                rows = self.__jsonl(file, state['offset'], state['line'])
+            else:
+                rows = self.__csv(file, state['offset'], state['line'])
+            ids = new_ids(self.batch_size)
+            for line, offset, row in rows:
+                try:
+                    obj = self.__build(row, cls, ids)
+                except ValueError as e:
+                    if self.skip_invalid is False:
+                        self.__commit(batch, checkpoint, start)
+                        raise ValueError("line {}: {}".format(line, e))
+                    self.report['skipped'] += 1
+                    obj = None
+                if obj is not None:
+                    batch.append(obj)
+                self.report['line'] = line
+                self.report['offset'] = offset
+                if len(batch) >= self.batch_size:
+                    self.__commit(batch, checkpoint, start)
+                    batch = []
+                    ids = new_ids(self.batch_size)
+                    now = time.perf_counter()
+                    if self.progress is not None and \
+                            now - reported >= self.interval:
+                        reported = now
+                        self.progress(self.report)
+        self.__commit(batch, checkpoint, start)
+        if path.isfile(checkpoint):
+            remove(checkpoint)
+        if self.progress is not None:
+            self.progress(self.report)
+        return self.report
+
+    def __commit(self, batch, checkpoint, start):
+        """Saves a batch in one transaction and flushes it, then writes the
+        checkpoint."""
+        storage = self.storage
+        report = self.report
+        if len(batch) > 0:
+            with storage.transaction():
+                for obj in batch:
+                    storage.new(obj)
+                storage.save()
+            storage.flush()
+            report['records'] += len(batch)
+            report['batches'] += 1
+        with self.__durability.replace(checkpoint) as file:
+            json.dump({key: report[key] for key in
+                       ('offset', 'line', 'records', 'skipped')}, file)
+        report['seconds'] = time.perf_counter() - start
+        if report['seconds'] > 0:
+            report['rate'] = ((report['records'] - self.__first) /
+                              report['seconds'])
+
+    def __build(self, row, default, ids):
+        """Returns the object of a decoded record, None for a blank line.
+
+        Raises:
+            ValueError: if the record is invalid
+
+        """
+        if row is None:
+            return None
+        if isinstance(row, ValueError):
+            raise row
+        if type(row) is not dict:
+            raise ValueError("not an object")
+        name = row.get('__class__') or default
+        if name is None:
+            raise ValueError("class name missing")
+        cls = self.storage.model(name) if type(name) is str else None
+        if cls is None:
+            raise ValueError("class doesn't exist: {}".format(name))
+        obj_id = row.get('id')
+        if obj_id is None or obj_id == '':
+            obj_id = next(ids)
+        elif type(obj_id) is not str:
+            raise ValueError("invalid id: {!r}".format(obj_id))
+        attrs = {'id': obj_id}
+        for stamp in ('created_at', 'updated_at'):
+            value = row.get(stamp)
+            if value is None or value == '':
+                value = attrs.get('created_at')
+                attrs[stamp] = timestamps.now() if value is None else value
+            elif type(value) is str:
+                try:
+                    attrs[stamp] = timestamps.parse(value)
+                except (ValueError, TypeError, OverflowError):
+                    raise ValueError("invalid {}: {!r}".format(stamp, value))
+            else:
+                raise ValueError("invalid {}: {!r}".format(stamp, value))
+        fields = cls.__fields__
+        for key, value in row.items():
+            if key in ('__class__', 'id', 'created_at', 'updated_at'):
+                continue
+            if type(key) is not str or not key.isidentifier() or \
+                    key.startswith('__'):
+                raise ValueError("invalid attribute: {!r}".format(key))
+            if key in fields:
+                value = coerce(key, fields[key], value)
+                if value is SKIP:
+                    continue
+            attrs[key] = value
+        obj = cls.__new__(cls)
+        obj.__dict__.restore(attrs, None)
+        return obj
+
+    @staticmethod
+    def __jsonl(file, offset, line):
+        """Yields (line, offset after it, decoded record) from `offset`.
+
+        Blank lines yield None and undecodable ones a ValueError.
+        """
+        file.seek(offset)
+        for text in file:
+            offset += len(text)
+            line += 1
+            if text.isspace():
+                yield line, offset, None
+                continue
+            try:
+                record = json.loads(text)
+            except ValueError as e:
+                record = ValueError("invalid JSON: {}".format(e))
+            yield line, offset, record
+
+    @staticmethod
+    def __csv(file, offset, line):
+        """Yields (last line, offset after it, record) from `offset`.
+
+        The first row of the file names the columns.  A record may span
+        several lines when a quoted value holds line breaks.  Blank rows
+        yield None and rows of the wrong length a ValueError.
+        """
+        position = [0, 0]
+
+        def lines():
+            for text in file:
+                position[0] += len(text)
+                position[1] += 1
+                yield text.decode('utf-8')
+
+        reader = csv.reader(lines())
+        header = next(reader, None)
+        if header is None:
+            return
+        if len(header) > 0:
+            header[0] = header[0].lstrip('\ufeff')
+        if offset > position[0]:
+            file.seek(offset)
+            position[0] = offset
+            position[1] = line
+            reader = csv.reader(lines())
+        for row in reader:
+            if len(row) == 0:
+                yield position[1], position[0], None
+            elif len(row) != len(header):
+                yield position[1], position[0], ValueError(
+                    "expected {} values, found {}".format(len(header),
+                                                          len(row)))
+            else:
+                yield position[1], position[0], dict(zip(header, row))
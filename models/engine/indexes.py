@@ -0,0 +1,335 @@
+#!/usr/bin/python3
+"""Secondary indexes kept by `FileStorage` on model attributes"""
+import bisect
+
+
+class HashIndex():
+    """Maps every value of one attribute to the objects holding it.
+
+    Objects without the attribute are indexed under the class default, like
+    `getattr` returns it.  Unhashable values (lists) are not indexed.
+
+    Attributes:
+        attr (str): name of the indexed attribute
+        attrs (tuple): attributes whose writes update the index
+        buckets (dict): {value: {key: object}}
+        values (dict): {key: value} of every indexed object
+
+    """
+
+    def __init__(self, attr):
+        """Constructor for the `HashIndex` class.
+
+        Args:
+            attr (str): name of the indexed attribute
+
+        """
+        self.attr = attr
+        self.attrs = (attr,)
+        self.buckets = dict()
+        self.values = dict()
+
+    def add(self, key, obj):
+        """Indexes `obj` under `key`."""
+        value = getattr(obj, self.attr, None)
+        try:
+            self.buckets.setdefault(value, dict())[key] = obj
+        except TypeError:
+            return
+        self.values[key] = value
+
+    def add_many(self, items, template):
+        """Indexes objects that all hold the attribute value of `template`.
+
+        Args:
+            items (dict): {key: object} of the objects to index
+            template (BaseModel or child): object holding their value
+
+        """
+        value = getattr(template, self.attr, None)
+        try:
+            self.buckets.setdefault(value, dict()).update(items)
+        except TypeError:
+            return
+        self.values.update(dict.fromkeys(items, value))
+
+    def discard(self, key):
+        """Removes the object stored under `key` from the index."""
+        if key not in self.values:
+            return
+        value = self.values.pop(key)
+        bucket = self.buckets[value]
+        del bucket[key]
+        if len(bucket) == 0:
+            del self.buckets[value]
+
+    def update(self, key, obj):
+        """Moves `obj` to the bucket of its current value."""
+        self.discard(key)
+        self.add(key, obj)
+
+    def clear(self):
+        """Removes every object from the index."""
+        self.buckets = dict()
+        self.values = dict()
+
+    def rebuild(self, items):
+        """Indexes the (key, object) pairs of `items` from scratch."""
+        self.clear()
+        for key, obj in items:
+            self.add(key, obj)
+
+    def lookup(self, value):
+        """Returns the objects whose attribute equals `value`.
+
+        Raises:
+            TypeError: if `value` is unhashable
+
+        """
+        return list(self.buckets.get(value, {}).values())
+
+    def count(self, value):
+        """Returns the number of objects whose attribute equals `value`.
+
+        Raises:
+            TypeError: if `value` is unhashable
+
+        """
+        return len(self.buckets.get(value, ()))
+
+
+class OrderedIndex():
+    """Keeps the objects sorted by the value of one attribute.
+
+    The (value, key) pairs live in sorted lists searched with `bisect`,
+    which serve range queries, min/max and ordered iteration.  There is
+    one list per kind of value, numbers (bools, ints and floats) sharing
+    one, so a string stored in a numeric attribute only lands in the list
+    of strings.  Values that do not sort even among their own kind (dicts)
+    are kept aside in `others` and compared one by one by `range`.
+
+    Kinds come one after the other, the one holding the most values first;
+    `min` and `max` only look at that one.
+
+    Attributes:
+        attr (str): name of the indexed attribute
+        attrs (tuple): attributes whose writes update the index
+        lists (dict): {kind: sorted (value, key) pairs}
+        others (dict): {key: value} of the values kept aside
+        objects (dict): {key: object} of every indexed object
+        values (dict): {key: value} of every indexed object
+
+    """
+
+    def __init__(self, attr):
+        """Constructor for the `OrderedIndex` class.
+
+        Args:
+            attr (str): name of the indexed attribute
+
+        """
+        self.attr = attr
+        self.attrs = (attr,)
+        self.clear()
+
+    def add(self, key, obj):
+        """Indexes `obj` under `key`."""
+        value = getattr(obj, self.attr, None)
+        entries = self.lists.setdefault(_kind(value), [])
+        try:
+            bisect.insort(entries, (value, key))
+        except TypeError:
+            self.others[key] = value
+        self.objects[key] = obj
+        self.values[key] = value
+
+    def add_many(self, items, template):
+        """Indexes objects that all hold the attribute value of `template`,
+        with a single sort.
+
+        Args:
+            items (dict): {key: object} of the objects to index
+            template (BaseModel or child): object holding their value
+
+        """
+        value = getattr(template, self.attr, None)
+        kind = _kind(value)
+        entries = self.lists.get(kind, []) + [(value, key) for key in items]
+        try:
+            entries.sort()
+        except TypeError:
+            self.others.update(dict.fromkeys(items, value))
+        else:
+            self.lists[kind] = entries
+        self.objects.update(items)
+        self.values.update(dict.fromkeys(items, value))
+
+    def discard(self, key):
+        """Removes the object stored under `key` from the index."""
+        if key not in self.values:
+            return
+        value = self.values.pop(key)
+        del self.objects[key]
+        if key in self.others:
+            del self.others[key]
+            return
+        kind = _kind(value)
+        entries = self.lists[kind]
+        del entries[bisect.bisect_left(entries, (value, key))]
+        if len(entries) == 0:
+            del self.lists[kind]
+
+    def update(self, key, obj):
+        """Moves `obj` to the position of its current value."""
+        self.discard(key)
+        self.add(key, obj)
+
+    def clear(self):
+        """Removes every object from the index."""
+        self.lists = dict()
+        self.others = dict()
+        self.objects = dict()
+        self.values = dict()
+
+    def rebuild(self, items):
+        """Indexes the (key, object) pairs of `items` with one sort per
+        kind of value."""
+        self.clear()
+        for key, obj in items:
+            value = getattr(obj, self.attr, None)
+            self.objects[key] = obj
+            self.values[key] = value
+            self.lists.setdefault(_kind(value), []).append((value, key))
+        for kind, entries in list(self.lists.items()):
+            try:
+                entries.sort()
+            except TypeError:
+                del self.lists[kind]
+                self.others.update((key, value) for value, key in entries)
+
+    def range(self, lo=None, hi=None, lo_inclusive=True, hi_inclusive=True,
+              limit=None):
+        """Returns the objects whose value lies between `lo` and `hi`.
+
+        Values that do not compare with the bounds do not lie between
+        them.
+
+        Args:
+            lo: lower bound, None for no bound
+            hi: upper bound, None for no bound
+            lo_inclusive (bool): include objects equal to `lo`
+            hi_inclusive (bool): include objects equal to `hi`
+            limit (int): only return the first `limit` objects
+
+        Returns:
+            list of objects in ascending order of value within each kind,
+            followed by the matching values kept aside
+
+        """
+        found = []
+        for entries in self.__lists():
+            start, end = _span(entries, lo, hi, lo_inclusive, hi_inclusive)
+            if limit is not None:
+                end = min(end, start + limit - len(found))
+            found.extend(self.objects[key] for value, key
+                         in entries[start:end])
+        for key, value in self.others.items():
+            if limit is not None and len(found) >= limit:
+                break
+            if _between(value, lo, hi, lo_inclusive, hi_inclusive):
+                found.append(self.objects[key])
+        return found
+
+    def count(self, lo=None, hi=None, lo_inclusive=True, hi_inclusive=True):
+        """Returns the number of objects `range` would return, from two
+        binary searches per kind of value."""
+        count = 0
+        for entries in self.lists.values():
+            start, end = _span(entries, lo, hi, lo_inclusive, hi_inclusive)
+            count += max(0, end - start)
+        for value in self.others.values():
+            if _between(value, lo, hi, lo_inclusive, hi_inclusive):
+                count += 1
+        return count
+
+    def __lists(self):
+        """Returns the sorted lists, the one holding the most values
+        first."""
+        return sorted(self.lists.values(), key=len, reverse=True)
+
+    def min(self):
+        """Returns the object with the smallest value of the main kind,
+        None if no value sorts."""
+        if len(self.lists) == 0:
+            return None
+        return self.objects[self.__lists()[0][0][1]]
+
+    def max(self):
+        """Returns the object with the largest value of the main kind,
+        None if no value sorts."""
+        if len(self.lists) == 0:
+            return None
+        return self.objects[self.__lists()[0][-1][1]]
+
+    def __iter__(self):
+        """Yields the objects in ascending order of value within each
+        kind, then the ones kept aside."""
+        for entries in self.__lists():
+            for value, key in entries:
+                yield self.objects[key]
+        for key in self.others:
+            yield self.objects[key]
+
+    def __reversed__(self):
+        """Yields the objects in the reverse order of `__iter__`."""
+        for key in reversed(list(self.others)):
+            yield self.objects[key]
+        for entries in reversed(self.__lists()):
+            for value, key in reversed(entries):
+                yield self.objects[key]
+
+
+def _kind(value):
+    """Returns the kind of a value; values of one kind sort together."""
+    kind = type(value)
+    if kind is bool or kind is int:
+        return float
+    return kind
+
+
+def _span(entries, lo, hi, lo_inclusive, hi_inclusive):
+    """Returns the (start, end) positions of a range in sorted (value, key)
+    pairs, (0, 0) if a bound does not compare with the values."""
+    start = 0
+    end = len(entries)
+    try:
+        if lo is not None:
+            if lo_inclusive is True:
+                start = bisect.bisect_left(entries, lo, key=_value)
+            else:
+                start = bisect.bisect_right(entries, lo, key=_value)
+        if hi is not None:
+            if hi_inclusive is True:
+                end = bisect.bisect_right(entries, hi, key=_value)
+            else:
+                end = bisect.bisect_left(entries, hi, key=_value)
+    except TypeError:
+        return 0, 0
+    return start, end
+
+
+def _between(value, lo, hi, lo_inclusive, hi_inclusive):
+    """Returns True if `value` lies between the bounds of a range."""
+    try:
+        if lo is not None and (value < lo if lo_inclusive else value <= lo):
+            return False
+        if hi is not None and (value > hi if hi_inclusive else value >= hi):
+            return False
+    except TypeError:
+        return False
+    return True
+
+
+def _value(entry):
+    """Sort key of an `OrderedIndex` entry."""
+    return entry[0]
@@ -0,0 +1,168 @@
+#!/usr/bin/python3
+"""Append-only journal of `FileStorage` mutations"""
+import json
+from os import path, remove, rename
+
+from .durability import Durability
+
+
+class Journal():
+    """Appends one small JSON record per mutation next to the snapshot.
+
+    Every line of the journal file is a JSON object of the form
+    {"op": "put", "key": <key>, "value": <to_dict()>},
+    {"op": "patch", "key": <key>, "value": <changed attributes>} or
+    {"op": "del", "key": <key>}.  Replaying the lines in order on top of
+    the base snapshot reproduces the in-memory state.
+
+    While a compaction runs, the records it folds live in a sealed segment,
+    '<path>.sealed', and new records keep going to `path`.
+
+    The journal file stays open between appends; `durability` decides
+    whether each append is flushed or synced to disk.
+
+    Attributes:
+        path (str): filename of the journal
+        sealed_path (str): filename of the segment being compacted
+        records (int): number of records currently in the journal
+        size (int): size of the journal file in bytes
+        keys (dict): last operation recorded for every key of the journal
+        durability (Durability): how far appends are pushed to disk
+
+    """
+
+    def __init__(self, file_path, durability=None):
+        """Constructor for the `Journal` class.
+
+        Args:
+            file_path (str): filename of the journal
+            durability (Durability): how far appends are pushed to disk
+
+        """
+        self.path = file_path
+        self.sealed_path = file_path + '.sealed'
+        self.records = 0
+        self.size = 0
+        self.keys = dict()
+        self.durability = durability
+        if durability is None:
+            self.durability = Durability()
+        self.__file = None
+        if path.exists(self.path):
+            self.size = path.getsize(self.path)
+
+    def dead_ratio(self):
+        """Returns the share of records that a replay would throw away.
+
+        A record is dead when a later record for the same key supersedes it
+        or when it is a deletion; patches are counted like puts.
+
+        """
+        if self.records == 0:
+            return 0.0
+        live = 0
+        for op in self.keys.values():
+            if op != 'del':
+                live += 1
+        return 1 - live / self.records
+
+    def append(self, records):
+        """Writes `records` at the end of the journal.
+
+        Args:
+            records (list): (op, key, value) tuples, `value` being None for
+                deletions
+
+        """
+        lines = []
+        for op, key, value in records:
+            if op == 'del':
+                lines.append(json.dumps({'op': op, 'key': key}))
+            else:
+                lines.append(json.dumps({'op': op, 'key': key,
+                                         'value': value}))
+            self.keys[key] = op
+        if len(lines) == 0:
+            return
+        data = '\n'.join(lines) + '\n'
+        if self.__file is None:
+            self.__file = open(self.path, 'a', encoding='utf-8')
+        self.__file.write(data)
+        self.durability.commit(self.__file)
+        self.records += len(lines)
+        self.size += len(data.encode('utf-8'))
+
+    def replay(self):
+        """Yields the records of the sealed segment, then of the journal.
+
+        A torn last line (crash in the middle of an append) is ignored.
+
+        Yields:
+            (op, key, value) tuples
+
+        """
+        self.close()
+        self.records = 0
+        self.keys = dict()
+        for record in read_segment(self.sealed_path):
+            yield record
+        for record in read_segment(self.path):
+            self.records += 1
+            self.keys[record[1]] = record[0]
+            yield record
+
+    def seal(self):
+        """Moves the current records to the sealed segment.
+
+        Nothing is moved while an older sealed segment is still waiting to
+        be compacted.
+
+        Returns:
+            True if a sealed segment is waiting to be compacted
+
+        """
+        self.close()
+        if path.exists(self.sealed_path):
+            return True
+        if path.exists(self.path) is False:
+            return False
+        rename(self.path, self.sealed_path)
+        self.records = 0
+        self.size = 0
+        self.keys = dict()
+        return True
+
+    def clear(self):
+        """Removes the journal files once their records are in the snapshot.
+        """
+        self.close()
+        for file_path in (self.sealed_path, self.path):
+            if path.exists(file_path):
+                remove(file_path)
+        self.records = 0
+        self.size = 0
+        self.keys = dict()
+
+    def close(self):
+        """Closes the journal file, writing out what it buffers."""
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+
+def read_segment(file_path):
+    """Yields the (op, key, value) records of one journal file.
+
+    Args:
+        file_path (str): filename of the journal segment
+
+    """
+    if path.exists(file_path) is False:
+        return
+    with open(file_path, 'r', encoding='utf-8') as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            yield record['op'], record['key'], record.get('value')
@@ -0,0 +1,381 @@
+#!/usr/bin/python3
+"""Filter queries over the objects of a storage and their planner"""
+import ast
+import re
+
+from .columns import both, is_number
+
+# One token: a quoted string, an operator, a bracket or comma, or a word.
+TOKEN = re.compile(r'''\s*(?:
+    (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+    |(?P<op><=|>=|==|=|<|>)
+    |(?P<punct>[\[\],])
+    |(?P<word>[^\s\[\],"'<>=]+)
+)''', re.VERBOSE)
+
+NUMBER = re.compile(r'[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$')
+
+OPERATORS = ('=', '<', '<=', '>', '>=', 'in')
+
+
+class Predicate():
+    """A condition on one attribute of the objects of a class.
+
+    Objects without the attribute and values that do not compare with the
+    attribute (a string against a number) do not match.
+
+    Attributes:
+        attr (str): name of the attribute
+        op (str): '=', '<', '<=', '>', '>=' or 'in'
+        value: value compared with, a list for 'in'
+
+    """
+
+    def __init__(self, attr, op, value):
+        """Constructor for the `Predicate` class.
+
+        Args:
+            attr (str): name of the attribute
+            op (str): one of OPERATORS, '==' standing for '='
+            value: value compared with, a list for 'in'
+
+        Raises:
+            ValueError: if `op` is unknown
+
+        """
+        if op == '==':
+            op = '='
+        if op not in OPERATORS:
+            raise ValueError("unknown operator: {}".format(op))
+        self.attr = attr
+        self.op = op
+        self.value = value
+
+    def matches(self, obj):
+        """Returns True if `obj` satisfies the condition."""
+        try:
+            actual = getattr(obj, self.attr)
+        except AttributeError:
+            return False
+        op = self.op
+        value = self.value
+        try:
+            if op == '=':
+                return actual == value
+            if op == 'in':
+                return actual in value
+            if op == '<':
+                return actual < value
+            if op == '<=':
+                return actual <= value
+            if op == '>':
+                return actual > value
+            return actual >= value
+        except TypeError:
+            return False
+
+    def __repr__(self):
+        """Returns the condition as it is written in a query."""
+        return "{} {} {!r}".format(self.attr, self.op, self.value)
+
+
+class Plan():
+    """How the objects matching a query are found.
+
+    Attributes:
+        kind (str): 'hash' or 'ordered' for an index, 'columns' for a
+            filter of numeric columns, 'scan' for a scan of the class
+            partition
+        attr (str): indexed attribute, None for a scan
+        estimate (int): number of candidates read from the access path
+        predicates (list): conditions checked on every candidate
+
+    """
+
+    def __init__(self, kind, attr, estimate, fetch, predicates):
+        """Constructor for the `Plan` class.
+
+        Args:
+            kind (str): 'hash', 'ordered', 'columns' or 'scan'
+            attr (str): indexed attribute, None for a scan
+            estimate (int): number of candidates
+            fetch (callable): returns the candidates
+            predicates (list): conditions checked on every candidate
+
+        """
+        self.kind = kind
+        self.attr = attr
+        self.estimate = estimate
+        self.fetch = fetch
+        self.predicates = predicates
+
+    def run(self):
+        """Returns the candidates matching every predicate."""
+        predicates = self.predicates
+        return [obj for obj in self.fetch()
+                if all(p.matches(obj) for p in predicates)]
+
+    def __repr__(self):
+        """Returns the access path and its estimated size."""
+        if self.kind == 'scan':
+            return "scan ({} candidates)".format(self.estimate)
+        if self.kind == 'columns':
+            return "columns of {} ({} candidates)".format(
+                self.attr, self.estimate)
+        return "{} index on {} ({} candidates)".format(
+            self.kind, self.attr, self.estimate)
+
+
+def tokenize(text):
+    """Yields the (kind, text) tokens of a query.
+
+    Raises:
+        ValueError: if `text` holds an unterminated string
+
+    """
+    pos = 0
+    end = len(text.rstrip())
+    while pos < end:
+        match = TOKEN.match(text, pos)
+        if match is None or match.end() == pos:
+            raise ValueError("unexpected text: {}".format(text[pos:].strip()))
+        pos = match.end()
+        yield match.lastgroup, match.group(match.lastgroup)
+
+
+def literal(kind, text):
+    """Returns the value of a string or word token: quoted strings are
+    unquoted, numbers are parsed and other words are kept as text.
+
+    Raises:
+        ValueError: if a quoted string holds an invalid escape
+
+    """
+    if kind == 'string':
+        try:
+            return ast.literal_eval(text)
+        except SyntaxError:
+            raise ValueError("invalid string: {}".format(text))
+    if NUMBER.match(text) is None:
+        return text
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def parse(text):
+    """Returns the predicates of a query, all of which must hold.
+
+    A query is a list of conditions separated by commas or 'and', each
+    '<attribute> <op> <value>' with op one of =, ==, <, <=, >, >=, or
+    '<attribute> in [<value>, ...]'.  Values are quoted strings, numbers,
+    or words taken as text, e.g. 'city_id="0001", price_by_night>100'.
+
+    Raises:
+        ValueError: if the query is malformed
+
+    """
+    tokens = list(tokenize(text))
+    tokens.append((None, None))
+    predicates = []
+    pos = 0
+
+    def value():
+        """Consumes a value token and returns its value."""
+        nonlocal pos
+        kind, token = tokens[pos]
+        if kind not in ('string', 'word'):
+            raise ValueError("value expected")
+        pos += 1
+        return literal(kind, token)
+
+    while tokens[pos][0] is not None:
+        kind, attr = tokens[pos]
+        if kind != 'word' or not attr.isidentifier():
+            raise ValueError("attribute name expected")
+        kind, op = tokens[pos + 1]
+        pos += 2
+        if kind == 'op':
+            predicates.append(Predicate(attr, op, value()))
+        elif (kind, op) == ('word', 'in'):
+            if tokens[pos] != ('punct', '['):
+                raise ValueError("list expected after in")
+            pos += 1
+            values = []
+            while tokens[pos] != ('punct', ']'):
+                if len(values) > 0:
+                    if tokens[pos] != ('punct', ','):
+                        raise ValueError("',' or ']' expected")
+                    pos += 1
+                values.append(value())
+            pos += 1
+            predicates.append(Predicate(attr, 'in', values))
+        else:
+            raise ValueError("operator expected after {}".format(attr))
+        if tokens[pos] in (('punct', ','), ('word', 'and')):
+            pos += 1
+            if tokens[pos][0] is None:
+                raise ValueError("condition expected")
+        elif tokens[pos][0] is not None:
+            raise ValueError("',' or 'and' expected")
+    return predicates
+
+
+def plan(storage, cls, predicates):
+    """Returns the cheapest way to find the objects of `cls` matching
+    every predicate.
+
+    Every indexed predicate is an access path: '=' and 'in' through a hash
+    index, or an ordered one, and the range predicates on one attribute,
+    merged into a single interval, through an ordered index.  Each path is
+    sized with the index alone (bucket sizes, binary searches), the
+    smallest one wins, and a scan of the class is only kept when no index
+    applies or every index would return more objects than there are.
+    When the scan is still the best, the predicates comparing numbers with
+    attributes kept in columns are run on the columns, which gives the
+    exact matches of those predicates without reading any object.
+
+    Args:
+        storage (FileStorage): storage holding the objects
+        cls (type or str): class of the objects
+        predicates (list): `Predicate` conditions, all of which must hold
+
+    Returns:
+        Plan: the chosen plan
+
+    """
+    best = Plan('scan', None, storage.count(cls),
+                lambda: storage.all(cls).values(), predicates)
+    bounds = dict()
+    for p in predicates:
+        if p.op in ('=', 'in'):
+            values = p.value if p.op == 'in' else [p.value]
+            candidate = _equal(storage, cls, p.attr, values, predicates)
+        else:
+            bound = bounds.setdefault(p.attr, [None, True, None, True])
+            _narrow(bound, p)
+            continue
+        if candidate is not None and candidate.estimate < best.estimate:
+            best = candidate
+    for attr, (lo, lo_inclusive, hi, hi_inclusive) in bounds.items():
+        index = storage.index(cls, attr, 'ordered')
+        if index is None:
+            continue
+        try:
+            estimate = index.count(lo, hi, lo_inclusive, hi_inclusive)
+        except TypeError:
+            continue
+        if estimate < best.estimate:
+            best = Plan('ordered', attr, estimate,
+                        _ranges(index, [(lo, hi, lo_inclusive,
+                                         hi_inclusive)]), predicates)
+    if best.kind == 'scan':
+        candidate = _columns(storage, cls, predicates)
+        if candidate is not None and candidate.estimate < best.estimate:
+            best = candidate
+    return best
+
+
+def _equal(storage, cls, attr, values, predicates):
+    """Returns the index plan of an '=' or 'in' predicate, None if `attr`
+    has no usable index."""
+    try:
+        values = list(dict.fromkeys(values))
+    except TypeError:
+        return None
+    index = storage.index(cls, attr, 'hash')
+    if index is not None:
+        estimate = sum(index.count(value) for value in values)
+        return Plan('hash', attr, estimate, _lookups(index, values),
+                    predicates)
+    index = storage.index(cls, attr, 'ordered')
+    if index is not None:
+        spans = [(value, value, True, True) for value in values]
+        try:
+            estimate = sum(index.count(*span) for span in spans)
+        except TypeError:
+            return None
+        return Plan('ordered', attr, estimate, _ranges(index, spans),
+                    predicates)
+    return None
+
+
+def columns(storage, cls, predicates):
+    """Runs the predicates comparing numbers with attributes of `cls` kept
+    in the columns of one `ColumnStore`.
+
+    Args:
+        storage (FileStorage): storage holding the objects
+        cls (type or str): class of the objects
+        predicates (list): `Predicate` conditions, all of which must hold
+
+    Returns:
+        (ColumnStore, bytes, list): the store, the mask of its rows
+        matching those predicates and the predicates run, or (None, None,
+        []) if no predicate fits
+
+    """
+    store = None
+    mask = None
+    done = []
+    for p in predicates:
+        values = p.value if p.op == 'in' else [p.value]
+        if not all(is_number(value) for value in values):
+            continue
+        found = storage.columns(cls, p.attr)
+        if found is None or store not in (None, found):
+            continue
+        store = found
+        matches = store.mask(p.attr, p.op, p.value)
+        mask = matches if mask is None else both(mask, matches)
+        done.append(p)
+    return store, mask, done
+
+
+def _columns(storage, cls, predicates):
+    """Returns the plan filtering the numeric predicates on columns, None
+    if no predicate fits."""
+    store, mask, done = columns(storage, cls, predicates)
+    if store is None:
+        return None
+    objects = store.select(mask)
+    attrs = ', '.join(dict.fromkeys(p.attr for p in done))
+    return Plan('columns', attrs, len(objects), lambda: objects,
+                [p for p in predicates if p not in done])
+
+
+def _lookups(index, values):
+    """Returns a function fetching the objects of `values` from a hash
+    index."""
+    def fetch():
+        return [obj for value in values for obj in index.lookup(value)]
+    return fetch
+
+
+def _ranges(index, spans):
+    """Returns a function fetching the objects of (lo, hi, lo_inclusive,
+    hi_inclusive) spans from an ordered index."""
+    def fetch():
+        return [obj for span in spans for obj in index.range(*span)]
+    return fetch
+
+
+def _narrow(bound, predicate):
+    """Tightens a [lo, lo_inclusive, hi, hi_inclusive] interval with a
+    range predicate; incomparable bounds keep the first one."""
+    op = predicate.op
+    value = predicate.value
+    try:
+        if op in ('>', '>='):
+            inclusive = op == '>='
+            if (bound[0] is None or value > bound[0] or
+                    (value == bound[0] and not inclusive)):
+                bound[0], bound[1] = value, inclusive
+        else:
+            inclusive = op == '<='
+            if (bound[2] is None or value < bound[2] or
+                    (value == bound[2] and not inclusive)):
+                bound[2], bound[3] = value, inclusive
+    except TypeError:
+        pass
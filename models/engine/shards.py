@@ -0,0 +1,157 @@
+#!/usr/bin/python3
+"""Layout of the per-class shard files of `FileStorage`"""
+import json
+import zlib
+from collections import deque
+from itertools import islice
+from multiprocessing import get_all_start_methods, get_context
+from os import cpu_count, listdir, path
+
+from .stream import iter_json_object
+
+# Size in bytes from which a shard is decoded by a worker process, when
+# there are several such shards; below it, sending the records back costs
+# more than decoding the shard in the calling process.
+PARALLEL_BYTES = 4 * 1024 * 1024
+
+
+def shard_of(obj_id, shards):
+    """Returns the number of the shard holding the object `obj_id`.
+
+    The id is hashed with CRC-32, which unlike `hash` gives the same shard
+    in every process.
+
+    Args:
+        obj_id (str): id of the object
+        shards (int): number of shards per class
+
+    """
+    if shards == 1:
+        return 0
+    return zlib.crc32(obj_id.encode('utf-8')) % shards
+
+
+def shard_name(name, shard, shards, extension):
+    """Returns the filename of one shard of class `name`.
+
+    Args:
+        name (str): class name
+        shard (int): number of the shard
+        shards (int): number of shards per class
+        extension (str): '.json' or '.bin'
+
+    Returns:
+        '<name><extension>' when classes are not split,
+        '<name>.<shard><extension>' otherwise
+
+    """
+    if shards == 1:
+        return name + extension
+    return '{}.{}{}'.format(name, shard, extension)
+
+
+def list_shards(directory, extension):
+    """Returns the shard files of `directory`.
+
+    Args:
+        directory (str): directory of the shards
+        extension (str): '.json' or '.bin'
+
+    Returns:
+        sorted list of (class name, filename) pairs
+
+    """
+    if path.isdir(directory) is False:
+        return []
+    found = []
+    for filename in sorted(listdir(directory)):
+        if filename.endswith(extension) is True:
+            name = filename[:-len(extension)].partition('.')[0]
+            found.append((name, filename))
+    return found
+
+
+def read_shard(file_path):
+    """Yields the (key, record) pairs of one JSON shard file as they are
+    decoded."""
+    with open(file_path, 'r', encoding='utf-8') as file:
+        yield from iter_json_object(file)
+
+
+def decode_shard(file_path):
+    """Returns the (key, record) pairs of one JSON shard file, decoded at
+    once."""
+    with open(file_path, 'r', encoding='utf-8') as file:
+        return list(json.load(file).items())
+
+
+def _send_shard(file_path, connection):
+    """Sends the decoded pairs of a shard file to the parent process; run
+    by the worker processes of `read_shards`."""
+    connection.send(decode_shard(file_path))
+    connection.close()
+
+
+def _start_shard(context, file_path):
+    """Starts a worker process decoding `file_path`.
+
+    Returns:
+        (process, connection the pairs are received on)
+
+    """
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_send_shard, args=(file_path, sender),
+                              daemon=True)
+    process.start()
+    sender.close()
+    return process, receiver
+
+
+def read_shards(file_paths):
+    """Decodes JSON shard files, the large ones in parallel.
+
+    When at least two shards hold `PARALLEL_BYTES` or more, forked worker
+    processes read and decode them, one process per shard, while the
+    other shards are streamed here with `read_shard`.  The decoded records
+    come back pickled, which costs about half of decoding them, so smaller
+    shards are not worth it.  No more large shards are in flight than
+    there are processors, which bounds the memory they take.
+
+    The workers are forked rather than taken from a process pool: a pool
+    pickles the function it runs from a thread of its own, which imports
+    `models` to find it and waits forever when `reload` runs during the
+    import of `models`.  Without `fork`, every shard is streamed here.
+
+    Args:
+        file_paths (list): filenames of the shards
+
+    Yields:
+        (filename, iterable of (key, record) pairs), the shards left to
+        the workers last
+
+    """
+    large = [file_path for file_path in file_paths
+             if path.getsize(file_path) >= PARALLEL_BYTES]
+    if len(large) < 2 or 'fork' not in get_all_start_methods():
+        for file_path in file_paths:
+            yield file_path, read_shard(file_path)
+        return
+    context = get_context('fork')
+    todo = iter(large)
+    running = deque((file_path, _start_shard(context, file_path))
+                    for file_path in islice(todo, cpu_count() or 1))
+    for file_path in file_paths:
+        if file_path not in large:
+            yield file_path, read_shard(file_path)
+    while len(running) > 0:
+        file_path, (process, receiver) = running.popleft()
+        try:
+            records = receiver.recv()
+        except EOFError:
+            # The worker died; decoding here raises its error, if any.
+            records = decode_shard(file_path)
+        receiver.close()
+        process.join()
+        for file_path_ in islice(todo, 1):
+            running.append((file_path_, _start_shard(context, file_path_)))
+        yield file_path, records
@@ -0,0 +1,166 @@
+#!/usr/bin/python3
+"""Binary snapshot format of `FileStorage`, read through `mmap`"""
+import json
+import mmap
+import struct
+from os import path
+
+from .durability import Durability
+
+MAGIC = b'HBNB'
+VERSION = 1
+HEADER = struct.Struct('<4sHHQQ')
+ENTRY = struct.Struct('<QIQI')
+
+
+def encode(record):
+    """Returns the bytes stored for one record.
+
+    Args:
+        record (dict): attributes of the object, as `to_dict` returns them
+
+    """
+    return json.dumps(record, separators=(',', ':')).encode('utf-8')
+
+
+def write_snapshot(file_path, items, durability=None):
+    """Writes a snapshot to a temporary file and renames it over
+    `file_path`.
+
+    Args:
+        file_path (str): filename of the snapshot
+        items (iterable): (key, record bytes) pairs, in any order
+        durability (Durability): how far the write is pushed to disk
+
+    """
+    if durability is None:
+        durability = Durability()
+    items = sorted(items)
+    with durability.replace(file_path, binary=True) as file:
+        file.write(HEADER.pack(MAGIC, VERSION, 0, 0, 0))
+        offset = HEADER.size
+        entries = []
+        for key, data in items:
+            file.write(data)
+            entries.append((key.encode('utf-8'), offset, len(data)))
+            offset += len(data)
+        table_offset = offset
+        key_offset = table_offset + ENTRY.size * len(entries)
+        for key, offset, length in entries:
+            file.write(ENTRY.pack(key_offset, len(key), offset, length))
+            key_offset += len(key)
+        for key, offset, length in entries:
+            file.write(key)
+        file.seek(0)
+        file.write(HEADER.pack(MAGIC, VERSION, 0, len(entries),
+                               table_offset))
+
+
+class Snapshot():
+    """Read-only view of a snapshot file mapped in memory.
+
+    A snapshot file is laid out as:
+
+        header   magic b'HBNB', version, record count, offset of the table
+        records  the serialized attributes of every object, back to back
+        table    one fixed-size entry per object, sorted by key:
+                 (key offset, key length, record offset, record length)
+        keys     the UTF-8 keys the table entries point to
+
+    The table and the keys are contiguous, so opening a snapshot only
+    reads them, and a record is found by a binary search over the table
+    without decoding any other record.
+
+    Records are addressed by their position in the table.  The mapping
+    stays valid after the file is replaced by a newer snapshot, and is
+    released when the last reference to the `Snapshot` goes.
+
+    Attributes:
+        path (str): filename of the snapshot
+        count (int): number of records
+
+    """
+
+    def __init__(self, file_path):
+        """Constructor for the `Snapshot` class.
+
+        Args:
+            file_path (str): filename of the snapshot
+
+        Raises:
+            ValueError: if the file is not a snapshot
+
+        """
+        self.path = file_path
+        self.count = 0
+        self.__map = None
+        self.__table = 0
+        if path.getsize(file_path) == 0:
+            return
+        with open(file_path, 'rb') as file:
+            self.__map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.__map) < HEADER.size:
+            raise ValueError("not a snapshot: {}".format(file_path))
+        magic, version, _, count, table = HEADER.unpack_from(self.__map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a snapshot: {}".format(file_path))
+        self.count = count
+        self.__table = table
+
+    def __len__(self):
+        """Returns the number of records."""
+        return self.count
+
+    def __entry(self, position):
+        """Returns (key offset, key length, offset, length) of a record."""
+        return ENTRY.unpack_from(self.__map,
+                                 self.__table + ENTRY.size * position)
+
+    def key(self, position):
+        """Returns the key of the record at `position`."""
+        key_offset, key_length, _, _ = self.__entry(position)
+        return self.__map[key_offset:key_offset + key_length].decode('utf-8')
+
+    def keys(self):
+        """Yields (position, key) for every record, in key order."""
+        for position in range(self.count):
+            yield position, self.key(position)
+
+    def find(self, key):
+        """Returns the position of the record stored under `key`, or None.
+        """
+        target = key.encode('utf-8')
+        lo = 0
+        hi = self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            key_offset, key_length, _, _ = self.__entry(mid)
+            current = self.__map[key_offset:key_offset + key_length]
+            if current < target:
+                lo = mid + 1
+            elif current > target:
+                hi = mid
+            else:
+                return mid
+        return None
+
+    def raw(self, position):
+        """Returns the bytes of the record at `position`."""
+        _, _, offset, length = self.__entry(position)
+        return self.__map[offset:offset + length]
+
+    def value(self, position):
+        """Returns the decoded attributes of the record at `position`."""
+        return json.loads(self.raw(position))
+
+    def get(self, key):
+        """Returns the decoded attributes stored under `key`, or None."""
+        position = self.find(key)
+        if position is None:
+            return None
+        return self.value(position)
+
+    def items(self):
+        """Yields (key, attributes) for every record, in key order."""
+        for position, key in self.keys():
+            yield key, self.value(position)
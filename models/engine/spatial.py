@@ -0,0 +1,234 @@
+#!/usr/bin/python3
+"""Spatial index kept by `FileStorage` on latitude/longitude attributes"""
+from math import asin, cos, radians, sin, sqrt
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.195
+
+
+def distance(lat1, lon1, lat2, lon2):
+    """Returns the great-circle distance in km between two points."""
+    dlat = radians(lat2 - lat1)
+    dlon = radians(lon2 - lon1)
+    a = (sin(dlat / 2) ** 2 +
+         cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * asin(min(1.0, sqrt(a)))
+
+
+class GridIndex():
+    """Buckets objects in a grid of `cell` x `cell` degree cells.
+
+    A query only visits the cells that overlap its area, then filters the
+    candidates on their exact distance.  Objects whose coordinates are not
+    numbers are left out of the index.  Radius and nearest neighbour
+    queries reach across the antimeridian, for longitudes between -180
+    and 180; bounding boxes must not cross it.
+
+    Attributes:
+        attrs (tuple): names of the latitude and longitude attributes
+        cell (float): size of a grid cell in degrees
+        buckets (dict): {(row, column): {key: object}}
+        positions (dict): {key: (latitude, longitude)} of indexed objects
+        objects (dict): {key: object} of indexed objects
+
+    """
+
+    def __init__(self, attrs=('latitude', 'longitude'), cell=0.1):
+        """Constructor for the `GridIndex` class.
+
+        Args:
+            attrs (tuple): names of the latitude and longitude attributes
+            cell (float): size of a grid cell in degrees
+
+        """
+        self.attrs = tuple(attrs)
+        self.cell = cell
+        self.buckets = dict()
+        self.positions = dict()
+        self.objects = dict()
+
+    def __cell(self, lat, lon):
+        """Returns the (row, column) of the cell holding a point."""
+        return (int(lat // self.cell), int(lon // self.cell))
+
+    def add(self, key, obj):
+        """Indexes `obj` under `key`."""
+        try:
+            lat = float(getattr(obj, self.attrs[0]))
+            lon = float(getattr(obj, self.attrs[1]))
+        except (AttributeError, TypeError, ValueError):
+            return
+        self.buckets.setdefault(self.__cell(lat, lon), dict())[key] = obj
+        self.positions[key] = (lat, lon)
+        self.objects[key] = obj
+
+    def add_many(self, items, template):
+        """Indexes objects that all hold the coordinates of `template`.
+
+        Args:
+            items (dict): {key: object} of the objects to index
+            template (BaseModel or child): object holding their coordinates
+
+        """
+        try:
+            lat = float(getattr(template, self.attrs[0]))
+            lon = float(getattr(template, self.attrs[1]))
+        except (AttributeError, TypeError, ValueError):
+            return
+        self.buckets.setdefault(self.__cell(lat, lon), dict()).update(items)
+        self.positions.update(dict.fromkeys(items, (lat, lon)))
+        self.objects.update(items)
+
+    def discard(self, key):
+        """Removes the object stored under `key` from the index."""
+        if key not in self.positions:
+            return
+        cell = self.__cell(*self.positions.pop(key))
+        del self.objects[key]
+        bucket = self.buckets[cell]
+        del bucket[key]
+        if len(bucket) == 0:
+            del self.buckets[cell]
+
+    def update(self, key, obj):
+        """Moves `obj` to the cell of its current coordinates."""
+        self.discard(key)
+        self.add(key, obj)
+
+    def clear(self):
+        """Removes every object from the index."""
+        self.buckets = dict()
+        self.positions = dict()
+        self.objects = dict()
+
+    def rebuild(self, items):
+        """Indexes the (key, object) pairs of `items` from scratch."""
+        self.clear()
+        for key, obj in items:
+            self.add(key, obj)
+
+    def __cells(self, rows, columns):
+        """Yields the non-empty buckets of a rectangle of cells."""
+        if len(rows) * len(columns) > len(self.buckets):
+            for (row, column), bucket in self.buckets.items():
+                if row in rows and column in columns:
+                    yield bucket
+            return
+        for row in rows:
+            for column in columns:
+                bucket = self.buckets.get((row, column))
+                if bucket is not None:
+                    yield bucket
+
+    def within(self, min_lat, min_lon, max_lat, max_lon):
+        """Returns the objects inside a bounding box.
+
+        Args:
+            min_lat (float): southern edge
+            min_lon (float): western edge
+            max_lat (float): northern edge
+            max_lon (float): eastern edge
+
+        Returns:
+            list of objects
+
+        """
+        first = self.__cell(min_lat, min_lon)
+        last = self.__cell(max_lat, max_lon)
+        found = []
+        for bucket in self.__cells(range(first[0], last[0] + 1),
+                                   range(first[1], last[1] + 1)):
+            for key, obj in bucket.items():
+                lat, lon = self.positions[key]
+                if min_lat <= lat <= max_lat and min_lon <= lon <= max_lon:
+                    found.append(obj)
+        return found
+
+    def near(self, lat, lon, radius_km):
+        """Returns the objects within `radius_km` of a point, nearest first.
+
+        Args:
+            lat (float): latitude of the point
+            lon (float): longitude of the point
+            radius_km (float): search radius in km
+
+        Returns:
+            list of (distance in km, object) pairs
+
+        """
+        dlat = radius_km / KM_PER_DEGREE
+        width = cos(radians(min(89.9, abs(lat) + dlat)))
+        dlon = 180.0 if width * 180.0 <= dlat else dlat / width
+        if dlon >= 180.0:
+            spans = [(-180.0, 180.0)]
+        elif lon - dlon < -180.0:
+            spans = [(-180.0, lon + dlon), (lon - dlon + 360.0, 180.0)]
+        elif lon + dlon > 180.0:
+            spans = [(lon - dlon, 180.0), (-180.0, lon + dlon - 360.0)]
+        else:
+            spans = [(lon - dlon, lon + dlon)]
+        found = []
+        for west, east in spans:
+            first = self.__cell(lat - dlat, west)
+            last = self.__cell(lat + dlat, east)
+            for bucket in self.__cells(range(first[0], last[0] + 1),
+                                       range(first[1], last[1] + 1)):
+                for key, obj in bucket.items():
+                    d = distance(lat, lon, *self.positions[key])
+                    if d <= radius_km:
+                        found.append((d, key, obj))
+        found.sort(key=lambda entry: entry[:2])
+        return [(d, obj) for d, key, obj in found]
+
+    def k_nearest(self, lat, lon, k):
+        """Returns the `k` objects nearest to a point, nearest first.
+
+        Rings of cells around the point are searched until `k` objects are
+        found within the distance the rings fully cover.  The rings do not
+        wrap around the antimeridian, so they never cover more than the
+        distance to it; past it, every object is measured.
+
+        Args:
+            lat (float): latitude of the point
+            lon (float): longitude of the point
+            k (int): number of objects to return
+
+        Returns:
+            list of (distance in km, object) pairs
+
+        """
+        if k <= 0 or len(self.positions) == 0:
+            return []
+        center = self.__cell(lat, lon)
+        # Distance to the antimeridian, the closest objects beyond it can be.
+        beyond = EARTH_RADIUS_KM * asin(min(1.0, cos(radians(lat)) * sin(
+            radians(min(90.0, 180.0 - abs(lon))))))
+        found = []
+        ring = 0
+        visited = 0
+        while visited < len(self.buckets):
+            for row in range(center[0] - ring, center[0] + ring + 1):
+                for column in range(center[1] - ring, center[1] + ring + 1):
+                    if max(abs(row - center[0]),
+                           abs(column - center[1])) != ring:
+                        continue
+                    bucket = self.buckets.get((row, column))
+                    if bucket is None:
+                        continue
+                    visited += 1
+                    for key, obj in bucket.items():
+                        d = distance(lat, lon, *self.positions[key])
+                        found.append((d, key, obj))
+            width = cos(radians(min(89.9, abs(lat) + (ring + 1) *
+                                    self.cell)))
+            covered = min(ring * self.cell * KM_PER_DEGREE * width, beyond)
+            if sum(1 for entry in found if entry[0] <= covered) >= k:
+                break
+            ring += 1
+            if (2 * ring + 1) ** 2 > 4 * len(self.buckets) + 8:
+                found = [(distance(lat, lon, *position), key,
+                          self.objects[key])
+                         for key, position in self.positions.items()]
+                break
+        found.sort(key=lambda entry: entry[:2])
+        return [(d, obj) for d, key, obj in found[:k]]
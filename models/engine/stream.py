@@ -0,0 +1,99 @@
+#!/usr/bin/python3
+"""Incremental decoding of the top-level JSON object of a storage file"""
+import json
+
+WHITESPACE = ' \t\n\r'
+
+
+def iter_json_object(file, chunk_size=64 * 1024):
+    """Yields the (key, value) pairs of the JSON object held in `file`.
+
+    The file is read `chunk_size` characters at a time and each value is
+    decoded as soon as it is complete, so only the current chunk and the
+    value being decoded are held on top of what the caller keeps.
+
+    Args:
+        file (file object): text file opened for reading
+        chunk_size (int): number of characters read at a time
+
+    Yields:
+        (key, value) pairs in file order
+
+    Raises:
+        ValueError: if the file does not hold a JSON object
+
+    """
+    # Keys are shared across records, as `json.loads` shares them across
+    # the document, so that every object does not hold its own copies.
+    keys = dict()
+
+    def pairs(items):
+        """Builds a decoded object from its (key, value) pairs."""
+        return {keys.setdefault(key, key): value for key, value in items}
+
+    decoder = json.JSONDecoder(object_pairs_hook=pairs)
+    buf = ''
+    pos = 0
+    eof = False
+
+    def more():
+        """Appends the next chunk to the buffer, drops what was decoded."""
+        nonlocal buf, pos, eof
+        chunk = file.read(chunk_size)
+        if chunk == '':
+            eof = True
+        buf = buf[pos:] + chunk
+        pos = 0
+
+    def skip():
+        """Moves past whitespace and returns the next character."""
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in WHITESPACE:
+                pos += 1
+            if pos < len(buf):
+                return buf[pos]
+            if eof is True:
+                return ''
+            more()
+
+    def decode():
+        """Decodes the JSON value starting at the current position."""
+        nonlocal pos
+        while True:
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof is True:
+                    raise
+                more()
+                continue
+            if end == len(buf) and eof is False:
+                more()
+                continue
+            pos = end
+            return value
+
+    more()
+    if skip() == '':
+        return
+    if skip() != '{':
+        raise ValueError("expected a JSON object")
+    pos += 1
+    if skip() == '}':
+        return
+    while True:
+        skip()
+        key = decode()
+        if type(key) is not str or skip() != ':':
+            raise ValueError("expected a key")
+        pos += 1
+        skip()
+        value = decode()
+        yield key, value
+        separator = skip()
+        pos += 1
+        if separator == '}':
+            return
+        if separator != ',':
+            raise ValueError("expected ',' or '}'")
@@ -18,8 +18,16 @@ class Place(BaseModel):
         latitude (float)
         longitude (float)
         amenity_ids (strings list)
+        __indexes__ (dict): index kind of attributes indexed by `storage`
     """
 
+    __slots__ = ()
+
+    __indexes__ = {"city_id": "hash", "user_id": "hash",
+                   ("latitude", "longitude"): "spatial",
+                   ("number_rooms", "number_bathrooms", "max_guest",
+                    "price_by_night", "latitude", "longitude"): "columns"}
+
     city_id = ""
     user_id = ""
     name = ""
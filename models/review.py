@@ -10,8 +10,13 @@ class Review(BaseModel):
         place_id (str)
         user_id (str)
         text (str)
+        __indexes__ (dict): index kind of attributes indexed by `storage`
     """
 
+    __slots__ = ()
+
+    __indexes__ = {"place_id": "hash", "user_id": "hash"}
+
     place_id = ""
     user_id = ""
     text = ""
@@ -9,3 +9,5 @@ class State(BaseModel):
     Attributes:
         name (str)
     """
+
+    __slots__ = ()
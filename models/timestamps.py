@@ -0,0 +1,68 @@
+#!/usr/bin/python3
+"""Compact timestamps of model objects.
+
+Models keep `created_at` and `updated_at` as ints of microseconds since
+EPOCH, which are smaller than `datetime` objects, and only build a
+`datetime` when the attribute is read.  The functions below convert them
+from and to the ISO 8601 strings of the JSON file without `strptime`.
+"""
+from datetime import datetime, timedelta, timezone
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+SECOND = 1000000
+MINUTE = 60 * SECOND
+
+# Number of 'YYYY-MM-DDTHH:MM:' prefixes kept by `isoformat`.
+MAX_PREFIXES = 4096
+
+_prefixes = dict()
+
+
+def parse(text):
+    """Returns the timestamp of an ISO 8601 string; a time with an offset,
+    such as '...Z' or '...+02:00', is taken as its UTC time.
+
+    Raises:
+        ValueError: if `text` is not an ISO 8601 date and time
+
+    """
+    return from_datetime(datetime.fromisoformat(text))
+
+
+def from_datetime(value):
+    """Returns the timestamp of a `datetime`, taking an aware one as its
+    UTC time."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - EPOCH) // MICROSECOND
+
+
+def now():
+    """Returns the timestamp of the current local date and time."""
+    return (datetime.now() - EPOCH) // MICROSECOND
+
+
+def to_datetime(stamp):
+    """Returns a timestamp as a naive `datetime`."""
+    return EPOCH + MICROSECOND * stamp
+
+
+def isoformat(stamp):
+    """Returns a timestamp formatted like `datetime.isoformat`.
+
+    The text up to the minute is shared by the timestamps of a minute and
+    is kept, so only the seconds are formatted each time.
+
+    """
+    minute, micros = divmod(stamp, MINUTE)
+    prefix = _prefixes.get(minute)
+    if prefix is None:
+        if len(_prefixes) >= MAX_PREFIXES:
+            _prefixes.clear()
+        prefix = to_datetime(minute * MINUTE).isoformat()[:17]
+        _prefixes[minute] = prefix
+    if micros % SECOND == 0:
+        return '%s%02d' % (prefix, micros // SECOND)
+    text = str(micros + 100 * SECOND)
+    return prefix + text[1:3] + '.' + text[3:]
@@ -14,6 +14,8 @@ class User(BaseModel):
 
     """
 
+    __slots__ = ()
+
     email = ""
     password = ""
     first_name = ""
@@ -10,13 +10,19 @@ Unittest classes:
     TestHBNBCommand_all
     TestHBNBCommand_destroy
     TestHBNBCommand_update
+    TestHBNBCommand_parse
 """
+import json
 import os
+import shlex
 import sys
+import tempfile
 import unittest
 from models import storage
 from models.engine.file_storage import FileStorage
-from console import HBNBCommand
+from models.place import Place
+from models.user import User
+from console import Command, HBNBCommand, parse
 from io import StringIO
 from unittest.mock import patch
 
@@ -99,7 +105,10 @@ class TestHBNBCommand_help(unittest.TestCase):
     def test_help(self):
         h = ("Documented commands (type help <topic>):\n"
              "========================================\n"
-             "EOF  all  count  create  destroy  help  quit  show  update")
+             "EOF  begin   compute  create       destroy  help    near  "
+             "rollback  update\n"
+             "all  commit  count    create_many  export   import  quit  "
+             "show      where")
         with patch("sys.stdout", new=StringIO()) as output:
             self.assertFalse(HBNBCommand().onecmd("help"))
             self.assertEqual(h, output.getvalue().strip())
@@ -813,6 +822,55 @@ class TestHBNBCommand_all(unittest.TestCase):
             self.assertIn("Review", output.getvalue().strip())
             self.assertNotIn("BaseModel", output.getvalue().strip())
 
+    @patch.object(storage, "_FileStorage__objects", {})
+    def test_all_pages(self):
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd("create_many Place 5"))
+            self.assertFalse(HBNBCommand().onecmd("create User"))
+        ids = sorted(storage.all("Place"))
+        pages = []
+        after = ""
+        for command in ("all Place limit=2", "Place.all(limit=2, after={})",
+                        "all Place after={} limit=2"):
+            with patch("sys.stdout", new=StringIO()) as output:
+                self.assertFalse(HBNBCommand().onecmd(command.format(after)))
+                page = eval(output.getvalue())
+            pages += page
+            after = page[-1].split()[1][1:-1]
+        self.assertEqual([text.split()[1][1:-1] for text in pages],
+                         [key.split(".")[1] for key in ids])
+        after = pages[0].split()[1][1:-1]
+        rest = sorted(obj.id for obj in storage.all().values()
+                      if obj.id > after)
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd("all after=" + after))
+            self.assertEqual([text.split()[1][1:-1]
+                              for text in eval(output.getvalue())], rest)
+
+    @patch.object(storage, "_FileStorage__objects", {})
+    def test_all_attrs(self):
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd(
+                'create_many Place 1 name="Loft"'))
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd(
+                "all Place attrs=name,max_guest,pool"))
+            place = list(storage.all("Place").values())[0]
+            self.assertEqual(output.getvalue(), str([
+                "[Place] ({}) {{'name': 'Loft', 'max_guest': 0}}".format(
+                    place.id)]) + "\n")
+
+    def test_all_invalid_options(self):
+        errors = {
+            "all Place limit=x": "** invalid limit **",
+            "all Place sort=id": "** invalid argument: sort=id **",
+            "all Place after=": "** invalid argument: after= **",
+        }
+        for command, error in errors.items():
+            with patch("sys.stdout", new=StringIO()) as output:
+                self.assertFalse(HBNBCommand().onecmd(command))
+                self.assertEqual(error, output.getvalue().strip())
+
     def test_all_single_object_dot_notation(self):
         with patch("sys.stdout", new=StringIO()) as output:
             self.assertFalse(HBNBCommand().onecmd("create BaseModel"))
@@ -1566,5 +1624,410 @@ class TestHBNBCommand_count(unittest.TestCase):
             self.assertEqual("1", output.getvalue().strip())
 
 
+class TestHBNBCommand_transaction(unittest.TestCase):
+    """Unittests for testing begin, commit and rollback of the HBNB
+    command interpreter."""
+
+    def setUp(self):
+        self.objects = storage._FileStorage__objects
+        storage._FileStorage__objects = {}
+
+    def tearDown(self):
+        storage._FileStorage__objects = self.objects
+
+    def test_no_transaction(self):
+        for command in ("commit", "rollback"):
+            with patch("sys.stdout", new=StringIO()) as output:
+                self.assertFalse(HBNBCommand().onecmd(command))
+                self.assertEqual("** no transaction in progress **",
+                                 output.getvalue().strip())
+
+    def test_commit_saves_once(self):
+        with patch("sys.stdout", new=StringIO()) as output:
+            HBNBCommand().onecmd("create User")
+            user_id = output.getvalue().strip()
+        with patch.object(FileStorage, "_write") as write:
+            HBNBCommand().onecmd("begin")
+            for i in range(5):
+                HBNBCommand().onecmd("update User {} n{} {}".format(
+                    user_id, i, i))
+            HBNBCommand().onecmd("create Place")
+            self.assertEqual(write.call_count, 0)
+            HBNBCommand().onecmd("commit")
+            self.assertEqual(write.call_count, 1)
+        self.assertEqual(storage.get("User", user_id).n4, "4")
+
+    def test_rollback(self):
+        with patch("sys.stdout", new=StringIO()) as output:
+            HBNBCommand().onecmd("create User")
+            user_id = output.getvalue().strip()
+            HBNBCommand().onecmd("create City")
+            city_id = output.getvalue().strip().split()[-1]
+        HBNBCommand().onecmd("begin")
+        HBNBCommand().onecmd('update User {} first_name "Betty"'.format(
+            user_id))
+        HBNBCommand().onecmd("destroy City {}".format(city_id))
+        with patch("sys.stdout", new=StringIO()) as output:
+            HBNBCommand().onecmd("create Place")
+            place_id = output.getvalue().strip()
+        HBNBCommand().onecmd("rollback")
+        self.assertNotIn("first_name", storage.get("User", user_id).__dict__)
+        self.assertIsNotNone(storage.get("City", city_id))
+        self.assertIsNone(storage.get("Place", place_id))
+
+
+class TestHBNBCommand_create_many(unittest.TestCase):
+    """Unittests for testing create_many from the HBNB command
+    interpreter."""
+
+    def setUp(self):
+        self.objects = storage._FileStorage__objects
+        storage._FileStorage__objects = {}
+
+    def tearDown(self):
+        storage._FileStorage__objects = self.objects
+
+    def test_errors(self):
+        errors = {
+            "create_many": "** class name missing **",
+            "create_many MyModel 2": "** class doesn't exist **",
+            "create_many Place": "** count missing **",
+            "create_many Place two": "** invalid count **",
+            "create_many Place 2 name": "** invalid attribute: name **",
+            "create_many Place 2 id=1": "** invalid attribute: id=1 **",
+            "create_many Place 2 max_guest=x":
+                "** invalid value: max_guest=x **",
+        }
+        for command, error in errors.items():
+            with patch("sys.stdout", new=StringIO()) as output:
+                self.assertFalse(HBNBCommand().onecmd(command))
+                self.assertEqual(error, output.getvalue().strip())
+        self.assertEqual(storage.count("Place"), 0)
+
+    def test_create_many(self):
+        command = 'create_many Place 3 name="Big house" max_guest=4 pool=1'
+        with patch.object(FileStorage, "_write") as write:
+            with patch("sys.stdout", new=StringIO()) as output:
+                self.assertFalse(HBNBCommand().onecmd(command))
+                self.assertEqual("3", output.getvalue().strip())
+            self.assertEqual(write.call_count, 1)
+        places = list(storage.all("Place").values())
+        self.assertEqual(len(places), 3)
+        self.assertEqual(len(set(place.id for place in places)), 3)
+        for place in places:
+            self.assertEqual(place.name, "Big house")
+            self.assertEqual(place.max_guest, 4)
+            self.assertEqual(place.pool, "1")
+
+
+class TestHBNBCommand_import(unittest.TestCase):
+    """Unittests for testing import from the HBNB command interpreter."""
+
+    def setUp(self):
+        self.objects = storage._FileStorage__objects
+        storage._FileStorage__objects = {}
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.tmpdir.name, "places.csv")
+        with open(self.file_path, "w") as f:
+            f.write("id,name,max_guest\np1,Loft,4\np2,Barn,x\n")
+
+    def tearDown(self):
+        storage._FileStorage__objects = self.objects
+        self.tmpdir.cleanup()
+
+    def test_import_errors(self):
+        errors = {
+            "import": "** file name missing **",
+            "import {} MyModel": "** class doesn't exist **",
+            "import {}.tmp": "** file doesn't exist **",
+            "import {}": "** line 2: class name missing **",
+            "import {} Place": "** line 3: invalid value for max_guest: "
+                               "'x' **",
+        }
+        for command, error in errors.items():
+            with patch("sys.stdout", new=StringIO()) as output:
+                with patch.object(FileStorage, "_write"):
+                    command = command.format(self.file_path)
+                    self.assertFalse(HBNBCommand().onecmd(command))
+                self.assertEqual(error, output.getvalue().strip())
+
+    def test_import(self):
+        with open(self.file_path, "w") as f:
+            f.write("id,name,max_guest\np1,Loft,4\np2,Barn,\n")
+        command = "import {} Place".format(self.file_path)
+        with patch.object(FileStorage, "_write"):
+            with patch("sys.stdout", new=StringIO()) as output:
+                self.assertFalse(HBNBCommand().onecmd(command))
+                self.assertTrue(output.getvalue().startswith(
+                    "2 imported, 0 skipped, "))
+        self.assertEqual(storage.get("Place", "p1").max_guest, 4)
+        self.assertEqual(storage.get("Place", "p2").name, "Barn")
+
+    def test_import_in_transaction(self):
+        command = "import {} Place".format(self.file_path)
+        with patch("sys.stdout", new=StringIO()) as output:
+            HBNBCommand().onecmd("begin")
+            try:
+                self.assertFalse(HBNBCommand().onecmd(command))
+            finally:
+                HBNBCommand().onecmd("rollback")
+            self.assertEqual("** cannot import inside a transaction **",
+                             output.getvalue().strip())
+        self.assertIsNone(storage.get("Place", "p1"))
+
+
+class TestHBNBCommand_export(unittest.TestCase):
+    """Unittests for testing export from the HBNB command interpreter."""
+
+    def setUp(self):
+        self.objects = storage._FileStorage__objects
+        storage._FileStorage__objects = {}
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        storage._FileStorage__objects = self.objects
+        self.tmpdir.cleanup()
+
+    def test_export_errors(self):
+        errors = {
+            "export MyModel": "** class doesn't exist **",
+            "export Place name": "** invalid argument: name **",
+            "export Place to=x": "** invalid argument: to=x **",
+            "export attrs=": "** invalid argument: attrs= **",
+        }
+        for command, error in errors.items():
+            with patch("sys.stdout", new=StringIO()) as output:
+                self.assertFalse(HBNBCommand().onecmd(command))
+                self.assertEqual(error, output.getvalue().strip())
+
+    def test_export(self):
+        place = Place()
+        place.name = "Loft"
+        user = User()
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd("export"))
+            lines = output.getvalue().splitlines()
+        self.assertCountEqual([json.loads(line) for line in lines],
+                              [place.to_dict(), user.to_dict()])
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd(
+                "export Place attrs=id,name,max_guest"))
+            self.assertEqual(json.loads(output.getvalue()),
+                             {"id": place.id, "name": "Loft", "max_guest": 0})
+        file_path = os.path.join(self.tmpdir.name, "users.jsonl")
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd(
+                "export User file={}".format(file_path)))
+            self.assertEqual("1", output.getvalue().strip())
+        with open(file_path) as f:
+            self.assertEqual(json.loads(f.read()), user.to_dict())
+
+
+class TestHBNBCommand_where(unittest.TestCase):
+    """Unittests for testing where from the HBNB command interpreter."""
+
+    def setUp(self):
+        self.objects = storage._FileStorage__objects
+        storage._FileStorage__objects = {}
+
+    def tearDown(self):
+        storage._FileStorage__objects = self.objects
+
+    def test_where_errors(self):
+        errors = {
+            "where": "** class name missing **",
+            "where MyModel name=x": "** class doesn't exist **",
+            "where Place name": "** invalid query: operator expected "
+                                "after name **",
+            "Place.where(max_guest in 2)": "** invalid query: list "
+                                           "expected after in **",
+        }
+        for command, error in errors.items():
+            with patch("sys.stdout", new=StringIO()) as output:
+                self.assertFalse(HBNBCommand().onecmd(command))
+                self.assertEqual(error, output.getvalue().strip())
+
+    def test_where(self):
+        with patch("sys.stdout", new=StringIO()):
+            HBNBCommand().onecmd("create_many Place 3 city_id=c1 max_guest=2")
+            HBNBCommand().onecmd("create_many Place 2 city_id=c2 max_guest=6")
+        for command, count in (("where Place city_id=c1", 3),
+                               ('Place.where(city_id="c2", max_guest>4)', 2),
+                               ("where Place max_guest in [2, 6]", 5),
+                               ("where Place max_guest<2", 0),
+                               ("where User city_id=c1", 0)):
+            with patch("sys.stdout", new=StringIO()) as output:
+                self.assertFalse(HBNBCommand().onecmd(command))
+                self.assertEqual(len(eval(output.getvalue())), count)
+
+
+class TestHBNBCommand_compute(unittest.TestCase):
+    """Unittests for testing compute from the HBNB command interpreter."""
+
+    def setUp(self):
+        self.objects = storage._FileStorage__objects
+        storage._FileStorage__objects = {}
+
+    def tearDown(self):
+        storage._FileStorage__objects = self.objects
+
+    def test_compute_errors(self):
+        errors = {
+            "compute": "** class name missing **",
+            "compute MyModel count": "** class doesn't exist **",
+            "compute Place": "** aggregate missing **",
+            "compute Place median(max_guest)":
+                "** invalid computation: unknown function: median **",
+            "compute Place sum()":
+                "** invalid computation: sum needs an attribute **",
+            "compute Place count where max_guest":
+                "** invalid computation: operator expected after "
+                "max_guest **",
+        }
+        for command, error in errors.items():
+            with patch("sys.stdout", new=StringIO()) as output:
+                self.assertFalse(HBNBCommand().onecmd(command))
+                self.assertEqual(error, output.getvalue().strip())
+
+    def test_compute(self):
+        with patch("sys.stdout", new=StringIO()):
+            HBNBCommand().onecmd("create_many Place 3 city_id=c1 "
+                                 "price_by_night=100")
+            HBNBCommand().onecmd("create_many Place 1 city_id=c2 "
+                                 "price_by_night=300")
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd(
+                "compute Place count, avg(price_by_night) by city_id"))
+            self.assertEqual(output.getvalue(),
+                             "{'city_id': 'c1', 'count': 3, "
+                             "'avg(price_by_night)': 100.0}\n"
+                             "{'city_id': 'c2', 'count': 1, "
+                             "'avg(price_by_night)': 300.0}\n")
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd(
+                "compute Place max(price_by_night) where city_id=c1"))
+            self.assertEqual(output.getvalue(),
+                             "{'max(price_by_night)': 100}\n")
+
+
+class TestHBNBCommand_near(unittest.TestCase):
+    """Unittests for testing near method of HBNB comand interpreter."""
+
+    def setUp(self):
+        self.objects = storage._FileStorage__objects
+        storage._FileStorage__objects = {}
+
+    def tearDown(self):
+        storage._FileStorage__objects = self.objects
+
+    def test_near_errors(self):
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd("near"))
+            self.assertEqual("** class name missing **",
+                             output.getvalue().strip())
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd("near MyModel 1 2 3"))
+            self.assertEqual("** class doesn't exist **",
+                             output.getvalue().strip())
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd("Place.near(1, 2)"))
+            self.assertEqual("** coordinates missing **",
+                             output.getvalue().strip())
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd("near Place 1 x 3"))
+            self.assertEqual("** invalid coordinates **",
+                             output.getvalue().strip())
+
+    def test_near_places(self):
+        with patch("sys.stdout", new=StringIO()) as output:
+            HBNBCommand().onecmd("create Place")
+            near_id = output.getvalue().strip()
+        with patch("sys.stdout", new=StringIO()) as output:
+            HBNBCommand().onecmd("create Place")
+            far_id = output.getvalue().strip()
+        storage.get("Place", near_id).latitude = 10.01
+        storage.get("Place", far_id).latitude = 10.5
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd("near Place 10 0 5"))
+            self.assertIn(near_id, output.getvalue())
+            self.assertNotIn(far_id, output.getvalue())
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd("Place.near(10, 0, 100, 1)"))
+            self.assertIn(near_id, output.getvalue())
+            self.assertNotIn(far_id, output.getvalue())
+
+
+class TestHBNBCommand_parse(unittest.TestCase):
+    """Unittests for testing the command parser of the HBNB interpreter."""
+
+    def setUp(self):
+        self.objects = storage._FileStorage__objects
+        storage._FileStorage__objects = {}
+
+    def tearDown(self):
+        storage._FileStorage__objects = self.objects
+
+    def test_parse_arguments(self):
+        self.assertEqual([], parse("  "))
+        self.assertEqual(["Place", "id", "name", "My house"],
+                         parse('Place id name "My house"'))
+        self.assertEqual(["Place", "a b", "c d", 'e"f', "g\\h"],
+                         parse("Place a\\ b 'c d' \"e\\\"f\" 'g\\h'"))
+        self.assertEqual(["Place", "id", "max_guest", "98"],
+                         parse("Place id, max_guest, 98"))
+        self.assertEqual(["Place", "attrs=id,name"],
+                         parse("Place attrs=id,name"))
+        self.assertEqual(["Place", "n=a{b"], parse("Place n=a{b"))
+
+    def test_parse_like_shlex(self):
+        for arg in ('update Place id name "a\\$b"', '"a\\`b" "c\\\nd"',
+                    '"a\\\\b" "c\\"d" \'e\\f\' g\\$h i\\\\j',
+                    'x"y z"\'w\' "\\q"'):
+            self.assertEqual(shlex.split(arg), parse(arg))
+
+    def test_parse_groups(self):
+        self.assertEqual(["Place", "id", "{'max_guest': 98}"],
+                         parse("Place id{'max_guest': 98}) extra"))
+        self.assertEqual(["Place", "10", "amenity_ids=", "[1,2]"],
+                         parse("Place 10 amenity_ids=[1,2]"))
+
+    def test_parse_errors(self):
+        for arg in ('Place "id', "Place 'id", "Place id\\"):
+            with self.assertRaises(ValueError):
+                parse(arg)
+
+    def test_command(self):
+        command = Command.parse("  update Place id name 1.5 ")
+        self.assertEqual(("update", "Place id name 1.5", False),
+                         (command.name, command.text, command.call))
+        command = Command.parse('Place.update(id, {"a": "(b)"})')
+        self.assertEqual(("update", 'Place id, {"a": "(b)"}', True),
+                         (command.name, command.text, command.call))
+        command = Command.parse("? all")
+        self.assertEqual(("help", "all"), (command.name, command.text))
+        self.assertEqual("", Command.parse("!ls").name)
+
+    def test_unknown_call(self):
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd("Place.create()"))
+            self.assertEqual("*** Unknown syntax: Place.create()",
+                             output.getvalue().strip())
+
+    def test_update_literal_dict(self):
+        with patch("sys.stdout", new=StringIO()) as output:
+            HBNBCommand().onecmd("create Place")
+            place_id = output.getvalue().strip()
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd(
+                "Place.update({}, {{'name': 'a) b', 'max_guest': '3'}})"
+                .format(place_id)))
+            self.assertFalse(HBNBCommand().onecmd(
+                "update Place {} __import__('os')".format(place_id)))
+            self.assertEqual("** value missing **",
+                             output.getvalue().strip())
+        place = storage.get("Place", place_id)
+        self.assertEqual(("a) b", 3), (place.name, place.max_guest))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -298,3 +298,83 @@ class TestBaseModel(unittest.TestCase):
         self.assertIn('updated_at', bm1_dict)
         self.assertEqual(bm1.updated_at.isoformat(),
                          bm1_dict['updated_at'])
+
+    def test_compact_layout(self):
+        """Attributes live in a shared shape and an overflow dict, in the
+        order they were set.
+        """
+        from models.place import Place
+        p1 = Place()
+        p2 = Place()
+        self.assertFalse(hasattr(p1, '__weakref__'))
+        for place in (p1, p2):
+            place.name = 'Loft'
+            place.number_rooms = 3
+        self.assertIs(p1._shape, p2._shape)
+        self.assertIsNone(p1._extra)
+
+        # Attributes not declared on the class overflow, and so does
+        # everything set after them, to keep the order.
+        p1.color = 'blue'
+        p1.max_guest = 4
+        self.assertEqual(p1._extra, {'color': 'blue', 'max_guest': 4})
+        self.assertEqual(list(p1.__dict__),
+                         ['id', 'created_at', 'updated_at', 'name',
+                          'number_rooms', 'color', 'max_guest'])
+        self.assertEqual(str(p1.__dict__), str(dict(p1.__dict__)))
+        self.assertEqual(p1.max_guest, 4)
+        self.assertEqual(p2.max_guest, 0)
+        self.assertEqual(Place.max_guest, 0)
+
+        del p1.name
+        del p1.color
+        self.assertNotIn('name', p1.__dict__)
+        self.assertEqual(p1.name, '')
+        with self.assertRaises(AttributeError):
+            p1.color
+        p3 = Place(**p1.to_dict())
+        self.assertEqual(p3.to_dict(), p1.to_dict())
+        self.assertEqual(p3.__dict__, p1.__dict__)
+
+    def test_dict_layout(self):
+        """Subclasses without `__slots__` keep their attributes in an
+        instance dict.
+        """
+        from models.place import Place
+        Loft = type('Loft', (Place,), {'floors': 2})
+        loft = Loft()
+        loft.name = 'Loft'
+        loft.color = 'blue'
+        self.assertIs(type(loft.__dict__), dict)
+        self.assertEqual(list(loft.__dict__),
+                         ['id', 'created_at', 'updated_at', 'name', 'color'])
+        self.assertEqual((loft.floors, loft.max_guest), (2, 0))
+        self.assertIsInstance(loft.created_at, datetime.datetime)
+        self.assertIs(storage.all()['Loft.' + loft.id], loft)
+        del loft.color
+        self.assertNotIn('color', loft.__dict__)
+        copy = Loft(**loft.to_dict())
+        self.assertEqual(copy.to_dict(), loft.to_dict())
+        storage.delete(loft)
+
+    def test_copy_pickle(self):
+        """Copies and pickles hold the same attributes, without being
+        registered.
+        """
+        import copy
+        import pickle
+        from models.place import Place
+        p1 = Place()
+        p1.name = 'Loft'
+        p1.amenity_ids = ['wifi']
+        p1.color = 'blue'
+        count = storage.count()
+        for p2 in (copy.copy(p1), copy.deepcopy(p1),
+                   pickle.loads(pickle.dumps(p1))):
+            self.assertIs(type(p2), Place)
+            self.assertEqual(p2.to_dict(), p1.to_dict())
+            self.assertEqual(str(p2), str(p1))
+        self.assertIs(copy.copy(p1).amenity_ids, p1.amenity_ids)
+        self.assertIsNot(copy.deepcopy(p1).amenity_ids, p1.amenity_ids)
+        self.assertEqual(storage.count(), count)
+        storage.delete(p1)
@@ -0,0 +1,129 @@
+#!/usr/bin/python3
+"""Defines unittests for models/engine/db_storage.py"""
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from models.engine.db_storage import DBStorage
+from models.place import Place
+from models.user import User
+
+
+class TestDBStorage(unittest.TestCase):
+    """SQLite storage engine.
+
+    Models report their writes to `models.storage`, which is replaced by
+    the storage under test.
+
+    """
+
+    def setUp(self):
+        """Opens a storage on a temporary database.
+        """
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_file = os.path.join(self.tmpdir.name, 'objects.db')
+        self.storage = self.open()
+        self.patcher = patch('models.base_model.storage', self.storage)
+        self.patcher.start()
+
+    def tearDown(self):
+        """Closes the storage and removes the database.
+        """
+        self.patcher.stop()
+        self.storage.close()
+        self.tmpdir.cleanup()
+
+    def open(self):
+        """Returns a storage reloaded from the temporary database."""
+        storage = DBStorage(self.db_file)
+        storage._FileStorage__objects = dict()
+        storage.reload()
+        return storage
+
+    def test_schema(self):
+        """Tables are created per class with indexed foreign keys.
+        """
+        connection = sqlite3.connect(self.db_file)
+        mode = connection.execute('PRAGMA journal_mode').fetchone()[0]
+        self.assertEqual(mode, 'wal')
+        names = set(row[0] for row in connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index'"))
+        self.assertIn('Place_city_id', names)
+        self.assertIn('Review_place_id', names)
+        columns = set(row[1] for row in connection.execute(
+            'PRAGMA table_info("Place")'))
+        self.assertLessEqual({'id', 'city_id', 'latitude', 'extra'}, columns)
+        connection.close()
+
+    def test_round_trip(self):
+        """Saved objects are reloaded with the same attributes.
+        """
+        place = Place()
+        place.name = 'Cosy'
+        place.number_rooms = 3
+        place.max_guest = '5'
+        place.amenity_ids = ['a', 'b']
+        place.wifi = True
+        user = User()
+        self.storage.save()
+        storage = self.open()
+        self.assertEqual(storage.get(Place, place.id).to_dict(),
+                         place.to_dict())
+        self.assertEqual(storage.get('User', user.id).to_dict(),
+                         user.to_dict())
+        self.assertEqual(storage.count(), 2)
+        storage.close()
+
+    def test_attribute_order(self):
+        """Attributes are reloaded in the order they were set.
+        """
+        place = Place()
+        place.tag = 'new'
+        place.name = 'Cosy'
+        place.amenity_ids = ['a']
+        place.max_guest = 4
+        user = User()
+        user.email = 'a@b.c'
+        self.storage.save()
+        storage = self.open()
+        for obj in (place, user):
+            self.assertEqual(
+                list(storage.get(type(obj), obj.id).to_dict())[3:],
+                list(obj.to_dict())[3:])
+        storage.close()
+
+    def test_in_place_changes(self):
+        """Lists changed in place are upserted by the next save.
+        """
+        place = Place()
+        place.amenity_ids = ['a']
+        self.storage.save()
+        place.amenity_ids.append('b')
+        self.storage.save()
+        storage = self.open()
+        self.assertEqual(storage.get(Place, place.id).amenity_ids,
+                         ['a', 'b'])
+        storage.close()
+
+    def test_upsert_and_delete(self):
+        """A save updates changed rows and deletes removed objects.
+        """
+        places = [Place() for i in range(3)]
+        self.storage.save()
+        places[0].name = 'Renamed'
+        self.storage.delete(places[1])
+        self.storage.save()
+        storage = self.open()
+        self.assertEqual(storage.get(Place, places[0].id).name, 'Renamed')
+        self.assertIsNone(storage.get(Place, places[1].id))
+        self.assertEqual(storage.count(Place), 2)
+        self.assertCountEqual([p.id for p in
+                               storage.lookup(Place, 'city_id', '')],
+                              [places[0].id, places[2].id])
+        storage.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
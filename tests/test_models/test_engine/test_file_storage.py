@@ -0,0 +1,1914 @@
+#!/usr/bin/python3
+"""Puts the `FileStorage` engine and its storage modes to the test."""
+from datetime import datetime, timedelta
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from models import storage
+from models.base_model import BaseModel
+from models.engine.columns import ColumnStore
+from models.engine.compaction import Compactor
+from models.engine import compute
+from models.engine.durability import Durability
+from models.engine.flusher import Flusher
+from models.engine.file_storage import FileStorage
+from models.engine.importer import Importer
+from models.engine.journal import Journal
+from models.engine import query
+from models.engine import shards
+from models.engine.snapshot import Snapshot, encode, write_snapshot
+from models.engine.stream import iter_json_object
+from models.city import City
+from models.place import Place
+from models.review import Review
+from models.user import User
+
+
+class TestFileStorageJournal(unittest.TestCase):
+    """Journal mode of `FileStorage`.
+
+    Attributes:
+        __objects_backup (dict): copy of current dict of `FileStorage` objects
+        __file_path_backup (str): filename of the JSON file of `storage`
+
+    """
+    __objects_backup = storage._FileStorage__objects
+    __file_path_backup = storage._FileStorage__file_path
+
+    def setUp(self):
+        """Points `storage` to an empty temporary directory in journal mode.
+        """
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.json_file = os.path.join(self.tmpdir.name, 'objects.json')
+        storage._FileStorage__objects = dict()
+        storage._FileStorage__file_path = self.json_file
+        storage.journal = Journal(self.json_file + '.journal')
+        self.addCleanup(storage.journal.close)
+        storage.compactor = None
+
+    def tearDown(self):
+        """Restores `storage` to its state before the test.
+        """
+        storage.journal = None
+        storage.compactor = None
+        storage._FileStorage__objects = type(self).__objects_backup
+        storage._FileStorage__file_path = type(self).__file_path_backup
+        self.tmpdir.cleanup()
+
+    def test_failed_save(self):
+        """Changes whose write failed are written by the next save.
+        """
+        p1 = Place()
+        storage.save()
+        p1.name = 'Loft'
+        p2 = Place()
+        with patch.object(Journal, 'append', side_effect=OSError("full")):
+            with self.assertRaises(OSError):
+                storage.save()
+        storage.save()
+        storage._FileStorage__objects = dict()
+        storage.reload()
+        self.assertEqual(storage.get(Place, p1.id).name, 'Loft')
+        self.assertIsNotNone(storage.get(Place, p2.id))
+
+    def test_in_place_changes(self):
+        """Objects holding lists are journaled whole on every save.
+        """
+        p1 = Place()
+        p1.amenity_ids = ['a']
+        p1.save()
+        p1.amenity_ids.append('b')
+        p1.save()
+        p1.amenity_ids.append('c')
+        storage.save()
+        storage._FileStorage__objects = dict()
+        storage.reload()
+        self.assertEqual(storage.get(Place, p1.id).amenity_ids,
+                         ['a', 'b', 'c'])
+
+    def test_save_appends(self):
+        """`save` appends records instead of rewriting the JSON file.
+        """
+        u1 = User()
+        p1 = Place()
+        storage.save()
+        self.assertFalse(os.path.exists(self.json_file))
+        self.assertEqual(storage.journal.records, 2)
+
+        # Only the touched object is written by the next save.
+        p1.name = 'Loft'
+        p1.save()
+        self.assertEqual(storage.journal.records, 3)
+        with open(storage.journal.path, encoding='utf-8') as file:
+            last = json.loads(file.read().splitlines()[-1])
+        self.assertEqual(last['op'], 'patch')
+        self.assertEqual(last['key'], 'Place.' + p1.id)
+        self.assertEqual(last['value'], {'name': 'Loft',
+                                         'updated_at':
+                                         p1.updated_at.isoformat()})
+
+        storage.delete(u1)
+        storage.save()
+        self.assertEqual(storage.journal.records, 4)
+
+    def test_reload_replays(self):
+        """`reload` replays the journal on top of the snapshot.
+        """
+        u1 = User()
+        u2 = User()
+        storage.journal = None
+        storage.save()
+        storage.journal = Journal(self.json_file + '.journal')
+        u1.first_name = 'Betty'
+        u1.save()
+        storage.delete(u2)
+        storage.save()
+        p1 = Place()
+        storage.save()
+
+        storage._FileStorage__objects = dict()
+        storage.reload()
+        objects = storage.all()
+        self.assertEqual(objects['User.' + u1.id].first_name, 'Betty')
+        self.assertEqual(objects['User.' + u1.id].updated_at, u1.updated_at)
+        self.assertEqual(objects['User.' + u1.id].created_at, u1.created_at)
+        self.assertNotIn('User.' + u2.id, objects)
+        self.assertIn('Place.' + p1.id, objects)
+
+    def test_full_save_clears_journal(self):
+        """A whole-file save folds the journal into the JSON file.
+        """
+        b1 = BaseModel()
+        storage.save()
+        self.assertTrue(os.path.exists(storage.journal.path))
+        storage.journal = None
+        storage.save()
+        self.assertFalse(os.path.exists(self.json_file + '.journal'))
+        with open(self.json_file, encoding='utf-8') as file:
+            self.assertIn('BaseModel.' + b1.id, json.load(file))
+
+    def test_torn_record(self):
+        """A partially written last record is ignored on replay.
+        """
+        b1 = BaseModel()
+        storage.save()
+        with open(storage.journal.path, 'a', encoding='utf-8') as file:
+            file.write('{"op": "put", "key": "BaseMo')
+        storage._FileStorage__objects = dict()
+        storage.reload()
+        self.assertEqual(list(storage.all().keys()), ['BaseModel.' + b1.id])
+
+    def test_compaction_threshold(self):
+        """Crossing a threshold folds the journal into the JSON file.
+        """
+        storage.compactor = Compactor(self.json_file, storage.journal,
+                                      max_records=3)
+        b1 = BaseModel()
+        b2 = BaseModel()
+        storage.save()
+        self.assertIsNone(storage.compactor.last)
+        b1.save()
+        storage.compactor.wait()
+        self.assertEqual(storage.journal.records, 0)
+        self.assertFalse(os.path.exists(storage.journal.sealed_path))
+        with open(self.json_file, encoding='utf-8') as file:
+            self.assertEqual(set(json.load(file)),
+                             {'BaseModel.' + b1.id, 'BaseModel.' + b2.id})
+        report = storage.compactor.last
+        self.assertEqual(report['records_folded'], 3)
+        self.assertEqual(report['dead_records'], 1)
+        self.assertEqual(report['live_objects'], 2)
+        self.assertGreaterEqual(report['replay_seconds_saved'], 0)
+
+        # Writes after the compaction go to a fresh journal.
+        storage.delete(b2)
+        storage.save()
+        self.assertEqual(storage.journal.records, 1)
+        storage._FileStorage__objects = dict()
+        storage.reload()
+        self.assertEqual(list(storage.all()), ['BaseModel.' + b1.id])
+
+    def test_dead_ratio(self):
+        """Superseded records count towards the dead ratio.
+        """
+        b1 = BaseModel()
+        storage.save()
+        for i in range(3):
+            b1.save()
+        self.assertEqual(storage.journal.dead_ratio(), 0.75)
+        compactor = Compactor(self.json_file, storage.journal,
+                              max_dead_ratio=0.7, min_records=4)
+        self.assertTrue(compactor.due())
+        compactor.min_records = 5
+        self.assertFalse(compactor.due())
+
+    def test_interrupted_compaction(self):
+        """A sealed segment left behind by a crash is replayed by `reload`.
+        """
+        b1 = BaseModel()
+        storage.save()
+        storage.journal.seal()
+        b2 = BaseModel()
+        storage.save()
+        storage._FileStorage__objects = dict()
+        storage.reload()
+        self.assertEqual(set(storage.all()),
+                         {'BaseModel.' + b1.id, 'BaseModel.' + b2.id})
+
+        # The next compaction folds the leftover segment only.
+        compactor = Compactor(self.json_file, storage.journal,
+                              background=False)
+        self.assertTrue(compactor.compact())
+        self.assertEqual(compactor.last['records_folded'], 1)
+        self.assertEqual(storage.journal.records, 1)
+
+
+class TestFileStorageDirty(unittest.TestCase):
+    """Dirty tracking between `BaseModel` and `FileStorage`.
+
+    Attributes:
+        __objects_backup (dict): copy of current dict of `FileStorage` objects
+        __file_path_backup (str): filename of the JSON file of `storage`
+
+    """
+    __objects_backup = storage._FileStorage__objects
+    __file_path_backup = storage._FileStorage__file_path
+
+    def setUp(self):
+        """Points `storage` to an empty temporary directory.
+        """
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.json_file = os.path.join(self.tmpdir.name, 'objects.json')
+        storage._FileStorage__objects = dict()
+        storage._FileStorage__file_path = self.json_file
+
+    def tearDown(self):
+        """Restores `storage` to its state before the test.
+        """
+        storage._FileStorage__objects = type(self).__objects_backup
+        storage._FileStorage__file_path = type(self).__file_path_backup
+        self.tmpdir.cleanup()
+
+    def test_changed_attributes(self):
+        """Attribute writes are recorded until the next save.
+        """
+        p1 = Place()
+        self.assertIsNone(p1.__dict__.changed)
+        p1.name = 'Loft'
+        p1.__dict__['max_guest'] = 4
+        self.assertEqual(p1.__dict__.changed, {'name', 'max_guest'})
+        self.assertEqual(str(p1.__dict__), str(dict(p1.__dict__)))
+        storage.save()
+        self.assertIsNone(p1.__dict__.changed)
+        del p1.name
+        self.assertEqual(p1.__dict__.changed, {'name'})
+        with self.assertRaises(AttributeError):
+            del p1.name
+
+    def test_save_serializes_dirty_only(self):
+        """A save only calls `to_dict` on the objects that changed.
+        """
+        places = [Place() for i in range(5)]
+        storage.save()
+        places[2].__dict__['name'] = 'Loft'
+        with patch.object(Place, 'to_dict', autospec=True,
+                          side_effect=BaseModel.to_dict) as to_dict:
+            storage.save()
+        self.assertEqual(to_dict.call_count, 1)
+        self.assertIs(to_dict.call_args[0][0], places[2])
+        with open(self.json_file, encoding='utf-8') as file:
+            content = file.read()
+        self.assertEqual(content, json.dumps(
+            {'Place.' + p.id: p.to_dict() for p in places}))
+
+        storage.delete(places[0])
+        storage.save()
+        with open(self.json_file, encoding='utf-8') as file:
+            self.assertEqual(len(json.load(file)), 4)
+
+    def test_copies_are_not_tracked(self):
+        """Objects built from a dictionary do not dirty the original.
+        """
+        p1 = Place()
+        storage.save()
+        p2 = Place(**p1.to_dict())
+        p2.name = 'Copy'
+        with patch.object(Place, 'to_dict', autospec=True,
+                          side_effect=BaseModel.to_dict) as to_dict:
+            storage.save()
+        self.assertEqual(to_dict.call_count, 0)
+
+    def test_in_place_changes(self):
+        """Lists and dicts changed in place are saved and exported.
+        """
+        p1 = Place()
+        p1.amenity_ids = []
+        p1.save()
+        p1.amenity_ids.append('a1')
+        p1.meta = {'k': 1}
+        storage.save()
+        p1.meta['k'] = 2
+        storage.save()
+        with open(self.json_file, encoding='utf-8') as file:
+            record = json.load(file)['Place.' + p1.id]
+        self.assertEqual((record['amenity_ids'], record['meta']),
+                         (['a1'], {'k': 2}))
+        p1.amenity_ids.append('a2')
+        out = io.StringIO()
+        storage.export(out, Place)
+        self.assertEqual(json.loads(out.getvalue())['amenity_ids'],
+                         ['a1', 'a2'])
+
+
+class TestFileStorageClasses(unittest.TestCase):
+    """Per-class partitions of `FileStorage`.
+
+    Attributes:
+        __objects_backup (dict): copy of current dict of `FileStorage` objects
+
+    """
+    __objects_backup = storage._FileStorage__objects
+
+    def setUp(self):
+        """Empties `storage`.
+        """
+        self.indexes = {name: dict(indexes) for name, indexes
+                        in storage._FileStorage__indexes.items()}
+        storage._FileStorage__objects = dict()
+
+    def tearDown(self):
+        """Restores `storage` to its state before the test.
+        """
+        storage._FileStorage__indexes = self.indexes
+        storage._FileStorage__objects = type(self).__objects_backup
+
+    def test_all_get_count(self):
+        """`all`, `get` and `count` only look at the requested class.
+        """
+        u1 = User()
+        p1 = Place()
+        p2 = Place()
+        self.assertEqual(storage.all(Place), {'Place.' + p1.id: p1,
+                                              'Place.' + p2.id: p2})
+        self.assertEqual(storage.all('User'), {'User.' + u1.id: u1})
+        self.assertEqual(storage.all('Review'), {})
+        self.assertEqual(len(storage.all()), 3)
+        self.assertIs(storage.get(Place, p2.id), p2)
+        self.assertIs(storage.get('User', u1.id), u1)
+        self.assertIsNone(storage.get('User', p1.id))
+        self.assertEqual(storage.count(Place), 2)
+        self.assertEqual(storage.count('Review'), 0)
+        self.assertEqual(storage.count(), 3)
+
+        storage.delete(p1)
+        self.assertEqual(storage.count('Place'), 1)
+        self.assertIsNone(storage.get('Place', p1.id))
+
+    def test_objects_replaced(self):
+        """Partitions follow __objects when it is replaced or edited.
+        """
+        u1 = User()
+        self.assertEqual(storage.count('User'), 1)
+        storage._FileStorage__objects = dict()
+        self.assertEqual(storage.count('User'), 0)
+        u2 = User()
+        self.assertIs(storage.get('User', u2.id), u2)
+        del storage.all()['User.' + u2.id]
+        self.assertIsNone(storage.get('User', u2.id))
+        self.assertIsNone(storage.get('User', u1.id))
+
+    def test_hash_index(self):
+        """Declared indexes follow creation, updates and deletion.
+        """
+        c1 = City()
+        c2 = City()
+        c1.state_id = 'CA'
+        c2.__dict__['state_id'] = 'CA'
+        self.assertEqual(storage.lookup(City, 'state_id', 'CA'), [c1, c2])
+        c1.state_id = 'NV'
+        self.assertEqual(storage.lookup(City, 'state_id', 'CA'), [c2])
+        self.assertEqual(storage.lookup('City', 'state_id', 'NV'), [c1])
+        storage.delete(c2)
+        self.assertEqual(storage.lookup(City, 'state_id', 'CA'), [])
+
+        # Objects copied from a dictionary are not indexed.
+        c3 = City(**c1.to_dict())
+        c3.state_id = 'CA'
+        self.assertEqual(storage.lookup(City, 'state_id', 'CA'), [])
+
+    def test_lookup_uses_index(self):
+        """`lookup` reads the index instead of scanning the class.
+        """
+        r1 = Review()
+        r1.place_id = 'p1'
+        index = storage.add_index(Review, 'place_id')
+        self.assertIs(storage.add_index('Review', 'place_id'), index)
+        index.buckets['p1']['Review.fake'] = 'fake'
+        self.assertEqual(storage.lookup(Review, 'place_id', 'p1'),
+                         [r1, 'fake'])
+
+        # Attributes without an index are scanned.
+        r1.text = 'Great'
+        self.assertEqual(storage.lookup(Review, 'text', 'Great'), [r1])
+
+        # Indexes are rebuilt when __objects is replaced.
+        storage._FileStorage__objects = dict()
+        self.assertEqual(storage.lookup(Review, 'place_id', 'p1'), [])
+
+    def test_ordered_index(self):
+        """Range queries, min/max and ordered iteration on a numeric field.
+        """
+        prices = [120, 80, 150, 200, 80]
+        places = []
+        for price in prices:
+            places.append(Place())
+            places[-1].price_by_night = price
+        index = storage.add_index(Place, 'price_by_night', 'ordered')
+        self.assertIs(storage.index('Place', 'price_by_night', 'ordered'),
+                      index)
+        found = storage.range(Place, 'price_by_night', 80, 150)
+        self.assertEqual([p.price_by_night for p in found],
+                         [80, 80, 120, 150])
+        found = storage.range(Place, 'price_by_night', 80, 150,
+                              lo_inclusive=False, hi_inclusive=False)
+        self.assertEqual(found, [places[0]])
+        self.assertIs(index.min().price_by_night, 80)
+        self.assertIs(index.max(), places[3])
+        self.assertEqual([p.price_by_night for p in reversed(index)],
+                         [200, 150, 120, 80, 80])
+
+        # The index follows updates, direct writes, deletes and new objects.
+        places[3].price_by_night = 10
+        places[2].__dict__['price_by_night'] = 90
+        storage.delete(places[0])
+        p6 = Place()
+        self.assertEqual([p.price_by_night for p in index],
+                         [0, 10, 80, 80, 90])
+        self.assertIs(index.min(), p6)
+
+        # Values of another type are kept in a list of their own.
+        p6.price_by_night = 'cheap'
+        self.assertEqual([p.price_by_night for p in index],
+                         [10, 80, 80, 90, 'cheap'])
+        self.assertEqual(index.max().price_by_night, 90)
+        self.assertEqual(storage.range(Place, 'price_by_night', 'a', 'd'),
+                         [p6])
+        self.assertEqual(len(storage.range(Place, 'price_by_night', 50)), 3)
+        self.assertEqual(len(storage.where(Place, 'price_by_night>=10')), 4)
+        p6.price_by_night = {'night': 1}
+        places[1].price_by_night = {'night': 2}
+        self.assertEqual(index.count(), 5)
+        self.assertEqual(storage.range(Place, 'price_by_night',
+                                       {'night': 2}), [])
+        self.assertEqual(storage.range(Place, 'price_by_night', 0, 100),
+                         [places[3], places[4], places[2]])
+        storage.delete(p6)
+        self.assertEqual(index.count(), 4)
+
+    def test_range_without_index(self):
+        """`range` sorts the class partition when there is no index.
+        """
+        u1 = User()
+        u2 = User()
+        u1.updated_at = datetime.now() - timedelta(hours=2)
+        found = storage.range(User, 'updated_at',
+                              datetime.now() - timedelta(hours=1))
+        self.assertEqual(found, [u2])
+        self.assertIsNone(storage.index(User, 'updated_at', 'ordered'))
+        with self.assertRaises(ValueError):
+            storage.add_index(User, 'updated_at', 'btree')
+
+    def test_page(self):
+        """Keyset pages follow the order of ids, within a class or across.
+        """
+        places = [Place() for i in range(7)]
+        users = [User() for i in range(3)]
+        places[4].name = 'Loft'
+        self.assertEqual(storage.range(Place, 'name', 'Loft', limit=2),
+                         [places[4]])
+        self.assertEqual(len(storage.range(Place, 'name', limit=2)), 2)
+        pages = []
+        page = storage.page(Place, limit=3)
+        while len(page) > 0:
+            pages.append(page)
+            page = storage.page(Place, page[-1].id, 3)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(sum(pages, []),
+                         sorted(places, key=lambda obj: obj.id))
+        self.assertIsNone(storage.index(Place, 'id', 'ordered'))
+
+        # New objects land in their place in the order, with or without an
+        # ordered index on `id`.
+        p8 = Place()
+        self.assertIn(p8, storage.page(Place, None, 8))
+        everything = sorted(places + users + [p8], key=lambda obj: obj.id)
+        self.assertEqual(storage.page(), everything)
+        self.assertEqual(storage.page(None, everything[3].id, 4),
+                         everything[4:8])
+        storage.add_index(Place, 'id', 'ordered')
+        p9 = Place()
+        everything = sorted(everything + [p9], key=lambda obj: obj.id)
+        self.assertEqual(storage.page(), everything)
+        self.assertEqual(storage.page(Place, everything[2].id, 3),
+                         [obj for obj in everything[3:]
+                          if type(obj) is Place][:3])
+
+    def test_spatial_index(self):
+        """Radius, bounding box and nearest neighbour queries on Place.
+        """
+        coords = {'sf': (37.7749, -122.4194), 'oakland': (37.8044, -122.2712),
+                  'san_jose': (37.3382, -121.8863), 'la': (34.0522, -118.2437)}
+        places = dict()
+        for name, (lat, lon) in coords.items():
+            places[name] = Place()
+            places[name].latitude = lat
+            places[name].longitude = lon
+        index = storage.index(Place, ('latitude', 'longitude'), 'spatial')
+        self.assertEqual(len(index.positions), 4)
+
+        found = storage.near(Place, 37.7749, -122.4194, 20)
+        self.assertEqual([obj for d, obj in found],
+                         [places['sf'], places['oakland']])
+        self.assertAlmostEqual(found[1][0], 13.4, delta=0.5)
+        self.assertEqual(len(storage.near('Place', 37.7749, -122.4194, 600)),
+                         4)
+        self.assertEqual(storage.within(Place, 37.0, -122.5, 38.0, -122.0),
+                         [places['sf'], places['oakland']])
+        nearest = storage.k_nearest(Place, 34.0, -118.0, 2)
+        self.assertEqual([obj for d, obj in nearest],
+                         [places['la'], places['san_jose']])
+
+        # The index follows moves and deletions.
+        places['la'].latitude = 37.78
+        places['la'].__dict__['longitude'] = -122.42
+        storage.delete(places['oakland'])
+        found = storage.near(Place, 37.7749, -122.4194, 20)
+        self.assertEqual([obj for d, obj in found],
+                         [places['sf'], places['la']])
+
+    def test_antimeridian(self):
+        """Radius and nearest neighbour queries reach across longitude 180.
+        """
+        east = Place()
+        east.latitude, east.longitude = -17.7, 179.99
+        west = Place()
+        west.latitude, west.longitude = -17.7, -179.5
+        storage.add_index(Place, ('latitude', 'longitude'), 'spatial')
+        found = storage.near(Place, -17.7, -179.99, 60)
+        self.assertEqual([obj for d, obj in found], [east, west])
+        self.assertAlmostEqual(found[0][0], 2.1, delta=0.1)
+        self.assertEqual(
+            [obj for d, obj in storage.near(Place, -17.7, 179.9, 80)],
+            [east, west])
+        # Enough cells on the near side to stop before a full scan.
+        for i in range(40):
+            place = Place()
+            place.latitude = -17.7 + i % 5 * 0.3
+            place.longitude = -179.5 + i // 5 * 0.3
+        nearest = storage.k_nearest(Place, -17.7, -179.99, 1)
+        self.assertEqual([obj for d, obj in nearest], [east])
+
+
+class TestFileStorageLazy(unittest.TestCase):
+    """Lazy hydration mode of `FileStorage`.
+
+    Attributes:
+        __objects_backup (dict): copy of current dict of `FileStorage` objects
+        __file_path_backup (str): filename of the JSON file of `storage`
+
+    """
+    __objects_backup = storage._FileStorage__objects
+    __file_path_backup = storage._FileStorage__file_path
+
+    def setUp(self):
+        """Saves a few objects to a temporary file and reloads it lazily.
+        """
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.json_file = os.path.join(self.tmpdir.name, 'objects.json')
+        storage._FileStorage__objects = dict()
+        storage._FileStorage__file_path = self.json_file
+        self.users = [User() for i in range(3)]
+        self.places = [Place() for i in range(2)]
+        self.places[0].city_id = 'c1'
+        storage.save()
+        storage._FileStorage__objects = dict()
+        storage.lazy = True
+        storage.reload()
+
+    def tearDown(self):
+        """Restores `storage` to its state before the test.
+        """
+        storage.lazy = False
+        storage._FileStorage__records = dict()
+        storage._FileStorage__objects = type(self).__objects_backup
+        storage._FileStorage__file_path = type(self).__file_path_backup
+        self.tmpdir.cleanup()
+
+    def test_nothing_built(self):
+        """`reload` and `count` do not build any object.
+        """
+        self.assertEqual(len(storage._FileStorage__objects), 0)
+        self.assertEqual(storage.count(), 5)
+        self.assertEqual(storage.count(User), 3)
+        self.assertEqual(storage.count('Review'), 0)
+        self.assertEqual(len(storage._FileStorage__objects), 0)
+
+    def test_get_builds_one(self):
+        """`get` only builds the requested object.
+        """
+        user = storage.get(User, self.users[1].id)
+        self.assertIsInstance(user, User)
+        self.assertEqual(user.created_at, self.users[1].created_at)
+        self.assertEqual(list(storage._FileStorage__objects),
+                         ['User.' + user.id])
+        self.assertIs(storage.get('User', user.id), user)
+        self.assertIsNone(storage.get('User', 'missing'))
+        self.assertEqual(storage.count(User), 3)
+
+    def test_class_access_builds_class(self):
+        """`all(cls)` and index queries build one class only.
+        """
+        self.assertEqual(len(storage.all(User)), 3)
+        self.assertEqual(len(storage._FileStorage__objects), 3)
+        found = storage.lookup(Place, 'city_id', 'c1')
+        self.assertEqual([p.id for p in found], [self.places[0].id])
+        self.assertEqual(len(storage.all()), 5)
+        self.assertEqual(storage._FileStorage__records, {})
+
+    def test_save_keeps_records(self):
+        """Records that were never built are still saved.
+        """
+        user = storage.get(User, self.users[0].id)
+        user.first_name = 'Betty'
+        storage.save()
+        with open(self.json_file, encoding='utf-8') as file:
+            saved = json.load(file)
+        self.assertEqual(len(saved), 5)
+        self.assertEqual(saved['User.' + user.id]['first_name'], 'Betty')
+
+
+class TestFileStorageBinary(unittest.TestCase):
+    """Binary snapshot format of `FileStorage`.
+
+    Attributes:
+        __objects_backup (dict): copy of current dict of `FileStorage` objects
+        __file_path_backup (str): filename of the JSON file of `storage`
+
+    """
+    __objects_backup = storage._FileStorage__objects
+    __file_path_backup = storage._FileStorage__file_path
+
+    def setUp(self):
+        """Saves a few objects to a temporary snapshot and reloads it.
+        """
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.bin_file = os.path.join(self.tmpdir.name, 'objects.bin')
+        storage._FileStorage__objects = dict()
+        storage._FileStorage__file_path = self.bin_file
+        storage.file_format = 'binary'
+        self.users = [User() for i in range(3)]
+        self.users[1].first_name = 'Betty'
+        self.places = [Place() for i in range(2)]
+        storage.save()
+        storage._FileStorage__objects = dict()
+        storage.lazy = True
+        storage.reload()
+
+    def tearDown(self):
+        """Restores `storage` to its state before the test.
+        """
+        storage.file_format = 'json'
+        storage.lazy = False
+        storage._FileStorage__records = dict()
+        storage._FileStorage__objects = type(self).__objects_backup
+        storage._FileStorage__file_path = type(self).__file_path_backup
+        self.tmpdir.cleanup()
+
+    def test_snapshot(self):
+        """Records are found by key in the sorted table.
+        """
+        path = os.path.join(self.tmpdir.name, 'test.bin')
+        write_snapshot(path, [('b', encode({'x': 2})),
+                              ('a', encode({'x': 1})),
+                              ('c', encode({'x': [3]}))])
+        snapshot = Snapshot(path)
+        self.assertEqual(len(snapshot), 3)
+        self.assertEqual([key for position, key in snapshot.keys()],
+                         ['a', 'b', 'c'])
+        self.assertEqual(snapshot.get('c'), {'x': [3]})
+        self.assertEqual(snapshot.get('a'), {'x': 1})
+        self.assertIsNone(snapshot.get('bb'))
+        self.assertFalse(os.path.exists(path + '.tmp'))
+
+    def test_not_a_snapshot(self):
+        """A file that is not a snapshot raises ValueError.
+        """
+        path = os.path.join(self.tmpdir.name, 'objects.json')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write('{"BaseModel.1": {}}')
+        with self.assertRaises(ValueError):
+            Snapshot(path)
+        with self.assertRaises(ValueError):
+            FileStorage(file_format='xml')
+
+    def test_get_reads_one_record(self):
+        """`get` decodes a single record and builds a single object.
+        """
+        self.assertEqual(len(storage._FileStorage__objects), 0)
+        self.assertEqual(storage.count(User), 3)
+        user = storage.get(User, self.users[1].id)
+        self.assertEqual(user.first_name, 'Betty')
+        self.assertEqual(user.to_dict(), self.users[1].to_dict())
+        self.assertEqual(len(storage._FileStorage__objects), 1)
+
+    def test_save_round_trip(self):
+        """Unchanged records are copied and changes are saved.
+        """
+        user = storage.get(User, self.users[0].id)
+        user.first_name = 'Ada'
+        storage.delete(storage.get(Place, self.places[0].id))
+        storage.save()
+        snapshot = Snapshot(self.bin_file)
+        self.assertEqual(len(snapshot), 4)
+        self.assertEqual(snapshot.get('User.' + user.id)['first_name'],
+                         'Ada')
+        self.assertEqual(snapshot.get('User.' + self.users[1].id),
+                         self.users[1].to_dict())
+        self.assertIsNone(snapshot.get('Place.' + self.places[0].id))
+
+
+class TestFileStorageShards(unittest.TestCase):
+    """Per-class shard files of `FileStorage`.
+
+    Attributes:
+        __objects_backup (dict): copy of current dict of `FileStorage` objects
+        __file_path_backup (str): filename of the JSON file of `storage`
+
+    """
+    __objects_backup = storage._FileStorage__objects
+    __file_path_backup = storage._FileStorage__file_path
+
+    def setUp(self):
+        """Saves a few objects to shards in a temporary directory.
+        """
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.shard_dir = os.path.join(self.tmpdir.name, 'objects')
+        storage._FileStorage__objects = dict()
+        storage._FileStorage__file_path = self.shard_dir + '.json'
+        storage.shards = 2
+        self.users = [User() for i in range(4)]
+        self.places = [Place() for i in range(6)]
+        storage.save()
+
+    def tearDown(self):
+        """Restores `storage` to its state before the test.
+        """
+        storage.shards = None
+        storage._FileStorage__written = None
+        storage._FileStorage__stale = set()
+        storage._FileStorage__objects = type(self).__objects_backup
+        storage._FileStorage__file_path = type(self).__file_path_backup
+        self.tmpdir.cleanup()
+
+    def files(self):
+        """Returns the sorted filenames of the shard directory."""
+        return sorted(os.listdir(self.shard_dir))
+
+    def test_layout(self):
+        """Objects are saved to the shard their id hashes to.
+        """
+        for filename in self.files():
+            with open(os.path.join(self.shard_dir, filename),
+                      encoding='utf-8') as file:
+                for key in json.load(file):
+                    name, _, obj_id = key.partition('.')
+                    self.assertEqual(filename, shards.shard_name(
+                        name, shards.shard_of(obj_id, 2), 2, '.json'))
+        self.assertEqual(set(name for name, filename
+                             in shards.list_shards(self.shard_dir, '.json')),
+                         {'User', 'Place'})
+
+    def test_dirty_shards_only(self):
+        """A save only rewrites the shards of the dirty objects.
+        """
+        user = self.users[0]
+        user.first_name = 'Betty'
+        with patch.object(FileStorage, '_FileStorage__write',
+                          autospec=True,
+                          side_effect=FileStorage._FileStorage__write) as w:
+            storage.save()
+        self.assertEqual([os.path.basename(call.args[1])
+                          for call in w.call_args_list],
+                         [shards.shard_name('User',
+                                            shards.shard_of(user.id, 2),
+                                            2, '.json')])
+
+    def test_parallel_reload(self):
+        """Shards decoded by worker processes are merged in __objects.
+        """
+        storage._FileStorage__objects = dict()
+        with patch.object(shards, 'PARALLEL_BYTES', 0):
+            storage.reload()
+        self.assertEqual(storage.count(User), 4)
+        self.assertEqual(storage.count(Place), 6)
+        user = storage.get(User, self.users[2].id)
+        self.assertEqual(user.to_dict(), self.users[2].to_dict())
+
+    def test_parallel_reload_on_import(self):
+        """Shards large enough for worker processes load while `models` is
+        being imported.
+        """
+        directory = os.path.join(self.tmpdir.name, 'HBnB_objects')
+        os.makedirs(directory)
+        name = 'x' * 1000
+        for shard in range(2):
+            records = dict()
+            while len(records) * len(name) < shards.PARALLEL_BYTES:
+                user = User()
+                user.name = name
+                if shards.shard_of(user.id, 2) == shard:
+                    records['User.' + user.id] = user.to_dict()
+            with open(os.path.join(directory, shards.shard_name(
+                    'User', shard, 2, '.json')), 'w') as file:
+                json.dump(records, file)
+        root = os.path.dirname(os.path.dirname(os.path.abspath(
+            sys.modules['models'].__file__)))
+        env = dict(os.environ, HBNB_SHARDS='2', PYTHONPATH=root)
+        env.pop('HBNB_TYPE_STORAGE', None)
+        result = subprocess.run(
+            [sys.executable, '-c',
+             'import models; print(models.storage.count())'],
+            cwd=self.tmpdir.name, env=env, capture_output=True, text=True,
+            timeout=60)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertGreater(int(result.stdout), 2 * 2000)
+
+    def test_shard_count_changed(self):
+        """Classes saved with another number of shards are rewritten.
+        """
+        storage._FileStorage__objects = dict()
+        storage.shards = 1
+        storage.reload()
+        storage.save()
+        self.assertEqual(self.files(), ['Place.json', 'User.json'])
+        storage._FileStorage__objects = dict()
+        storage.reload()
+        self.assertEqual(storage.count(), 10)
+
+    def test_deleted(self):
+        """Shards left empty are removed.
+        """
+        for user in self.users:
+            storage.delete(user)
+        storage.save()
+        self.assertEqual([name for name, filename
+                          in shards.list_shards(self.shard_dir, '.json')
+                          if name == 'User'], [])
+
+    def test_journal(self):
+        """Shards cannot be combined with the journal.
+        """
+        with self.assertRaises(ValueError):
+            FileStorage(journal=True, shards=2)
+        with self.assertRaises(ValueError):
+            FileStorage(shards=0)
+
+
+class TestFileStorageTransaction(unittest.TestCase):
+    """Transactions of `FileStorage`.
+
+    Attributes:
+        __objects_backup (dict): copy of current dict of `FileStorage` objects
+        __file_path_backup (str): filename of the JSON file of `storage`
+
+    """
+    __objects_backup = storage._FileStorage__objects
+    __file_path_backup = storage._FileStorage__file_path
+
+    def setUp(self):
+        """Saves a few objects to a temporary file.
+        """
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.json_file = os.path.join(self.tmpdir.name, 'objects.json')
+        storage._FileStorage__objects = dict()
+        storage._FileStorage__file_path = self.json_file
+        self.city = City()
+        self.city.state_id = 's1'
+        storage.save()
+
+    def tearDown(self):
+        """Restores `storage` to its state before the test.
+        """
+        storage._FileStorage__objects = type(self).__objects_backup
+        storage._FileStorage__file_path = type(self).__file_path_backup
+        self.tmpdir.cleanup()
+
+    def test_context_manager(self):
+        """A block saves once when it ends, however often it saves.
+        """
+        with patch.object(FileStorage, '_write') as write:
+            with storage.transaction():
+                for i in range(10):
+                    City().save()
+                with storage.transaction():
+                    self.city.save()
+                self.assertEqual(write.call_count, 0)
+            self.assertEqual(write.call_count, 1)
+        self.assertEqual(storage.count(City), 11)
+
+    def test_rollback_on_error(self):
+        """A block that raises puts objects and indexes back.
+        """
+        with self.assertRaises(KeyError):
+            with storage.transaction():
+                self.city.state_id = 's2'
+                self.city.name = 'Paris'
+                City()
+                raise KeyError('state')
+        self.assertEqual(self.city.state_id, 's1')
+        self.assertNotIn('name', self.city.__dict__)
+        self.assertEqual(storage.count(City), 1)
+        self.assertEqual(storage.lookup(City, 'state_id', 's1'),
+                         [self.city])
+        self.assertEqual(storage.lookup(City, 'state_id', 's2'), [])
+        storage.save()
+        with open(self.json_file, encoding='utf-8') as file:
+            saved = json.load(file)
+        self.assertEqual(saved, {'City.' + self.city.id:
+                                 self.city.to_dict()})
+
+    def test_rollback_delete(self):
+        """A rolled back deletion puts the object back.
+        """
+        storage.begin()
+        storage.delete(self.city)
+        storage.save()
+        storage.rollback()
+        self.assertIs(storage.get(City, self.city.id), self.city)
+        with self.assertRaises(RuntimeError):
+            storage.commit()
+
+
+class TestFileStorageWriteBehind(unittest.TestCase):
+    """Write-behind mode of `FileStorage`.
+
+    Attributes:
+        __objects_backup (dict): copy of current dict of `FileStorage` objects
+        __file_path_backup (str): filename of the JSON file of `storage`
+
+    """
+    __objects_backup = storage._FileStorage__objects
+    __file_path_backup = storage._FileStorage__file_path
+
+    def setUp(self):
+        """Points `storage` at a temporary file and a short interval.
+        """
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.json_file = os.path.join(self.tmpdir.name, 'objects.json')
+        storage._FileStorage__objects = dict()
+        storage._FileStorage__file_path = self.json_file
+        storage.flusher = Flusher(storage._FileStorage__save_behind, 0.1, 5)
+
+    def tearDown(self):
+        """Restores `storage` to its state before the test.
+        """
+        storage.flush()
+        storage.flusher = None
+        storage._FileStorage__objects = type(self).__objects_backup
+        storage._FileStorage__file_path = type(self).__file_path_backup
+        self.tmpdir.cleanup()
+
+    def saved(self):
+        """Returns the number of objects in the JSON file."""
+        if not os.path.exists(self.json_file):
+            return 0
+        with open(self.json_file, encoding='utf-8') as file:
+            return len(json.load(file))
+
+    def test_interval(self):
+        """Saves are written together once the interval has passed.
+        """
+        for i in range(3):
+            User().save()
+        self.assertEqual(self.saved(), 0)
+        deadline = time.monotonic() + 5
+        while storage.flusher.flushes == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(storage.flusher.flushes, 1)
+        self.assertEqual(self.saved(), 3)
+
+    def test_max_pending(self):
+        """Enough pending saves are written without waiting.
+        """
+        storage.flusher.interval = 60
+        for i in range(5):
+            User().save()
+        deadline = time.monotonic() + 5
+        while storage.flusher.flushes == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.saved(), 5)
+
+    def test_flush(self):
+        """`flush` writes the pending saves at once.
+        """
+        storage.flusher.interval = 60
+        User().save()
+        storage.flush()
+        self.assertEqual(self.saved(), 1)
+        self.assertEqual(storage.flusher.pending, 0)
+
+    def test_transaction(self):
+        """Changes made in a transaction are not written before commit, and
+        a rollback writes back the restored state.
+        """
+        user = User()
+        user.first_name = 'Betty'
+        user.save()
+        storage.flush()
+        storage.begin()
+        user.first_name = 'UNCOMMITTED'
+        user.save()
+        storage.flusher.request()
+        deadline = time.monotonic() + 5
+        while storage.flusher.flushes < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        with open(self.json_file, encoding='utf-8') as file:
+            self.assertNotIn('UNCOMMITTED', file.read())
+        storage.rollback()
+        self.assertIs(storage._FileStorage__dirty['User.' + user.id], user)
+        storage.save()
+        storage.flush()
+        with open(self.json_file, encoding='utf-8') as file:
+            record = json.load(file)['User.' + user.id]
+        self.assertEqual(record['first_name'], 'Betty')
+
+        with storage.transaction():
+            user.first_name = 'Holly'
+            user.save()
+        storage.flush()
+        with open(self.json_file, encoding='utf-8') as file:
+            record = json.load(file)['User.' + user.id]
+        self.assertEqual(record['first_name'], 'Holly')
+
+    def test_drain_waits(self):
+        """`drain` returns once the flush in progress is done.
+        """
+        started = threading.Event()
+        done = []
+
+        def flush():
+            started.set()
+            time.sleep(0.2)
+            done.append(True)
+
+        flusher = Flusher(flush, 0, 1)
+        flusher.request()
+        self.assertTrue(started.wait(5))
+        flusher.drain()
+        self.assertEqual(done, [True])
+        self.assertFalse(flusher.flushing)
+
+    def test_failed_flush(self):
+        """The saves of a failed flush are flushed again.
+        """
+        calls = []
+
+        def flush():
+            calls.append(True)
+            if len(calls) == 1:
+                raise OSError("disk full")
+
+        flusher = Flusher(flush, 60, 100)
+        flusher.request()
+        with self.assertRaises(OSError):
+            flusher.drain()
+        self.assertEqual(flusher.pending, 1)
+        flusher.drain()
+        self.assertEqual((len(calls), flusher.pending, flusher.flushes),
+                         (2, 0, 1))
+
+    @patch('models.engine.file_storage.atexit')
+    def test_exit_hook(self, hook):
+        """Only a storage with something to write at exit registers it.
+        """
+        FileStorage()
+        hook.register.assert_not_called()
+        store = FileStorage(write_behind=60)
+        hook.register.assert_called_once_with(store.close)
+        store.close()
+        hook.unregister.assert_called_once_with(store.close)
+
+
+class TestFileStorageDurability(unittest.TestCase):
+    """Durability modes of the files written by `FileStorage`.
+    """
+
+    def setUp(self):
+        """Creates an empty temporary directory.
+        """
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.json_file = os.path.join(self.tmpdir.name, 'objects.json')
+
+    def tearDown(self):
+        """Removes the temporary directory.
+        """
+        self.tmpdir.cleanup()
+
+    def journal(self, mode, **kwargs):
+        """Returns a journal appended to once in durability `mode`."""
+        journal = Journal(self.json_file + '.journal',
+                          Durability(mode, **kwargs))
+        journal.append([('put', 'User.1', {'id': '1'})])
+        self.addCleanup(journal.close)
+        return journal
+
+    def on_disk(self, journal):
+        """Returns the number of records another reader sees."""
+        with open(journal.path, encoding='utf-8') as file:
+            return len(file.readlines())
+
+    def test_replace(self):
+        """Whole files are replaced atomically through a temporary file.
+        """
+        durability = Durability()
+        with durability.replace(self.json_file) as file:
+            file.write('{}')
+        with self.assertRaises(KeyError):
+            with durability.replace(self.json_file) as file:
+                file.write('{"trunc')
+                raise KeyError('crash')
+        with open(self.json_file, encoding='utf-8') as file:
+            self.assertEqual(file.read(), '{}')
+        self.assertEqual(os.listdir(self.tmpdir.name), ['objects.json'])
+
+    def test_modes(self):
+        """Each mode pushes appends as far as it promises.
+        """
+        journal = self.journal('none')
+        self.assertEqual(self.on_disk(journal), 0)
+        journal.close()
+        self.assertEqual(self.on_disk(journal), 1)
+        os.remove(journal.path)
+
+        journal = self.journal('flush')
+        self.assertEqual(self.on_disk(journal), 1)
+        self.assertEqual(journal.durability.fsyncs, 0)
+        os.remove(journal.path)
+
+        journal = self.journal('fsync')
+        self.assertEqual(self.on_disk(journal), 1)
+        self.assertEqual(journal.durability.fsyncs, 1)
+        with journal.durability.replace(self.json_file) as file:
+            file.write('{}')
+        self.assertEqual(journal.durability.fsyncs, 3)
+
+    def test_group(self):
+        """Group mode syncs the files written during the interval at once.
+        """
+        journal = self.journal('group', group_interval=60)
+        journal.append([('del', 'User.1', None)])
+        with journal.durability.replace(self.json_file) as file:
+            file.write('{}')
+        self.assertEqual(self.on_disk(journal), 2)
+        self.assertEqual(journal.durability.fsyncs, 0)
+        journal.durability.sync()
+        self.assertEqual(journal.durability.fsyncs, 3)
+        journal.durability.sync()
+        self.assertEqual(journal.durability.fsyncs, 3)
+
+    def test_group_timer(self):
+        """Group mode syncs an idle writer once the interval is over.
+        """
+        journal = self.journal('group', group_interval=0.05)
+        journal.append([('del', 'User.1', None)])
+        deadline = time.monotonic() + 5
+        while (journal.durability.fsyncs == 0 and
+               time.monotonic() < deadline):
+            time.sleep(0.01)
+        self.assertEqual(journal.durability.fsyncs, 1)
+
+    def test_storage(self):
+        """Saves go through the durability of the storage.
+        """
+        with self.assertRaises(ValueError):
+            FileStorage(durability='always')
+        storage = FileStorage(durability='fsync')
+        storage._FileStorage__file_path = self.json_file
+        storage._FileStorage__objects = dict()
+        with patch('models.base_model.storage', storage):
+            user = User()
+        storage.save()
+        self.assertEqual(storage.durability.fsyncs, 2)
+        with open(self.json_file, encoding='utf-8') as file:
+            self.assertIn('User.' + user.id, json.load(file))
+        self.assertEqual(os.listdir(self.tmpdir.name), ['objects.json'])
+
+
+class TestFileStorageBulk(unittest.TestCase):
+    """Bulk creation of objects in `FileStorage`.
+    """
+
+    def setUp(self):
+        """Opens a storage on a temporary file.
+        """
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.storage = self.open('json')
+        self.patcher = patch('models.base_model.storage', self.storage)
+        self.patcher.start()
+
+    def tearDown(self):
+        """Removes the temporary file.
+        """
+        self.patcher.stop()
+        self.tmpdir.cleanup()
+
+    def open(self, file_format):
+        """Returns a storage reloaded from the temporary directory."""
+        storage = FileStorage(file_format=file_format)
+        storage._FileStorage__file_path = os.path.join(
+            self.tmpdir.name, 'objects.' + file_format)
+        storage._FileStorage__objects = dict()
+        storage.reload()
+        return storage
+
+    def test_bulk_create(self):
+        """Objects are indexed and saved once, like objects made one by one.
+        """
+        city = City()
+        self.storage.add_index(Place, 'price_by_night', 'ordered')
+        with patch.object(FileStorage, '_write',
+                          side_effect=FileStorage._write,
+                          autospec=True) as write:
+            places = self.storage.bulk_create(Place, 50, city_id=city.id,
+                                              price_by_night=80, pool=True)
+        self.assertEqual(write.call_count, 1)
+        self.assertEqual(len(set(place.id for place in places)), 50)
+        self.assertEqual(self.storage.count(Place), 50)
+        self.assertCountEqual(self.storage.lookup(Place, 'city_id', city.id),
+                              places)
+        self.assertEqual(len(self.storage.range(Place, 'price_by_night',
+                                                80, 80)), 50)
+        self.assertEqual(len(self.storage.near(Place, 0.0, 0.0, 1)), 50)
+
+        places[1].name = 'Changed'
+        self.storage.save()
+        storage = self.open('json')
+        for place in places:
+            self.assertEqual(storage.get(Place, place.id).to_dict(),
+                             place.to_dict())
+        self.assertEqual(storage.get(Place, places[1].id).name, 'Changed')
+
+    def test_bulk_create_binary(self):
+        """Objects made in bulk are saved to binary snapshots.
+        """
+        self.storage = self.open('binary')
+        with patch('models.base_model.storage', self.storage):
+            places = self.storage.bulk_create(Place, 20, name='Loft')
+            places[3].number_rooms = 2
+            self.storage.save()
+        storage = self.open('binary')
+        for place in places:
+            self.assertEqual(storage.get(Place, place.id).to_dict(),
+                             place.to_dict())
+        self.assertEqual(storage.get(Place, places[3].id).number_rooms, 2)
+
+    def test_bulk_create_copies(self):
+        """Every object gets its own copy of the mutable values.
+        """
+        amenity_ids = ['wifi']
+        Loft = type('Loft', (Place,), {})
+        for cls in (Place, Loft):
+            objs = self.storage.bulk_create(cls, 3, amenity_ids=amenity_ids,
+                                            tags={'pool': [1]})
+            objs[0].amenity_ids.append('pool')
+            objs[0].tags['pool'].append(2)
+            self.assertEqual(amenity_ids, ['wifi'])
+            for obj in objs[1:]:
+                self.assertEqual((obj.amenity_ids, obj.tags),
+                                 (['wifi'], {'pool': [1]}))
+
+    def test_bulk_create_errors(self):
+        """Reserved attributes and negative counts are rejected.
+        """
+        with self.assertRaises(TypeError):
+            self.storage.bulk_create(Place, 2, id='1')
+        with self.assertRaises(ValueError):
+            self.storage.bulk_create(Place, -1)
+        self.assertEqual(self.storage.bulk_create('Place', 0), [])
+        self.assertEqual(self.storage.count(), 0)
+
+    def test_rollback(self):
+        """Objects created in a transaction are forgotten on rollback.
+        """
+        with self.assertRaises(KeyError):
+            with self.storage.transaction():
+                self.storage.bulk_create(Place, 5)
+                raise KeyError('abort')
+        self.assertEqual(self.storage.count(Place), 0)
+
+
+class TestFileStorageStream(unittest.TestCase):
+    """Tests the incremental decoding of the JSON file.
+    """
+
+    def test_records(self):
+        """Records are decoded in order whatever the chunk size.
+        """
+        content = {'A.1': {'id': '1', 'tags': [1, 2, {'x': 'y'}]},
+                   'B.2': {'id': '2', 'name': 'a "quoted" }, name'},
+                   'C.3': 12345}
+        text = json.dumps(content, indent=2)
+        for chunk_size in (1, 3, 7, 64 * 1024):
+            pairs = list(iter_json_object(io.StringIO(text), chunk_size))
+            self.assertEqual(pairs, list(content.items()))
+
+    def test_empty(self):
+        """An empty file and an empty object hold no records.
+        """
+        self.assertEqual(list(iter_json_object(io.StringIO(''))), [])
+        self.assertEqual(list(iter_json_object(io.StringIO(' {} '))), [])
+
+    def test_malformed(self):
+        """Malformed content raises ValueError.
+        """
+        for text in ('[1, 2]', '{"a" 1}', '{"a": 1', '{"a": 1,}', '{1: 2}'):
+            with self.assertRaises(ValueError):
+                list(iter_json_object(io.StringIO(text), 2))
+
+
+class TestFileStorageImport(unittest.TestCase):
+    """Streaming imports of JSONL and CSV files into `FileStorage`.
+    """
+
+    def setUp(self):
+        """Opens a storage on a temporary file.
+        """
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.storage = self.open()
+
+    def tearDown(self):
+        """Removes the temporary files.
+        """
+        self.tmpdir.cleanup()
+
+    def open(self):
+        """Returns a storage reloaded from the temporary directory."""
+        storage = FileStorage()
+        storage._FileStorage__file_path = os.path.join(self.tmpdir.name,
+                                                       'objects.json')
+        storage._FileStorage__objects = dict()
+        storage.reload()
+        return storage
+
+    def write(self, name, text):
+        """Writes a file to import and returns its path."""
+        file_path = os.path.join(self.tmpdir.name, name)
+        with open(file_path, 'w', encoding='utf-8') as file:
+            file.write(text)
+        return file_path
+
+    def test_import_jsonl(self):
+        """Records are validated, converted and saved once per batch.
+        """
+        lines = ['{"__class__": "Place", "name": "Loft %d", '
+                 '"number_rooms": "%d", "latitude": 1}' % (i, i)
+                 for i in range(7)]
+        lines.insert(3, '')
+        lines.append('{"__class__": "User", "id": "u1", '
+                     '"created_at": "2024-01-02T03:04:05", "email": "a@b"}')
+        file_path = self.write('listings.jsonl', '\n'.join(lines) + '\n')
+        reports = []
+        importer = Importer(self.storage, batch_size=3, interval=0,
+                            progress=lambda report: reports.append(
+                                report['records']))
+        with patch.object(FileStorage, '_write',
+                          side_effect=FileStorage._write,
+                          autospec=True) as write:
+            report = importer.run(file_path)
+        self.assertEqual(write.call_count, 3)
+        self.assertEqual(reports, [3, 6, 8])
+        self.assertEqual((report['records'], report['skipped'],
+                          report['line']), (8, 0, 9))
+        self.assertFalse(os.path.exists(file_path + '.checkpoint'))
+
+        storage = self.open()
+        self.assertEqual(storage.count(Place), 7)
+        for place in storage.all(Place).values():
+            self.assertEqual(place.name, 'Loft %d' % place.number_rooms)
+            self.assertEqual(place.latitude, 1.0)
+            self.assertEqual(place.created_at, place.updated_at)
+        user = storage.get(User, 'u1')
+        self.assertEqual(user.email, 'a@b')
+        self.assertEqual(user.updated_at, datetime(2024, 1, 2, 3, 4, 5))
+
+    def test_import_csv(self):
+        """CSV rows take their class from the call and may span lines.
+        """
+        file_path = self.write('places.csv', (
+            '\ufeffid,name,max_guest,amenity_ids,description\n'
+            'p1,Loft,4,"[""a1""]","two\nlines"\n'
+            'p2,Barn,,,\n'))
+        Importer(self.storage).run(file_path, Place)
+        p1 = self.storage.get(Place, 'p1')
+        self.assertEqual((p1.name, p1.max_guest, p1.amenity_ids,
+                          p1.description), ('Loft', 4, ['a1'], 'two\nlines'))
+        p2 = self.storage.get(Place, 'p2')
+        self.assertEqual((p2.max_guest, p2.amenity_ids), (0, []))
+        self.assertNotIn('max_guest', p2.to_dict())
+
+    def test_invalid_records(self):
+        """Invalid records stop the import, or are skipped if asked.
+        """
+        invalid = ['{"__class__": "MyModel"}', '{"name": "No class"}',
+                   '[1, 2]', '{"__class__": "Place", "max_guest": "x"}',
+                   '{"__class__": "Place", "first name": "Betty"}',
+                   '{"__class__": "Place", "created_at": "yesterday"}',
+                   '{"__class__": "Place", '
+                   '"created_at": "0001-01-01T00:00:00+01:00"}',
+                   '{"__class__": "Place", "amenity_ids": "a1"}', '{oops']
+        for i, line in enumerate(invalid):
+            file_path = self.write('bad%d.jsonl' % i, line + '\n')
+            with self.assertRaises(ValueError) as e:
+                Importer(self.storage).run(file_path)
+            self.assertTrue(str(e.exception).startswith('line 1: '))
+        file_path = self.write('bad.jsonl', '\n'.join(invalid) + '\n')
+        report = Importer(self.storage, skip_invalid=True).run(file_path)
+        self.assertEqual((report['records'], report['skipped']),
+                         (0, len(invalid)))
+        self.assertEqual(self.storage.count(), 0)
+
+    def test_resume(self):
+        """A failed import resumes after the last saved batch.
+        """
+        lines = ['{"__class__": "Place", "id": "p%d"}' % i
+                 for i in range(10)]
+        lines[7] = '{"__class__": "Place", "id": "p7", "max_guest": "x"}'
+        file_path = self.write('listings.jsonl', '\n'.join(lines) + '\n')
+        with self.assertRaises(ValueError):
+            Importer(self.storage, batch_size=3).run(file_path)
+        self.assertEqual(self.open().count(Place), 7)
+        with open(file_path + '.checkpoint', encoding='utf-8') as file:
+            self.assertEqual(json.load(file)['line'], 7)
+
+        # A batch that fails to save leaves nothing behind.
+        lines[7] = '{"__class__": "Place", "id": "p7"}'
+        self.write('listings.jsonl', '\n'.join(lines) + '\n')
+        with patch.object(FileStorage, '_write', side_effect=OSError):
+            with self.assertRaises(OSError):
+                Importer(self.storage, batch_size=3).run(file_path)
+        self.assertEqual(self.storage.count(Place), 7)
+
+        report = Importer(self.storage, batch_size=3).run(file_path)
+        self.assertEqual((report['resumed'], report['records']), (7, 10))
+        self.assertEqual(sorted(self.open().all(Place)),
+                         sorted('Place.p%d' % i for i in range(10)))
+        self.assertFalse(os.path.exists(file_path + '.checkpoint'))
+
+    def test_write_behind(self):
+        """Checkpoints are written once their batch is in the file, and an
+        import cannot run inside a transaction.
+        """
+        lines = ['{"__class__": "Place", "id": "p%d", '
+                 '"created_at": "2024-01-02T03:04:05Z"}' % i
+                 for i in range(5)]
+        file_path = self.write('listings.jsonl', '\n'.join(lines) + '\n')
+        self.storage.flusher = Flusher(
+            self.storage._FileStorage__save_behind, 60)
+        self.addCleanup(setattr, self.storage, 'flusher', None)
+        self.storage.begin()
+        with self.assertRaises(RuntimeError):
+            Importer(self.storage).run(file_path)
+        self.storage.rollback()
+
+        saved = []
+        Importer(self.storage, batch_size=2, interval=0,
+                 progress=lambda report: saved.append(
+                     (report['records'], self.open().count(Place)))).run(
+            file_path)
+        self.assertEqual(saved, [(2, 2), (4, 4), (5, 5)])
+        self.assertEqual(self.open().get(Place, 'p0').created_at,
+                         datetime(2024, 1, 2, 3, 4, 5))
+
+
+class TestFileStorageExport(unittest.TestCase):
+    """Streaming JSONL exports of `FileStorage`.
+    """
+
+    def setUp(self):
+        """Opens a storage on a temporary file.
+        """
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.storage = self.open()
+        self.patcher = patch('models.base_model.storage', self.storage)
+        self.patcher.start()
+
+    def tearDown(self):
+        """Removes the temporary file.
+        """
+        self.patcher.stop()
+        self.tmpdir.cleanup()
+
+    def open(self, name='objects.json', **kwargs):
+        """Returns a storage reloaded from the temporary directory."""
+        storage = FileStorage(**kwargs)
+        storage._FileStorage__file_path = os.path.join(self.tmpdir.name,
+                                                       name)
+        storage._FileStorage__objects = dict()
+        storage.reload()
+        return storage
+
+    def export(self, storage, cls=None, attrs=None):
+        """Returns the records exported by `storage`."""
+        file = io.StringIO()
+        count = storage.export(file, cls, attrs)
+        records = [json.loads(line) for line in file.getvalue().splitlines()]
+        self.assertEqual(count, len(records))
+        return records
+
+    def test_export(self):
+        """Every record is written as its `to_dict`, saved or not.
+        """
+        places = self.storage.bulk_create(Place, 5, name='Loft')
+        user = User()
+        self.storage.save()
+        places[0].name = 'Barn'
+        city = City()
+        expected = [obj.to_dict() for obj in places + [user, city]]
+        self.assertCountEqual(self.export(self.storage), expected)
+        self.assertCountEqual(self.export(self.storage, Place),
+                              expected[:5])
+        self.assertEqual(self.export(self.storage, 'Review'), [])
+        self.assertCountEqual(
+            self.export(self.storage, 'Place', ['name', 'id', 'max_guest',
+                                                'pool']),
+            [{'name': place.name, 'id': place.id, 'max_guest': 0}
+             for place in places])
+
+    def test_export_lazy(self):
+        """Lazy records are exported without building their objects.
+        """
+        for name, kwargs in (('lazy.json', {'lazy': True}),
+                             ('objects.bin', {'file_format': 'binary'})):
+            storage = self.open(name, **kwargs)
+            with patch('models.base_model.storage', storage):
+                places = storage.bulk_create(Place, 5, name='Loft')
+            storage = self.open(name, **kwargs)
+            self.assertCountEqual(self.export(storage),
+                                  [place.to_dict() for place in places])
+            self.assertEqual(self.export(storage, Place, ['name']),
+                             [{'name': 'Loft'}] * 5)
+            self.assertEqual(len(storage._FileStorage__objects), 0)
+            self.assertEqual(len(storage._FileStorage__objects), 0)
+
+
+class TestFileStorageWhere(unittest.TestCase):
+    """Filter queries of `FileStorage` and their planner.
+    """
+
+    def setUp(self):
+        """Fills a private storage with places of two cities.
+        """
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.storage = FileStorage()
+        self.storage._FileStorage__file_path = os.path.join(
+            self.tmpdir.name, 'objects.json')
+        self.storage._FileStorage__objects = dict()
+        self.storage.reload()
+        self.patcher = patch('models.base_model.storage', self.storage)
+        self.patcher.start()
+        self.places = []
+        for i in range(20):
+            place = Place()
+            place.city_id = 'c1' if i < 15 else 'c2'
+            place.price_by_night = i * 10
+            place.name = 'Loft {}'.format(i)
+            self.places.append(place)
+
+    def tearDown(self):
+        """Restores the global storage.
+        """
+        self.patcher.stop()
+        self.tmpdir.cleanup()
+
+    def test_parse(self):
+        """Conditions are split on commas and 'and', values are typed.
+        """
+        predicates = query.parse('city_id="a, b" and price_by_night>=100, '
+                                 'max_guest in [2, 4.5], name == Loft, '
+                                 "id=1234-ab, description='x'")
+        self.assertEqual([(p.attr, p.op, p.value) for p in predicates], [
+            ('city_id', '=', 'a, b'), ('price_by_night', '>=', 100),
+            ('max_guest', 'in', [2, 4.5]), ('name', '=', 'Loft'),
+            ('id', '=', '1234-ab'), ('description', '=', 'x')])
+        self.assertEqual(query.parse(''), [])
+        for text in ('name', 'name=', '1=2', 'a=1 b=2', 'a=1,', 'a="x',
+                     'a in 1', 'a in [1 2]', 'a != 1'):
+            with self.assertRaises(ValueError):
+                query.parse(text)
+
+    def test_where(self):
+        """Every condition must hold, whichever path is used.
+        """
+        where = self.storage.where
+        self.assertCountEqual(where(Place, 'city_id=c2'), self.places[15:])
+        self.assertCountEqual(
+            where('Place', 'city_id=c1, price_by_night>100'),
+            self.places[11:15])
+        self.assertCountEqual(
+            where(Place, 'price_by_night>=30 and price_by_night<50'),
+            self.places[3:5])
+        self.assertCountEqual(
+            where(Place, 'price_by_night in [10, 190, 1000]'),
+            [self.places[1], self.places[19]])
+        self.assertEqual(where(Place, 'name="Loft 7"'), [self.places[7]])
+        self.assertEqual(where(Place, 'name>7, pool=1'), [])
+        self.assertEqual(len(where(Place, '')), 20)
+
+    def test_plan(self):
+        """The most selective index is read, a scan only when none applies.
+        """
+        def plan(text):
+            return query.plan(self.storage, Place, query.parse(text))
+
+        self.assertEqual(plan('name="Loft 1"').kind, 'scan')
+        chosen = plan('city_id=c2, name="Loft 19"')
+        self.assertEqual((chosen.kind, chosen.attr, chosen.estimate),
+                         ('hash', 'city_id', 5))
+        self.storage.add_index(Place, 'price_by_night', 'ordered')
+        chosen = plan('city_id=c1, price_by_night>100, price_by_night<=180')
+        self.assertEqual((chosen.kind, chosen.attr, chosen.estimate),
+                         ('ordered', 'price_by_night', 8))
+        chosen = plan('city_id=c2, price_by_night>0')
+        self.assertEqual((chosen.kind, chosen.estimate), ('hash', 5))
+        chosen = plan('price_by_night in [10, 20, 20]')
+        self.assertEqual((chosen.kind, chosen.estimate), ('ordered', 2))
+        chosen = plan('price_by_night>"x"')
+        self.assertEqual((chosen.kind, chosen.estimate, chosen.run()),
+                         ('ordered', 0, []))
+        with patch.object(FileStorage, 'all') as all_:
+            self.assertEqual(len(plan('city_id=c2, name>"Loft"').run()), 5)
+            all_.assert_not_called()
+
+
+class TestFileStorageCompute(unittest.TestCase):
+    """Aggregations over the columns of `FileStorage`.
+    """
+
+    def setUp(self):
+        """Fills a private storage with places and reviews.
+        """
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.storage = FileStorage()
+        self.storage._FileStorage__file_path = os.path.join(
+            self.tmpdir.name, 'objects.json')
+        self.storage._FileStorage__objects = dict()
+        self.storage.reload()
+        self.patcher = patch('models.base_model.storage', self.storage)
+        self.patcher.start()
+        for i in range(10):
+            place = Place()
+            place.city_id = 'c1' if i < 6 else 'c2'
+            place.price_by_night = i * 10
+        place.latitude = 'north'
+        self.reviews = [Review() for i in range(3)]
+        self.reviews[0].place_id = place.id
+
+    def tearDown(self):
+        """Restores the global storage.
+        """
+        self.patcher.stop()
+        self.tmpdir.cleanup()
+
+    def run_text(self, cls, text):
+        """Parses and runs a computation."""
+        aggregates, by, where = compute.parse(text)
+        return compute.compute(self.storage, cls, aggregates, by, where)
+
+    def test_column(self):
+        """Columns hold every value, defaults for the missing ones.
+        """
+        self.assertCountEqual(self.storage.column(Place, 'price_by_night'),
+                              range(0, 100, 10))
+        self.assertEqual(self.storage.column('Review', 'text'), [''] * 3)
+        self.assertEqual(self.storage.column('Review', 'pool'), [None] * 3)
+        self.storage.save()
+        storage = FileStorage(lazy=True)
+        storage._FileStorage__file_path = self.storage._FileStorage__file_path
+        storage._FileStorage__objects = dict()
+        storage.reload()
+        self.assertCountEqual(storage.column(Place, 'price_by_night'),
+                              range(0, 100, 10))
+        self.assertEqual(len(storage._FileStorage__objects), 0)
+
+    def test_aggregates(self):
+        """Every function, over ints, floats and values left out.
+        """
+        self.assertEqual(self.run_text(Place, (
+            'count, sum(price_by_night), avg(price_by_night), '
+            'min(price_by_night), max(price_by_night), '
+            'percentile(price_by_night, 50), percentile(price_by_night, 95), '
+            'count(latitude), max(latitude), sum(name)')), [{
+                'count': 10, 'sum(price_by_night)': 450,
+                'avg(price_by_night)': 45.0, 'min(price_by_night)': 0,
+                'max(price_by_night)': 90,
+                'percentile(price_by_night, 50)': 45.0,
+                'percentile(price_by_night, 95)': 85.5,
+                'count(latitude)': 9, 'max(latitude)': 0.0,
+                'sum(name)': None}])
+
+    def test_bools_left_out(self):
+        """Bools are not counted as numbers.
+        """
+        places = list(self.storage.all(Place).values())
+        for place, value in zip(places, [True, False] + [2] * 8):
+            place.rating = value
+        self.assertEqual(self.run_text(
+            Place, 'count(rating), sum(rating), max(rating)'),
+            [{'count(rating)': 8, 'sum(rating)': 16, 'max(rating)': 2}])
+        places[9].rating = 4.5
+        self.assertEqual(self.run_text(Place, 'count(rating), sum(rating)'),
+                         [{'count(rating)': 8, 'sum(rating)': 18.5}])
+
+    def test_group_by(self):
+        """Groups come in order of their value, filters apply first.
+        """
+        self.assertEqual(
+            self.run_text(Place, 'count, avg(price_by_night) by city_id'),
+            [{'city_id': 'c1', 'count': 6, 'avg(price_by_night)': 25.0},
+             {'city_id': 'c2', 'count': 4, 'avg(price_by_night)': 75.0}])
+        self.assertEqual(
+            self.run_text(Place, 'max(price_by_night) by city_id where '
+                                 'price_by_night<70'),
+            [{'city_id': 'c1', 'max(price_by_night)': 50},
+             {'city_id': 'c2', 'max(price_by_night)': 60}])
+        self.assertEqual(
+            self.run_text(Review, 'count by place_id'),
+            [{'place_id': '', 'count': 2},
+             {'place_id': self.reviews[0].place_id, 'count': 1}])
+        self.assertEqual(self.run_text('State', 'count by name'), [])
+
+    def test_parse(self):
+        """Malformed computations are rejected.
+        """
+        for text in ('', 'avg', 'avg()', 'count(', 'median(max_guest)',
+                     'percentile(max_guest)', 'max(max_guest, 50)',
+                     'percentile(max_guest, 150)', 'count count'):
+            with self.assertRaises(ValueError):
+                compute.parse(text)
+
+
+class TestFileStorageColumns(unittest.TestCase):
+    """Numeric columns kept by `FileStorage` in a `ColumnStore`.
+    """
+
+    def setUp(self):
+        """Fills a private storage with places.
+        """
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.storage = FileStorage()
+        self.storage._FileStorage__file_path = os.path.join(
+            self.tmpdir.name, 'objects.json')
+        self.storage._FileStorage__objects = dict()
+        self.storage.reload()
+        self.patcher = patch('models.base_model.storage', self.storage)
+        self.patcher.start()
+        self.places = []
+        for i in range(10):
+            place = Place()
+            place.price_by_night = i * 10
+            self.places.append(place)
+
+    def tearDown(self):
+        """Restores the global storage.
+        """
+        self.patcher.stop()
+        self.tmpdir.cleanup()
+
+    def test_columns(self):
+        """Place keeps its numeric attributes in one store.
+        """
+        store = self.storage.columns(Place, 'price_by_night')
+        self.assertIsInstance(store, ColumnStore)
+        self.assertIs(self.storage.columns('Place', 'latitude'), store)
+        self.assertIsNone(self.storage.columns(Place, 'name'))
+        self.assertIsNone(self.storage.columns(Review, 'text'))
+        self.assertEqual(list(store.numbers('price_by_night')),
+                         list(range(0, 100, 10)))
+        self.assertEqual(store.numbers('latitude').typecode, 'd')
+        with self.assertRaises(KeyError):
+            store.fill('name')
+
+    def test_updates(self):
+        """Creates, updates and deletes reach the filled columns in place.
+        """
+        store = self.storage.columns(Place, 'price_by_night')
+        store.fill('price_by_night')
+        column = store.columns['price_by_night']
+        self.places[0].price_by_night = 5
+        place = Place()
+        place.price_by_night = 7
+        self.storage.delete(self.places[9])
+        self.assertIs(store.columns['price_by_night'], column)
+        self.assertEqual(sorted(store.numbers('price_by_night')),
+                         [5, 7, 10, 20, 30, 40, 50, 60, 70, 80])
+        self.assertEqual(store.objects[store.rows['Place.' + place.id]],
+                         place)
+
+        # A float turns the column into doubles, text is left out.
+        self.places[1].price_by_night = 12.5
+        self.places[2].price_by_night = 'free'
+        self.places[3].price_by_night = True
+        self.assertEqual(store.columns['price_by_night'].typecode, 'd')
+        self.assertEqual(sorted(store.numbers('price_by_night')),
+                         [5, 7, 12.5, 40, 50, 60, 70, 80])
+        mask = store.mask('price_by_night', '=', 1)
+        self.assertEqual(store.select(mask), [self.places[3]])
+
+        # Rows of deleted objects are dropped once they are the most.
+        for place in self.places[:8]:
+            self.storage.delete(place)
+        self.assertEqual(len(store.rows), 2)
+        self.assertLessEqual(len(store.keys), 4)
+        self.assertEqual(sorted(store.numbers('price_by_night')), [7, 80])
+
+        self.storage.bulk_create(Place, 3, price_by_night=4)
+        self.assertEqual(sorted(store.numbers('price_by_night')),
+                         [4, 4, 4, 7, 80])
+
+    def test_rollback(self):
+        """Rolled back writes are taken out of the columns.
+        """
+        store = self.storage.columns(Place, 'price_by_night')
+        store.fill('price_by_night')
+        with self.assertRaises(ValueError):
+            with self.storage.transaction():
+                self.places[0].price_by_night = 1000
+                Place().price_by_night = 2000
+                raise ValueError
+        self.assertEqual(max(store.numbers('price_by_night')), 90)
+        self.assertEqual(len(store.rows), 10)
+
+    def test_filters(self):
+        """Numeric conditions run on the columns when no index applies.
+        """
+        def plan(text):
+            return query.plan(self.storage, Place, query.parse(text))
+
+        chosen = plan('price_by_night>=30, price_by_night<60, name=""')
+        self.assertEqual((chosen.kind, chosen.attr, chosen.estimate),
+                         ('columns', 'price_by_night', 3))
+        self.assertCountEqual(chosen.run(), self.places[3:6])
+        self.assertCountEqual(
+            self.storage.where(Place, 'price_by_night in [0, 90, 5]'),
+            [self.places[0], self.places[9]])
+        self.places[4].name = 'Loft'
+        self.assertEqual(self.storage.where(
+            Place, 'price_by_night>=30, name="Loft"'), [self.places[4]])
+        self.assertEqual(plan('price_by_night="x"').kind, 'scan')
+        self.places[0].city_id = 'c1'
+        self.assertEqual(plan('city_id=c1, price_by_night>0').kind, 'hash')
+
+    def test_compute(self):
+        """Aggregates read the columns and match the object path.
+        """
+        for i, place in enumerate(self.places):
+            place.city_id = 'c{}'.format(i % 3)
+            place.max_guest = i % 2
+        self.places[5].latitude = 'north'
+        for text in ('count, sum(price_by_night), avg(latitude)',
+                     'max(price_by_night), count(latitude) by city_id',
+                     'sum(price_by_night) by max_guest',
+                     'min(price_by_night) by city_id where max_guest=1',
+                     'count by city_id where price_by_night>20, city_id=c0'):
+            aggregates, by, where = compute.parse(text)
+            columns = compute.compute(self.storage, Place, aggregates, by,
+                                      where)
+            with patch.object(FileStorage, 'columns', return_value=None):
+                objects = compute.compute(self.storage, Place, aggregates,
+                                          by, where)
+            self.assertEqual(columns, objects)
+
+    def test_lazy(self):
+        """Records kept in lazy mode are not covered by the columns.
+        """
+        self.storage.save()
+        storage = FileStorage(lazy=True)
+        storage._FileStorage__file_path = self.storage._FileStorage__file_path
+        storage._FileStorage__objects = dict()
+        storage.reload()
+        self.assertIsNone(storage.columns(Place, 'price_by_night'))
+        self.assertEqual(len(storage.all(Place)), 10)
+        store = storage.columns(Place, 'price_by_night')
+        self.assertEqual(sum(store.numbers('price_by_night')), 450)
+
+
+if __name__ == "__main__":
+    unittest.main()
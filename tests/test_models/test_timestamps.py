@@ -0,0 +1,78 @@
+#!/usr/bin/python3
+"""Defines unittests for models/timestamps.py"""
+from datetime import datetime, timedelta
+import unittest
+
+from models import timestamps
+from models.base_model import BaseModel
+from models.place import Place
+
+
+class TestTimestamps(unittest.TestCase):
+    """Timestamp codec and the lazy datetimes of models."""
+
+    def test_round_trip(self):
+        """Timestamps format exactly like `datetime.isoformat`.
+        """
+        start = datetime(1900, 5, 13, 1, 10, 20, 1)
+        for i in range(2000):
+            value = start + timedelta(microseconds=i * 987654321987)
+            if i % 10 == 0:
+                value = value.replace(microsecond=0)
+            stamp = timestamps.from_datetime(value)
+            self.assertEqual(timestamps.to_datetime(stamp), value)
+            self.assertEqual(timestamps.isoformat(stamp), value.isoformat())
+            self.assertEqual(timestamps.parse(value.isoformat()), stamp)
+        with self.assertRaises(ValueError):
+            timestamps.parse('13/05/1900')
+
+    def test_offsets(self):
+        """Times with an offset are read as their UTC time.
+        """
+        stamp = timestamps.parse('2024-01-02T03:04:05.000006')
+        self.assertEqual(timestamps.parse('2024-01-02T03:04:05.000006Z'),
+                         stamp)
+        self.assertEqual(
+            timestamps.parse('2024-01-02T03:04:05.000006+00:00'), stamp)
+        self.assertEqual(timestamps.parse('2024-01-02T05:34:05.000006+02:30'),
+                         stamp)
+        place = Place(id='1', created_at='2024-01-02T03:04:05Z',
+                      updated_at='2024-01-02T03:04:05+00:00')
+        self.assertEqual(place.created_at, datetime(2024, 1, 2, 3, 4, 5))
+        self.assertEqual(place.to_dict()['updated_at'], '2024-01-02T03:04:05')
+
+    def test_lazy_datetimes(self):
+        """Models hold ints and hand out datetimes.
+        """
+        record = {'id': '1', '__class__': 'Place',
+                  'created_at': '2024-01-02T03:04:05.000006',
+                  'updated_at': '2024-01-02T03:04:05'}
+        place = Place(**record)
+        self.assertEqual(place.__dict__.dump()['created_at'],
+                         timestamps.parse(record['created_at']))
+        self.assertEqual(place.created_at, datetime(2024, 1, 2, 3, 4, 5, 6))
+        self.assertEqual(place.__dict__['updated_at'],
+                         datetime(2024, 1, 2, 3, 4, 5))
+        self.assertIn('datetime.datetime(2024, 1, 2, 3, 4, 5, 6)',
+                      str(place))
+        self.assertEqual(place.to_dict(), record)
+
+        # Values assigned by hand are kept as they are.
+        place.updated_at = datetime(2025, 1, 1)
+        self.assertEqual(place.to_dict()['updated_at'], '2025-01-01T00:00:00')
+        place.created_at = '1234567890'
+        self.assertEqual(place.created_at, '1234567890')
+
+    def test_new_object(self):
+        """A new object is created and updated at the same time.
+        """
+        bm1 = BaseModel()
+        self.assertEqual(bm1.created_at, bm1.updated_at)
+        self.assertIsNone(bm1.created_at.tzinfo)
+        bm1_dict = bm1.to_dict()
+        self.assertEqual(bm1_dict['created_at'], bm1.created_at.isoformat())
+        self.assertEqual(bm1_dict['updated_at'], bm1_dict['created_at'])
+
+
+if __name__ == "__main__":
+    unittest.main()